@@ -0,0 +1,185 @@
+"""
+This script is used to annotate a stream of documents with the wordlists. Documents are read from JSONL (one JSON object per line) or plain text (one document per line), optionally gzipped, and the mentions are written as JSONL with one mention per line.
+
+Documents are matched in batches by a pool of processes with only a fixed number of batches in flight, so memory use does not grow with the size of the input, and the output is in the same order as the input. Overlapping matches are resolved by keeping the longest and matches of the conflicting terms (terms_conflicting.tsv) suppress anything they overlap.
+"""
+import argparse
+import gzip
+import itertools
+import json
+import multiprocessing
+import sys
+import time
+from collections import deque
+from matcher import loadMatcher, loadMatcherFile, selectLongestMatches
+
+# Matcher used by each worker process (set by initWorker)
+workerMatcher = None
+
+def openFile(filename, mode):
+	"""
+	Opens a text file, using gzip if the filename ends with .gz
+
+	Args:
+		filename (str): File to open
+		mode (str): 'r' or 'w'
+
+	Returns:
+		Open file object
+	"""
+	if filename.endswith('.gz'):
+		return gzip.open(filename, mode + 't', encoding='utf8')
+	return open(filename, mode, encoding='utf8')
+
+def readDocuments(openfile, inputFormat, idField, textField):
+	"""
+	Reads documents from an input file. JSON documents without a text are skipped
+
+	Args:
+		openfile (file): Open input file
+		inputFormat (str): jsonl or text
+		idField (str): Field of each JSON document with its identifier (the line number is used if it is missing)
+		textField (str): Field of each JSON document with its text
+
+	Returns:
+		generator of (identifier, text) tuples
+	"""
+	skippedCount = 0
+	for lineNumber,line in enumerate(openfile):
+		line = line.rstrip('\n\r')
+		if inputFormat == 'jsonl':
+			if not line:
+				continue
+			document = json.loads(line)
+			if not isinstance(document.get(textField), str):
+				skippedCount += 1
+				continue
+			yield document.get(idField,lineNumber), document[textField]
+		else:
+			yield lineNumber, line
+
+	if skippedCount > 0:
+		print("Skipped %d documents without a %s field" % (skippedCount, textField))
+
+def initWorker(wordlists, inhibitorTemplates, matcherFile):
+	"""
+	Loads the matcher in a worker process
+
+	Args:
+		wordlists (list of str): Wordlists to build the matcher from (if there is no matcher file)
+		inhibitorTemplates (str): Inhibitor templates to add to the matcher built from the wordlists
+		matcherFile (str): Saved matcher to memory-map
+
+	Returns:
+		Nothing
+	"""
+	global workerMatcher
+	workerMatcher = loadMatcherFile(matcherFile) if matcherFile else loadMatcher(wordlists, inhibitorTemplates=inhibitorTemplates)
+
+def annotateBatch(documents):
+	"""
+	Annotates a batch of documents with the worker's matcher
+
+	Args:
+		documents (list of (identifier, text) tuples): Documents to annotate
+
+	Returns:
+		list of JSON lines for the mentions
+	"""
+	lines = []
+	for docid,text in documents:
+		for start,end,termid,listType in selectLongestMatches(workerMatcher.match(text)):
+			mention = { 'document':docid, 'start':start, 'end':end, 'text':text[start:end], 'type':listType, 'id':termid }
+			lines.append(json.dumps(mention))
+	return lines
+
+def iterBatches(items, batchSize):
+	"""
+	Groups items into lists of a fixed size (the last may be shorter)
+
+	Args:
+		items (iterable): Items to group
+		batchSize (int): Number of items in each batch
+
+	Returns:
+		generator of lists
+	"""
+	items = iter(items)
+	while True:
+		batch = list(itertools.islice(items, batchSize))
+		if not batch:
+			break
+		yield batch
+
+def annotateDocuments(documents, wordlists, inhibitorTemplates, matcherFile, processes=1, batchSize=100):
+	"""
+	Annotates documents in order, either in this process or with a pool of processes. Only a couple of batches per process are in flight at any time
+
+	Args:
+		documents (iterable of (identifier, text) tuples): Documents to annotate
+		wordlists (list of str): Wordlists to build the matcher from (if there is no matcher file)
+		inhibitorTemplates (str): Inhibitor templates to add to the matcher built from the wordlists
+		matcherFile (str): Saved matcher to memory-map
+		processes (int): Number of processes to match with
+		batchSize (int): Number of documents sent to a process at once
+
+	Returns:
+		generator of lists of JSON lines (one list per batch)
+	"""
+	if processes > 1:
+		with multiprocessing.Pool(processes, initializer=initWorker, initargs=(wordlists,inhibitorTemplates,matcherFile)) as pool:
+			inFlight = deque()
+			for batch in iterBatches(documents, batchSize):
+				inFlight.append(pool.apply_async(annotateBatch, (batch,)))
+				if len(inFlight) >= 2*processes:
+					yield inFlight.popleft().get()
+			while inFlight:
+				yield inFlight.popleft().get()
+	else:
+		initWorker(wordlists, inhibitorTemplates, matcherFile)
+		for batch in iterBatches(documents, batchSize):
+			yield annotateBatch(batch)
+
+def main():
+	parser = argparse.ArgumentParser(description='Annotate documents with the wordlists and output the mentions as JSONL')
+	parser.add_argument('--inFile', required=True, type=str, help='Documents to annotate (JSONL or one document per line, optionally gzipped)')
+	parser.add_argument('--format', required=False, type=str, choices=['jsonl','text'], help='Format of the input (default is jsonl for .jsonl and .json files and text otherwise)')
+	parser.add_argument('--idField', required=False, type=str, default='id', help='Field of each JSON document with its identifier')
+	parser.add_argument('--textField', required=False, type=str, default='text', help='Field of each JSON document with its text')
+	parser.add_argument('--wordlists', required=False, type=str, help='Comma-separated wordlist files (each either a terms_TYPE.tsv filename or as TYPE=filename)')
+	parser.add_argument('--inhibitorTemplates', required=False, type=str, help='Inhibitor templates (from generateDrugTerms_geneinhibitors.py) to use with the wordlists')
+	parser.add_argument('--matcher', required=False, type=str, help='Saved matcher (e.g. wordlists.automaton) to use instead of the wordlists')
+	parser.add_argument('--outFile', required=True, type=str, help='Output JSONL file of mentions (gzipped if it ends with .gz)')
+	parser.add_argument('--processes', required=False, type=int, default=1, help='Number of processes to annotate with')
+	parser.add_argument('--batchSize', required=False, type=int, default=100, help='Number of documents sent to a process at once')
+	args = parser.parse_args()
+
+	assert args.wordlists or args.matcher, "Either --wordlists or --matcher is needed"
+	wordlists = args.wordlists.split(',') if args.wordlists else []
+
+	inputFormat = args.format
+	if inputFormat is None:
+		name = args.inFile[:-len('.gz')] if args.inFile.endswith('.gz') else args.inFile
+		inputFormat = 'jsonl' if name.endswith('.jsonl') or name.endswith('.json') else 'text'
+
+	print("Annotating documents...")
+	sys.stdout.flush()
+	start = time.time()
+	documentCount, mentionCount = 0, 0
+	with openFile(args.inFile,'r') as inF, openFile(args.outFile,'w') as outF:
+		def countedDocuments():
+			nonlocal documentCount
+			for document in readDocuments(inF, inputFormat, args.idField, args.textField):
+				documentCount += 1
+				yield document
+
+		for lines in annotateDocuments(countedDocuments(), wordlists, args.inhibitorTemplates, args.matcher, processes=args.processes, batchSize=args.batchSize):
+			for line in lines:
+				outF.write(line + "\n")
+			mentionCount += len(lines)
+
+	seconds = time.time() - start
+	print("Found %d mentions in %d documents in %.1f seconds (%.1f documents/second)" % (mentionCount, documentCount, seconds, documentCount / max(seconds,1e-9)))
+
+if __name__ == '__main__':
+	main()
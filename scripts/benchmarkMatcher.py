@@ -0,0 +1,103 @@
+"""
+This script is used to compare the speed of the Aho-Corasick matcher (built in memory and memory-mapped from a saved file) against looking up every run of tokens in a dictionary of the synonyms, as consumers of the wordlists used to.
+"""
+import argparse
+import re
+import time
+from collections import defaultdict
+from wordlists import readWordlist, parseWordlistArgument
+from matcher import loadMatcher, saveMatcher, loadMatcherFile, lowerText
+from annotateDocuments import openFile, readDocuments
+
+# Tokens for the dictionary lookup: runs of letters and digits and every other character on its own, so spans of tokens start and end on the same boundaries as the matcher
+TOKEN_PATTERN = re.compile(r'[^\W_]+|[\W_]', re.UNICODE)
+
+def loadSynonymDictionary(wordlists):
+	"""
+	Loads the lowercased synonyms of the wordlists into a dictionary
+
+	Args:
+		wordlists (list of str): Wordlist files (each either a terms_TYPE.tsv filename or as TYPE=filename)
+
+	Returns:
+		tuple of the dictionary of synonym to list of (termid, listType) and the most tokens in any synonym
+	"""
+	synonyms = defaultdict(list)
+	maxTokens = 1
+	for argument in wordlists:
+		listType,filename = parseWordlistArgument(argument)
+		for termid,_,terms in readWordlist(filename):
+			for term in terms:
+				term = lowerText(term.strip())
+				if term and not (termid,listType) in synonyms[term]:
+					synonyms[term].append( (termid,listType) )
+					maxTokens = max(maxTokens, len(TOKEN_PATTERN.findall(term)))
+	return synonyms, maxTokens
+
+def matchByTokens(text, synonyms, maxTokens):
+	"""
+	Finds the matches in a text by looking up every run of up to maxTokens tokens in the dictionary
+
+	Args:
+		text (str): Text to search
+		synonyms (dict): Synonym dictionary from loadSynonymDictionary
+		maxTokens (int): Most tokens in any synonym
+
+	Returns:
+		list of (start, end, termid, listType) tuples sorted by position
+	"""
+	lowered = lowerText(text)
+	tokens = [ (m.start(),m.end()) for m in TOKEN_PATTERN.finditer(lowered) ]
+	matches = []
+	for i,(start,_) in enumerate(tokens):
+		for _,end in tokens[i:i+maxTokens]:
+			for termid,listType in synonyms.get(lowered[start:end],()):
+				matches.append( (start,end,termid,listType) )
+	return sorted(matches)
+
+def timeMatcher(name, match, texts):
+	"""
+	Matches all the texts and prints the time taken and the rate
+
+	Args:
+		name (str): Name of the approach to print
+		match (function): Takes a text and returns its matches
+		texts (list of str): Texts to match
+
+	Returns:
+		list of the matches for each text
+	"""
+	start = time.time()
+	results = [ match(text) for text in texts ]
+	seconds = time.time() - start
+	characters = sum( len(text) for text in texts )
+	print("%s: %d matches in %.1f seconds (%.0f documents/second, %.1f MB/second)" % (name, sum(map(len,results)), seconds, len(texts) / max(seconds,1e-9), characters / 1e6 / max(seconds,1e-9)))
+	return results
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmark the wordlist matcher against a dictionary lookup of token runs')
+	parser.add_argument('--wordlists', required=True, type=str, help='Comma-separated wordlist files (each either a terms_TYPE.tsv filename or as TYPE=filename)')
+	parser.add_argument('--inFile', required=True, type=str, help='Documents to match (JSONL or one document per line, optionally gzipped)')
+	parser.add_argument('--format', required=False, type=str, default='text', choices=['jsonl','text'], help='Format of the input')
+	parser.add_argument('--textField', required=False, type=str, default='text', help='Field of each JSON document with its text')
+	parser.add_argument('--matcherFile', required=False, type=str, default='benchmark.automaton', help='File to save the matcher to for the memory-mapped run')
+	args = parser.parse_args()
+
+	wordlists = args.wordlists.split(',')
+	with openFile(args.inFile,'r') as f:
+		texts = [ text for _,text in readDocuments(f, args.format, 'id', args.textField) ]
+	print("%d documents (%.1f MB) in %s" % (len(texts), sum(map(len,texts)) / 1e6, args.inFile))
+
+	synonyms, maxTokens = loadSynonymDictionary(wordlists)
+	expected = timeMatcher("token dictionary (up to %d tokens)" % maxTokens, lambda text : matchByTokens(text, synonyms, maxTokens), texts)
+
+	matcher = loadMatcher(wordlists)
+	results = timeMatcher("Aho-Corasick matcher", matcher.match, texts)
+	assert results == expected, "The matcher and the dictionary lookup found different matches"
+
+	saveMatcher(matcher, args.matcherFile)
+	results = timeMatcher("memory-mapped Aho-Corasick matcher", loadMatcherFile(args.matcherFile).match, texts)
+	assert results == expected, "The memory-mapped matcher and the dictionary lookup found different matches"
+
+if __name__ == '__main__':
+	main()
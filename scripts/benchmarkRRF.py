@@ -0,0 +1,65 @@
+"""
+This script is used to compare the speed of the shared RRF reader against parsing MRCONSO.RRF line-by-line with split('|') as the generators used to.
+"""
+import argparse
+import codecs
+import time
+from umls import readMRCONSO, MRCONSO_CUI, MRCONSO_CODE, MRCONSO_STR
+
+def readLineByLine(filename):
+	"""
+	Parses MRCONSO.RRF the original way, splitting every line into all of its columns
+
+	Args:
+		filename (str): Filename of UMLS Concept file (MRCONSO.RRF)
+
+	Returns:
+		generator of (CUID, code, term) tuples for English rows
+	"""
+	with codecs.open(filename,'r','utf8') as f:
+		for line in f:
+			split = line.split('|')
+			cuid = split[0]
+			lang = split[1]
+			externalID = split[13]
+			term = split[14]
+			if lang != 'ENG':
+				continue
+			yield (cuid,externalID,term)
+
+def timeReader(name, rows, totalRows):
+	"""
+	Consumes a reader and prints the time taken and rows per second
+
+	Args:
+		name (str): Name of the reader to print
+		rows (generator): Rows produced by the reader
+		totalRows (int): Number of rows in the file (used for the rate)
+
+	Returns:
+		Number of rows produced by the reader
+	"""
+	start = time.time()
+	count = sum( 1 for _ in rows )
+	seconds = time.time() - start
+	print("%s: %d English rows in %.1f seconds (%.0f rows/second)" % (name, count, seconds, totalRows / max(seconds,1e-9)))
+	return count
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmark reading MRCONSO.RRF with the shared RRF reader')
+	parser.add_argument('--umlsConceptFile', required=True, type=str, help='Path on the MRCONSO.RRF file in UMLS metathesaurus')
+	parser.add_argument('--processes', required=False, type=str, default='1', help='Comma-separated process counts to try with the shared reader')
+	args = parser.parse_args()
+
+	with open(args.umlsConceptFile,'rb') as f:
+		totalRows = sum( 1 for _ in f )
+	print("%d rows in %s" % (totalRows, args.umlsConceptFile))
+
+	expected = timeReader("line-by-line split", readLineByLine(args.umlsConceptFile), totalRows)
+	for processes in map(int, args.processes.split(',')):
+		rows = readMRCONSO(args.umlsConceptFile, [MRCONSO_CUI,MRCONSO_CODE,MRCONSO_STR], lang='ENG', processes=processes)
+		count = timeReader("readMRCONSO (processes=%d)" % processes, rows, totalRows)
+		assert count == expected, "Shared reader found %d rows but expected %d" % (count, expected)
+
+if __name__ == '__main__':
+	main()
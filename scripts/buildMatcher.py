@@ -0,0 +1,23 @@
+"""
+This script is used to build the matcher automaton over a set of wordlists once and save it as a compact binary file that annotation processes can memory-map instead of loading and indexing the wordlists themselves.
+"""
+import argparse
+from matcher import loadMatcher, saveMatcher
+
+def main():
+	parser = argparse.ArgumentParser(description='Build and save a matcher automaton over a set of wordlists')
+	parser.add_argument('--wordlists', required=True, type=str, help='Comma-separated wordlist files (each either a terms_TYPE.tsv filename or as TYPE=filename)')
+	parser.add_argument('--inhibitorTemplates', required=False, type=str, help='Inhibitor templates (from generateDrugTerms_geneinhibitors.py) to resolve around the gene matches')
+	parser.add_argument('--outFile', required=True, type=str, help='File to save the matcher to')
+	args = parser.parse_args()
+
+	print("Building matcher...")
+	matcher = loadMatcher(args.wordlists.split(','), inhibitorTemplates=args.inhibitorTemplates)
+
+	print("Saving matcher with %d states and %d terms..." % (len(matcher.depth), len(matcher.entities)))
+	saveMatcher(matcher, args.outFile)
+
+	print("Successfully output to %s" % args.outFile)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,31 @@
+"""
+This script is used to build the synonym index across all the wordlists, which maps each normalized synonym to the (type, identifier) postings that have it, and to report how ambiguous the synonyms are within and across the wordlists.
+"""
+import argparse
+import json
+from wordlists import parseWordlistArgument, saveSynonymIndex, SynonymIndex, calculateAmbiguityStats
+
+def main():
+	parser = argparse.ArgumentParser(description='Build a synonym index across a set of wordlists with ambiguity statistics')
+	parser.add_argument('--wordlists', required=True, type=str, help='Comma-separated wordlist files (each either a terms_TYPE.tsv filename or as TYPE=filename)')
+	parser.add_argument('--outFile', required=True, type=str, help='File to save the index to')
+	parser.add_argument('--statsFile', required=False, type=str, help='JSON file to save the ambiguity statistics to')
+	args = parser.parse_args()
+
+	print("Building synonym index...")
+	wordlists = [ parseWordlistArgument(argument) for argument in args.wordlists.split(',') ]
+	saveSynonymIndex(wordlists, args.outFile)
+
+	stats = calculateAmbiguityStats(SynonymIndex(args.outFile))
+	print("%d synonyms with %d postings (%d ambiguous, %d across wordlists)" % (stats['synonyms'], stats['postings'], stats['ambiguous'], stats['crossListAmbiguous']))
+	for listType,typeStats in sorted(stats['types'].items()):
+		print("  %s: %d synonyms (%d ambiguous within, %d shared with other wordlists)" % (listType, typeStats['synonyms'], typeStats['ambiguous'], typeStats['crossListAmbiguous']))
+
+	if args.statsFile:
+		with open(args.statsFile,'w') as outF:
+			json.dump(stats,outF,indent=2,sort_keys=True)
+
+	print("Successfully output to %s" % args.outFile)
+
+if __name__ == '__main__':
+	main()
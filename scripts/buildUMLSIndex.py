@@ -0,0 +1,20 @@
+"""
+This script is used to convert the UMLS Metathesaurus concept file (MRCONSO.RRF) into a compact index that the other generator scripts can load instead of re-parsing the RRF file.
+"""
+import argparse
+from umls import buildMetathesaurusIndex
+
+def main():
+	parser = argparse.ArgumentParser(description='Build a reusable index of English terms from the UMLS Metathesaurus')
+	parser.add_argument('--umlsConceptFile', required=True, type=str, help='Path on the MRCONSO.RRF file in UMLS metathesaurus')
+	parser.add_argument('--outDir', required=True, type=str, help='Directory to write the index to')
+	parser.add_argument('--processes', required=False, type=int, default=1, help='Number of processes to parse MRCONSO.RRF with')
+	args = parser.parse_args()
+
+	print("Indexing metathesaurus...")
+	buildMetathesaurusIndex(args.umlsConceptFile, args.outDir, processes=args.processes)
+
+	print("Successfully output to %s" % args.outDir)
+
+if __name__ == '__main__':
+	main()
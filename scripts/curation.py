@@ -0,0 +1,141 @@
+"""
+Shared loading of the curated stopwords, additions and deletions (in the custom/ directory) and a filter that applies them, along with any other rules, in a single pass over the terms of each entity.
+
+Stopwords and deletions are always compared in lowercase.
+"""
+import codecs
+import os
+from collections import Counter, OrderedDict
+
+# Term types whose wordlists are generated with the curation files (deletions_TYPE.tsv and stopwords_TYPE.txt). The other wordlists (e.g. variants) are predefined so their curation files would never be read
+CURATED_TYPES = ['cancers','drugs','genes','proteins']
+
+def loadStopwords(filename):
+	"""
+	Loads a stopword file with one term per line
+
+	Args:
+		filename (str): Stopword file
+
+	Returns:
+		frozenset of lowercased stopwords
+	"""
+	with codecs.open(filename,'r','utf8') as f:
+		return frozenset( line.strip().lower() for line in f )
+
+def loadAdditions(filename):
+	"""
+	Loads a custom additions file (identifier, main term and pipe-delimited synonyms on each line). Synonyms for the same identifier on multiple lines are combined
+
+	Args:
+		filename (str): Additions file
+
+	Returns:
+		Tuple of a dictionary of identifier to main term and a dictionary of identifier to a tuple of synonyms
+	"""
+	names = {}
+	synonyms = OrderedDict()
+	with codecs.open(filename,'r','utf-8') as f:
+		for line in f:
+			termid,singleterm,terms = line.strip().split('\t')
+			names[termid] = singleterm
+			synonyms[termid] = synonyms.get(termid,()) + tuple(terms.split('|'))
+	return names, synonyms
+
+def loadDeletions(filename):
+	"""
+	Loads a custom deletions file (identifier, main term and pipe-delimited synonyms to delete on each line)
+
+	Args:
+		filename (str): Deletions file
+
+	Returns:
+		Dictionary of identifier to a frozenset of lowercased terms to delete
+	"""
+	deletions = {}
+	with codecs.open(filename,'r','utf-8') as f:
+		for line in f:
+			termid,singleterm,terms = line.strip().split('\t')
+			deletions[termid] = deletions.get(termid,frozenset()).union( t.lower() for t in terms.split('|') )
+	return deletions
+
+def appendLinesAtomically(filename, lines):
+	"""
+	Adds lines to the end of a curation file in a single write. The new content is written to a temporary file that then replaces the original, so the file is never left partly written. Symlinks (e.g. from working/ into custom/) are followed so the file they point to is updated
+
+	Args:
+		filename (str): Curation file (created if it does not exist)
+		lines (list of str): Lines to add (without newlines)
+
+	Returns:
+		Nothing
+	"""
+	target = os.path.realpath(filename)
+
+	existing = ''
+	if os.path.isfile(target):
+		with codecs.open(target,'r','utf-8') as f:
+			existing = f.read()
+		if existing and not existing.endswith('\n'):
+			existing += '\n'
+
+	with codecs.open(target + '.tmp','w','utf-8') as outF:
+		outF.write(existing + "".join( line + "\n" for line in lines ))
+	os.replace(target + '.tmp', target)
+
+class TermFilter:
+	"""
+	Removes terms for an entity that are custom deletions, stopwords or that fail any of the extra rules, all in one pass. Counts of the terms removed by each rule are kept for reporting.
+
+	Extra rules are (name, function) pairs where the function returns True for terms that should be removed.
+	"""
+	def __init__(self, stopwords=frozenset(), deletions=None, rules=None):
+		self.stopwords = stopwords
+		self.deletions = deletions if deletions is not None else {}
+		self.rules = rules if rules is not None else []
+		self.removed = Counter()
+
+	def filter(self, termid, terms, applyDeletions=True, applyStopwords=True, applyRules=True):
+		"""
+		Filters the terms for an entity. Generators that only apply some of the checks to some of their terms (e.g. not the stopwords to custom additions) can turn the others off
+
+		Args:
+			termid (str): Identifier of the entity (used to find its custom deletions)
+			terms (list of str): Terms to filter
+			applyDeletions (bool): Whether to remove the custom deletions
+			applyStopwords (bool): Whether to remove the stopwords
+			applyRules (bool): Whether to remove the terms that fail the extra rules
+
+		Returns:
+			list of the terms that are kept (in the same order)
+		"""
+		deleted = self.deletions.get(termid,frozenset()) if applyDeletions else frozenset()
+		stopwords = self.stopwords if applyStopwords else frozenset()
+		rules = self.rules if applyRules else []
+
+		kept = []
+		for term in terms:
+			lowered = term.lower()
+			if lowered in deleted:
+				self.removed['custom deletion'] += 1
+			elif lowered in stopwords:
+				self.removed['stopword'] += 1
+			else:
+				for name,rule in rules:
+					if rule(term):
+						self.removed[name] += 1
+						break
+				else:
+					kept.append(term)
+		return kept
+
+	def report(self):
+		"""
+		Prints how many terms were removed by each rule
+
+		Returns:
+			Nothing
+		"""
+		print("Terms removed by each rule:")
+		for name in ['custom deletion','stopword'] + [ name for name,_ in self.rules ]:
+			print("  %s: %d" % (name, self.removed[name]))
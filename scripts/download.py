@@ -0,0 +1,212 @@
+"""
+This script is used to download the source resources (e.g. the Disease Ontology, NCBI gene_info and UniProt) into a local mirror directory. Downloads run concurrently, interrupted downloads are resumed with HTTP range requests and files are only fetched again if the server reports that they have changed (using ETag and Last-Modified).
+
+Any URL handled by urllib can be used, including file:// URLs and local HTTP servers for testing.
+"""
+import argparse
+import concurrent.futures
+import http.client
+import json
+import os
+import shutil
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+# Size of each block read from a download
+BLOCK_SIZE = 1024*1024
+
+def loadMetadata(filename):
+	"""
+	Loads the metadata saved alongside a downloaded file
+
+	Args:
+		filename (str): Downloaded file (the metadata is in the same name with .meta.json appended)
+
+	Returns:
+		Dictionary of metadata (empty if the file has not been downloaded)
+	"""
+	if os.path.isfile(filename + '.meta.json'):
+		with open(filename + '.meta.json') as f:
+			return json.load(f)
+	return {}
+
+def saveMetadata(filename, metadata):
+	"""
+	Saves the metadata alongside a downloaded file
+
+	Args:
+		filename (str): Downloaded file
+		metadata (dict): Metadata to save
+
+	Returns:
+		Nothing
+	"""
+	with open(filename + '.meta.json','w') as outF:
+		json.dump(metadata,outF,indent=2,sort_keys=True)
+
+def copyLocalFile(url, filename):
+	"""
+	Copies a file:// URL if the source file has changed since it was last copied
+
+	Args:
+		url (str): file:// URL of the source
+		filename (str): Destination file
+
+	Returns:
+		True if the file was copied, False if it was already up to date
+	"""
+	source = urllib.request.url2pathname(urllib.parse.urlparse(url).path)
+	stat = os.stat(source)
+	metadata = loadMetadata(filename)
+	if os.path.isfile(filename) and metadata.get('url') == url and metadata.get('size') == stat.st_size and metadata.get('mtime') == stat.st_mtime_ns:
+		return False
+
+	shutil.copyfile(source, filename + '.part')
+	os.replace(filename + '.part', filename)
+	saveMetadata(filename, { 'url':url, 'size':stat.st_size, 'mtime':stat.st_mtime_ns })
+	return True
+
+def fetchOnce(url, filename, timeout):
+	"""
+	Makes a single attempt to download a URL. A partial download (in filename.part) is resumed with a range request and a complete earlier download is only replaced if the server reports a change
+
+	Args:
+		url (str): URL to download
+		filename (str): Destination file
+		timeout (int): Timeout in seconds for the connection
+
+	Returns:
+		True if the file was downloaded, False if it was already up to date
+	"""
+	metadata = loadMetadata(filename)
+	partial = filename + '.part'
+
+	headers = { 'User-Agent':'biowordlists' }
+	offset = 0
+	if os.path.isfile(partial) and metadata.get('partial',{}).get('url') == url:
+		# Resume the download as long as the remote file has not changed since it started
+		offset = os.path.getsize(partial)
+		headers['Range'] = 'bytes=%d-' % offset
+		validator = metadata['partial'].get('etag') or metadata['partial'].get('lastModified')
+		if validator:
+			headers['If-Range'] = validator
+	elif os.path.isfile(filename) and metadata.get('url') == url:
+		if metadata.get('etag'):
+			headers['If-None-Match'] = metadata['etag']
+		if metadata.get('lastModified'):
+			headers['If-Modified-Since'] = metadata['lastModified']
+
+	request = urllib.request.Request(url, headers=headers)
+	try:
+		response = urllib.request.urlopen(request, timeout=timeout)
+	except urllib.error.HTTPError as e:
+		if e.code == 304:
+			return False
+		elif e.code == 416:
+			# The partial download cannot be resumed so start again
+			os.remove(partial)
+			metadata.pop('partial',None)
+			saveMetadata(filename, metadata)
+			return fetchOnce(url, filename, timeout)
+		raise
+
+	with response:
+		resuming = offset > 0 and getattr(response,'status',None) == 206
+
+		validators = { 'url':url, 'etag':response.headers.get('ETag'), 'lastModified':response.headers.get('Last-Modified') }
+		if not resuming:
+			metadata['partial'] = validators
+			saveMetadata(filename, metadata)
+
+		expectedLength = response.headers.get('Content-Length')
+		received = 0
+		with open(partial, 'ab' if resuming else 'wb') as outF:
+			for block in iter(lambda : response.read(BLOCK_SIZE), b''):
+				outF.write(block)
+				received += len(block)
+
+		# A dropped connection can end the response early without an error so check the length (and resume on the retry)
+		if expectedLength is not None and received < int(expectedLength):
+			raise http.client.IncompleteRead(b'', int(expectedLength) - received)
+
+	os.replace(partial, filename)
+	saveMetadata(filename, metadata['partial'])
+	return True
+
+def fetchResource(url, filename, retries=3, timeout=60):
+	"""
+	Downloads a URL to a file with retries, resuming partial downloads where possible. Unchanged files are not downloaded again
+
+	Args:
+		url (str): URL to download
+		filename (str): Destination file
+		retries (int): Number of times to retry after a failure
+		timeout (int): Timeout in seconds for the connection
+
+	Returns:
+		True if the file was downloaded, False if it was already up to date
+	"""
+	if urllib.parse.urlparse(url).scheme == 'file':
+		return copyLocalFile(url, filename)
+
+	for attempt in range(retries+1):
+		try:
+			return fetchOnce(url, filename, timeout)
+		except (OSError, http.client.HTTPException) as e:
+			if isinstance(e, urllib.error.HTTPError) and e.code < 500:
+				raise
+			if attempt == retries:
+				raise
+			print("Retrying %s after error: %s" % (url, str(e)))
+			sys.stdout.flush()
+			time.sleep(2 ** attempt)
+
+def fetchAll(resources, mirrorDir, workers=4, retries=3):
+	"""
+	Downloads multiple resources concurrently into a mirror directory
+
+	Args:
+		resources (list of (str,str)): Filename (within the mirror directory) and URL for each resource
+		mirrorDir (str): Directory to download into
+		workers (int): Maximum number of downloads at once
+		retries (int): Number of times to retry each download after a failure
+
+	Returns:
+		Nothing
+	"""
+	if not os.path.isdir(mirrorDir):
+		os.makedirs(mirrorDir)
+
+	with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+		futures = { executor.submit(fetchResource, url, os.path.join(mirrorDir,name), retries):(name,url) for name,url in resources }
+		for future in concurrent.futures.as_completed(futures):
+			name,url = futures[future]
+			if future.result():
+				print("Downloaded %s from %s" % (name,url))
+			else:
+				print("%s is up to date" % name)
+			sys.stdout.flush()
+
+def main():
+	parser = argparse.ArgumentParser(description='Download resources concurrently into a local mirror, resuming and skipping unchanged files')
+	parser.add_argument('--mirrorDir', required=True, type=str, help='Directory to keep the downloaded files in')
+	parser.add_argument('--workers', required=False, type=int, default=4, help='Maximum number of downloads at once')
+	parser.add_argument('--retries', required=False, type=int, default=3, help='Number of times to retry each download after a failure')
+	parser.add_argument('resources', nargs='+', type=str, help='Resources to download as filename=URL')
+	args = parser.parse_args()
+
+	resources = []
+	for resource in args.resources:
+		assert '=' in resource, "Expected filename=URL but got %s" % resource
+		name,url = resource.split('=',1)
+		resources.append( (name,url) )
+
+	fetchAll(resources, args.mirrorDir, workers=args.workers, retries=args.retries)
+
+	print("Done")
+
+if __name__ == '__main__':
+	main()
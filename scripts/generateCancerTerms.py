@@ -6,6 +6,8 @@ import sys
 import codecs
 import pronto
 from collections import defaultdict
+from umls import IndexTable, readMRCONSO, MRCONSO_CUI, MRCONSO_STR
+from curation import loadStopwords, loadAdditions, loadDeletions, TermFilter
 
 def augmentTermList(terms):
 	"""
@@ -91,76 +93,136 @@ def getSynonyms(term):
 			synonyms.append(s.description.lower())
 	return synonyms
 
-def loadMetathesaurus(filename):
+def loadMetathesaurus(filename, processes=1):
 	"""
 	Loads the UMLS metathesaurus into a dictionary where CUID relates to a set of terms. Only English terms are included
 
 	Args:
 		filename (str): Filename of UMLS Concept file (MRCONSO.RRF)
+		processes (int): Number of processes to parse the file with
 
 	Returns:
 		Dictionary where each key (CUID) points to a list of strings (terms)
 	"""
 	meta = defaultdict(list)
-	with codecs.open(filename,'r','utf8') as f:
-		for line in f:
-			split = line.split('|')
-			cuid = split[0]
-			lang = split[1]
-			term = split[14]
-			if lang != 'ENG':
-				continue
-			meta[cuid].append(term)
+	for cuid,term in readMRCONSO(filename, [MRCONSO_CUI,MRCONSO_STR], lang='ENG', processes=processes):
+		meta[cuid].append(term)
 	return meta
-	
+
+def loadMetathesaurusSubset(filename, wantedCUIDs, wantedNames, processes=1):
+	"""
+	Streams the UMLS metathesaurus once and keeps only the English terms for the requested CUIDs and for any CUID whose first English term matches one of the requested names. This relies on all rows for a CUID being together in the file, which is checked by requiring the CUIDs to be in sorted order (as they are in UMLS releases). If they are not, the whole metathesaurus is loaded instead and the subset taken from it.
+
+	Args:
+		filename (str): Filename of UMLS Concept file (MRCONSO.RRF)
+		wantedCUIDs (set): CUIDs to keep the terms for
+		wantedNames (set): Lowercased names to look for as the first term of a CUID
+		processes (int): Number of processes to parse the file with
+
+	Returns:
+		Tuple of a dictionary where each key (CUID) points to a list of strings (terms) and a dictionary of lowercased first term to CUID (only for the requested names)
+	"""
+	meta = defaultdict(list)
+	mainTerm = {}
+	currentCUID = None
+	keep = False
+	for cuid,term in readMRCONSO(filename, [MRCONSO_CUI,MRCONSO_STR], lang='ENG', processes=processes):
+		# Decide whether to keep a CUID based on its first English term
+		if cuid != currentCUID:
+			if currentCUID is not None and cuid < currentCUID:
+				print("WARNING: %s is not sorted by CUID (%s after %s). Loading the whole metathesaurus instead" % (filename, cuid, currentCUID))
+				return subsetMetathesaurus(loadMetathesaurus(filename, processes=processes), wantedCUIDs, wantedNames)
+			currentCUID = cuid
+			lowered = term.lower()
+			if lowered in wantedNames:
+				mainTerm[lowered] = cuid
+			keep = cuid in wantedCUIDs or lowered in wantedNames
+
+		if keep:
+			meta[cuid].append(term)
+	return meta, mainTerm
+
+def subsetMetathesaurus(metathesaurus, wantedCUIDs, wantedNames):
+	"""
+	Takes the same subset of an already loaded UMLS metathesaurus as loadMetathesaurusSubset
+
+	Args:
+		metathesaurus (dict): Dictionary where each key (CUID) points to a list of strings (terms) from loadMetathesaurus
+		wantedCUIDs (set): CUIDs to keep the terms for
+		wantedNames (set): Lowercased names to look for as the first term of a CUID
+
+	Returns:
+		Tuple of a dictionary where each key (CUID) points to a list of strings (terms) and a dictionary of lowercased first term to CUID (only for the requested names)
+	"""
+	meta = defaultdict(list)
+	mainTerm = {}
+	for cuid,terms in metathesaurus.items():
+		lowered = terms[0].lower()
+		if lowered in wantedNames:
+			mainTerm[lowered] = cuid
+		if cuid in wantedCUIDs or lowered in wantedNames:
+			meta[cuid] = terms
+	return meta, mainTerm
+
 
 def main():
 
 	parser = argparse.ArgumentParser(description='Generate term list from Disease Ontology and UMLS Metathesarus for cancer-specific terms')
 	parser.add_argument('--diseaseOntologyFile', required=True, type=str, help='Path to the Disease Ontology OBO file')
 	parser.add_argument('--cancerStopwords',required=True,type=str,help='File containing cancer terms to ignore')
-	parser.add_argument('--umlsConceptFile', required=True, type=str, help='Path on the MRCONSO.RRF file in UMLS metathesaurus')
+	parser.add_argument('--umlsConceptFile', required=False, type=str, help='Path on the MRCONSO.RRF file in UMLS metathesaurus')
+	parser.add_argument('--umlsIndex', required=False, type=str, help='Path to an index built by buildUMLSIndex.py (used instead of --umlsConceptFile)')
+	parser.add_argument('--umlsSubsetOnly', action='store_true', help='Only load the UMLS terms needed for the cancer types from --umlsConceptFile to reduce memory')
+	parser.add_argument('--processes', required=False, type=int, default=1, help='Number of processes to parse --umlsConceptFile with')
 	parser.add_argument('--customAdditions', required=False, type=str, help='Some custom additions to the wordlist')
 	parser.add_argument('--customDeletions', required=False, type=str, help='Some custom deletions from the wordlist')
 	parser.add_argument('--outFile', required=True, type=str, help='Path to output wordlist file')
 	args = parser.parse_args()
 
-	print("Loading metathesaurus...")
-	metathesaurus = loadMetathesaurus(args.umlsConceptFile)
-	metathesaurusMainTerm = { terms[0].lower():cuid for cuid,terms in metathesaurus.items() }
+	assert args.umlsConceptFile or args.umlsIndex, "One of --umlsConceptFile or --umlsIndex must be provided"
 
 	print("Loading disease ontology...")
 	ont = pronto.Ontology(args.diseaseOntologyFile)
 	cancerRoot = ont.get('DOID:162')
 
+	# Skip down to the children of the cancer term and then find all their descendents (recursive children)
+	cancerImmediateChildren = cancerRoot.subclasses(1)
+	cancerTypes = [ c for c in cancerRoot.subclasses() if not c in cancerImmediateChildren ]
+
+	print("Loading metathesaurus...")
+	if args.umlsIndex:
+		metathesaurus = IndexTable(args.umlsIndex, 'cui')
+		metathesaurusMainTerm = IndexTable(args.umlsIndex, 'name')
+	elif args.umlsSubsetOnly:
+		wantedCUIDs = set( cuid for term in cancerTypes if not term.obsolete for cuid in getCUIDs(term) )
+		wantedNames = set( term.name.lower() for term in cancerTypes if not term.obsolete )
+		metathesaurus, metathesaurusMainTerm = loadMetathesaurusSubset(args.umlsConceptFile, wantedCUIDs, wantedNames, processes=args.processes)
+	else:
+		metathesaurus = loadMetathesaurus(args.umlsConceptFile, processes=args.processes)
+		metathesaurusMainTerm = { terms[0].lower():cuid for cuid,terms in metathesaurus.items() }
+
 	print("Loading cancer stopwords...")
-	with codecs.open(args.cancerStopwords,'r','utf8') as f:
-		cancerstopwords = [ line.strip().lower() for line in f ]
-		cancerstopwords = set(cancerstopwords)
+	cancerstopwords = loadStopwords(args.cancerStopwords)
 
 	id_to_name = {}
 	id_to_synonyms = defaultdict(list)
 	if args.customAdditions:
 		print("Loading additions...")
-		with codecs.open(args.customAdditions,'r','utf-8') as f:
-			for line in f:
-				termid,singleterm,terms = line.strip().split('\t')
-				id_to_name[termid] = singleterm
-				id_to_synonyms[termid] += terms.split('|')
+		additionNames,additionSynonyms = loadAdditions(args.customAdditions)
+		id_to_name.update(additionNames)
+		for termid,terms in additionSynonyms.items():
+			id_to_synonyms[termid] += terms
 
-	customDeletions = defaultdict(list)
+	customDeletions = {}
 	if args.customDeletions:
 		print("Loading deletions...")
-		with codecs.open(args.customDeletions,'r','utf-8') as f:
-			for line in f:
-				termid,singleterm,terms = line.strip().split('\t')
-				customDeletions[termid] += terms.split('|')
+		customDeletions = loadDeletions(args.customDeletions)
+
+	# Filter out general terms and custom deletions
+	termFilter = TermFilter(stopwords=cancerstopwords, deletions=customDeletions)
 
 	print("Processing...")
 
-	# Skip down to the children of the cancer term and then find all their descendents (recursive children)
-	cancerImmediateChildren = cancerRoot.subclasses(1)
-	cancerTypes = [ c for c in cancerRoot.subclasses() if not c in cancerImmediateChildren ]
 	for term in cancerTypes:
 		# Skip obsolete terms
 		if term.obsolete:
@@ -193,9 +255,6 @@ def main():
 		# Add in custom additions
 		mmterms += id_to_synonyms[term.id]
 
-		# Remove custom deletions
-		mmterms = [ mmterm for mmterm in mmterms if not mmterm in customDeletions[term.id] ]
-
 		if not term.id in id_to_name:
 			id_to_name[term.id] = term.name
 		id_to_synonyms[term.id] = mmterms
@@ -207,11 +266,8 @@ def main():
 		# Lowercase everything
 		mmterms = [ mmterm.lower() for mmterm in mmterms ]
 		
-		# Filter out general terms
-		mmterms = [ mmterm for mmterm in mmterms if not mmterm in cancerstopwords ]
-
-		# Remove custom deletions
-		mmterms = [ mmterm for mmterm in mmterms if not mmterm in customDeletions[termid] ]
+		# Filter out general terms and custom deletions
+		mmterms = termFilter.filter(termid, mmterms)
 
 		# Add extra spellings and plurals
 		mmterms = augmentTermList(mmterms)
@@ -222,6 +278,8 @@ def main():
 		if len(mmterms) > 0:
 			allterms.append( (termid, name, "|".join(mmterms)) )
 
+	termFilter.report()
+
 	print("Post-filtering...")
 	mapping = defaultdict(list)
 	properNames = set()
@@ -1,43 +1,68 @@
 import argparse
 import codecs
-from collections import defaultdict
+from curation import loadDeletions, TermFilter
+from wordlists import readWordlist
+
+def makeInhibitorTerms(allgeneterms):
+	"""
+	Makes all the inhibitor terms for the synonyms of a gene
+
+	Args:
+		allgeneterms (list of str): Synonyms of the gene
+
+	Returns:
+		list of inhibitor terms (including lowercase copies)
+	"""
+	alldrugterms = []
+	alldrugterms += [ "%s inhibitor" % g for g in allgeneterms ]
+	alldrugterms += [ "%s inhibitors" % g for g in allgeneterms ]
+	alldrugterms += [ "inhibitor of %s" % g for g in allgeneterms ]
+	alldrugterms += [ "inhibitors of %s" % g for g in allgeneterms ]
+
+	alldrugterms += [ d.lower() for d in alldrugterms ]
+	return alldrugterms
 
 if __name__ == '__main__':
 	parser = argparse.ArgumentParser(description='Make an exhaustive list of gene inhibitors given a list of genes')
 	parser.add_argument('--geneTerms',required=True,type=str,help='Gene terms to use as input')
 	parser.add_argument('--customDeletions', required=False, type=str, help='Some custom deletions from the wordlist')
-	parser.add_argument('--outFile',required=True,type=str,help='Output file')
+	parser.add_argument('--outFile',required=False,type=str,help='Output file')
+	parser.add_argument('--outTemplates',required=False,type=str,help='Output file of inhibitor templates that reference the gene IDs (resolved by the matcher) instead of every inhibitor term')
 	args = parser.parse_args()
 
-	customDeletions = defaultdict(list)
+	assert args.outFile or args.outTemplates, "Either --outFile or --outTemplates is needed"
+
+	customDeletions = {}
 	if args.customDeletions:
 		print("Loading deletions...")
-		with codecs.open(args.customDeletions,'r','utf-8') as f:
-			for line in f:
-				termid,singleterm,terms = line.strip().split('\t')
-				customDeletions[termid] += terms.split('|')
-	
-	with codecs.open(args.geneTerms,'r','utf-8') as inGenes, codecs.open(args.outFile,'w','utf-8') as outDrugs:
-		for line in inGenes:
-			geneid,singlegeneterm,allgeneterms,entrez_gene_id = line.strip().split('\t')
-			allgeneterms = allgeneterms.split('|')
+		customDeletions = loadDeletions(args.customDeletions)
 
-			drugid = "inhibitor|%s" % geneid
-			singledrugterm = "%s inhibitor" % singlegeneterm
+	termFilter = TermFilter(deletions=customDeletions)
 
-			alldrugterms = []
-			alldrugterms += [ "%s inhibitor" % g for g in allgeneterms ]
-			alldrugterms += [ "%s inhibitors" % g for g in allgeneterms ]
-			alldrugterms += [ "inhibitor of %s" % g for g in allgeneterms ]
-			alldrugterms += [ "inhibitors of %s" % g for g in allgeneterms ]
+	outDrugs = codecs.open(args.outFile,'w','utf-8') if args.outFile else None
+	outTemplates = codecs.open(args.outTemplates,'w','utf-8') if args.outTemplates else None
 
-			alldrugterms += [ d.lower() for d in alldrugterms ]
+	for geneid,singlegeneterm,allgeneterms in readWordlist(args.geneTerms):
+		drugid = "inhibitor|%s" % geneid
+		singledrugterm = "%s inhibitor" % singlegeneterm
 
-			alldrugterms = [ d for d in alldrugterms if not d in customDeletions[drugid] ]
+		if outTemplates:
+			# Only the deleted terms are stored (the matcher generates the rest around the gene matches)
+			deleted = customDeletions.get(drugid,frozenset())
+			exclusions = sorted(set( d.lower() for d in makeInhibitorTerms(allgeneterms) if d.lower() in deleted ))
+			outTemplates.write("%s\t%s\t%s\t%s\n" % (drugid,singledrugterm,geneid,"|".join(exclusions)))
 
-			alldrugterms = sorted(list(set(alldrugterms)))
+		if outDrugs:
+			alldrugterms = termFilter.filter(drugid, sorted(set(makeInhibitorTerms(allgeneterms))))
 
 			outDrugs.write("%s\t%s\t%s\n" % (drugid,singledrugterm,"|".join(alldrugterms)))
 
+	for f in [outDrugs,outTemplates]:
+		if f:
+			f.close()
+
+	if outDrugs:
+		termFilter.report()
+
 	print("Done")
 
@@ -1,24 +1,22 @@
-#import sparql
-import SPARQLWrapper
 import argparse
 import codecs
-import six
 from collections import defaultdict
-
-def runQuery(query):
-	endpoint = 'https://query.wikidata.org/sparql'
-	sparql = SPARQLWrapper.SPARQLWrapper(endpoint)
-	sparql.setQuery(query)
-	sparql.setReturnFormat(SPARQLWrapper.JSON)
-	results = sparql.query().convert()
-
-	return results['results']['bindings']
+from curation import loadStopwords, loadAdditions, loadDeletions, TermFilter
+from wikidata import WIKIDATA_ENDPOINT, queryInstances, readDumpEntities, loadSubclasses
 
 if __name__ == '__main__':
 	parser = argparse.ArgumentParser(description='Tool to pull certain triple types from WikiData using SPARQL')
 	parser.add_argument('--drugStopwords',required=True,type=str,help='Stopword file for drugs')
 	parser.add_argument('--customAdditions', required=False, type=str, help='Some custom additions to the wordlist')
 	parser.add_argument('--customDeletions', required=False, type=str, help='Some custom deletions from the wordlist')
+	parser.add_argument('--endpoint',type=str,required=False,default=WIKIDATA_ENDPOINT,help='SPARQL endpoint to query')
+	parser.add_argument('--cacheDir',type=str,required=False,help='Directory to cache the query responses in (for the day)')
+	parser.add_argument('--pageSize',type=int,required=False,default=10000,help='Number of drugs requested in each query')
+	parser.add_argument('--workers',type=int,required=False,default=4,help='Maximum number of queries at once')
+	parser.add_argument('--wikidataDump',type=str,required=False,help='Wikidata JSON dump (optionally gzip or bz2 compressed) to read the drugs from instead of querying the endpoint')
+	parser.add_argument('--processes',type=int,required=False,default=1,help='Number of processes to parse the dump with')
+	parser.add_argument('--noSubclasses',action='store_true',help='Only include drugs that are instances of medication itself and not of its subclasses')
+	parser.add_argument('--hierarchyFile',type=str,required=False,help='Class hierarchy to reuse between runs (rebuilt if it was built from another dump, class or property or, without a dump, not built today)')
 	parser.add_argument('--outFile',type=str,required=True,help='File to output triples')
 	args = parser.parse_args()
 
@@ -26,29 +24,21 @@ if __name__ == '__main__':
 	aliases = defaultdict(set)
 
 	print("Loading stopwords...")
-	with codecs.open(args.drugStopwords,'r','utf8') as f:
-		stopwords = [ line.strip().lower() for line in f ]
-		stopwords = set(stopwords)
+	stopwords = loadStopwords(args.drugStopwords)
 
 	if args.customAdditions:
 		print("Loading additions...")
-		with codecs.open(args.customAdditions,'r','utf-8') as f:
-			for line in f:
-				termid,singleterm,terms = line.strip().split('\t')
-				mainterm[termid] = singleterm
-				aliases[termid].update(terms.split('|'))
+		additionNames,additionSynonyms = loadAdditions(args.customAdditions)
+		mainterm.update(additionNames)
+		for termid,terms in additionSynonyms.items():
+			aliases[termid].update(terms)
 	
-	customDeletions = defaultdict(list)
+	customDeletions = {}
 	if args.customDeletions:
 		print("Loading deletions...")
-		with codecs.open(args.customDeletions,'r','utf-8') as f:
-			for line in f:
-				termid,singleterm,terms = line.strip().split('\t')
-				customDeletions[termid] += terms.split('|')
-
-	print("Gathering drugs and aliases from Wikidata")
-
+		customDeletions = loadDeletions(args.customDeletions)
 
+	termFilter = TermFilter(stopwords=stopwords, deletions=customDeletions, rules=[('short', lambda x : len(x) <= 3)])
 
 	rowCount = 0
 
@@ -56,26 +46,46 @@ if __name__ == '__main__':
 	instanceOfID = "P31"
 	subclassOfID = "P279"
 
-	query = """
-	SELECT ?item1 ?item1Label ?alias WHERE {
-		SERVICE wikibase:label { bd:serviceParam wikibase:language "[AUTO_LANGUAGE],en". }
-		?item1 wdt:%s wd:%s.
-		OPTIONAL {?item1 skos:altLabel ?alias FILTER (LANG (?alias) = "en") .}
-	} 
-	""" % (instanceOfID,medicationID)
+	queryOptions = { 'endpoint':args.endpoint, 'cacheDir':args.cacheDir, 'pageSize':args.pageSize, 'workers':args.workers }
+
+	drugClasses = [medicationID]
+	if not args.noSubclasses:
+		drugClasses = sorted(loadSubclasses(medicationID, propertyID=subclassOfID, hierarchyFile=args.hierarchyFile, wikidataDump=args.wikidataDump, processes=args.processes, **queryOptions))
+		print("  Using %d classes of drugs (medication and its subclasses)" % len(drugClasses))
+
+	if args.wikidataDump:
+		print("Gathering drugs and aliases from Wikidata dump")
+
+		# This is a second pass over the dump (after the one for the subclass edges, unless the hierarchy file was reused) as the classes are only known once every edge has been read, and keeping every entity with a label until then would take far more memory than reading the dump again
+
+		for entityID,label,entityAliases in readDumpEntities(args.wikidataDump, drugClasses, propertyID=instanceOfID, processes=args.processes):
+			# Use the same identifiers as the SPARQL results
+			drugID = 'http://www.wikidata.org/entity/%s' % entityID
+			mainterm[drugID] = label.lower()
+			aliases[drugID].update( a.lower() for a in entityAliases )
 
-	for row in runQuery(query):
-		#print(row)
-		drugID = row['item1']['value']
+			rowCount += 1
+	else:
+		print("Gathering drugs and aliases from Wikidata")
 
-		if 'xml:lang' in row['item1Label'] and row['item1Label']['xml:lang'] == 'en':
-			mainterm[drugID] = row['item1Label']['value'].lower()
+		# The drugs are requested a page at a time (for batches of the classes) as a single query for all of them can hit the endpoint's timeout
+		rows = queryInstances(drugClasses, propertyID=instanceOfID,
+			rowPatterns="""SERVICE wikibase:label { bd:serviceParam wikibase:language "[AUTO_LANGUAGE],en". }
+			OPTIONAL {?item1 skos:altLabel ?alias FILTER (LANG (?alias) = "en") .}""",
+			**queryOptions)
 
-			if 'alias' in row:
-				if row['alias']['xml:lang'] == 'en':
-					aliases[drugID].add(row['alias']['value'].lower())
+		for row in rows:
+			#print(row)
+			drugID = row['item1']['value']
 
-		rowCount += 1
+			if 'xml:lang' in row['item1Label'] and row['item1Label']['xml:lang'] == 'en':
+				mainterm[drugID] = row['item1Label']['value'].lower()
+
+				if 'alias' in row:
+					if row['alias']['xml:lang'] == 'en':
+						aliases[drugID].add(row['alias']['value'].lower())
+
+			rowCount += 1
 
 	print ("  Got %d drugs (from %d rows)" % (len(mainterm),rowCount))
 
@@ -84,22 +94,20 @@ if __name__ == '__main__':
 		for k in keys:
 			combined = aliases[k]
 			combined.add(mainterm[k])
-			combined = [ t for t in combined if not t in stopwords ]
-			combined = [ t for t in combined if len(t) > 3 ]
-			combined += [ t.replace('\N{REGISTERED SIGN}','').strip() for t in combined ]
-
 
 			shortID = k.split('/')[-1]
 
-			combined = [ t for t in combined if not t in customDeletions[shortID] ]
-
-			combined = [ t.lower() for t in combined ]
+			# The stopwords and length rule apply to the names before the registered signs are removed (the stripped copies are only checked against the deletions)
+			combined = termFilter.filter(shortID, sorted(combined), applyDeletions=False)
+			combined += [ t.replace('\N{REGISTERED SIGN}','').strip() for t in combined ]
 
-			combined = sorted(list(set(combined)))
+			combined = termFilter.filter(shortID, sorted(set( t.lower() for t in combined )), applyStopwords=False, applyRules=False)
 
 			if len(combined) > 0:
 				data = [shortID,mainterm[k],"|".join(combined)]
 				f.write("\t".join(data) + "\n")
 
+	termFilter.report()
+
 
 
@@ -6,6 +6,9 @@ import sys
 import codecs
 from collections import defaultdict
 import gzip
+import os
+from umls import IndexTable, getCodeKey, readMRCONSO, MRCONSO_CODE, MRCONSO_STR
+from curation import loadStopwords, loadAdditions, loadDeletions, TermFilter
 
 def cleanupQuotes(text):
 	"""
@@ -22,72 +25,80 @@ def cleanupQuotes(text):
 	else:
 	 	return text
 
-def loadHGNCToUMLSTerms(filename):
+def loadHGNCToUMLSTerms(filename, processes=1):
 	"""
-	Loads the UMLS metathesaurus and extracts mappings from Hugo GeneIDs to UMLS terms
+	Loads the UMLS metathesaurus and extracts mappings from Hugo GeneIDs to UMLS terms (keyed in the same way as the code table of a Metathesaurus index)
 
 	Args:
 		filename (str): Filename of UMLS Concept file (MRCONSO.RRF)
+		processes (int): Number of processes to parse the file with
 
 	Returns:
-		Dictionary where each key (CUID) points to a list of strings (terms)
+		Dictionary where each key (HGNC source and GeneID, see getCodeKey) points to a list of strings (terms)
 	"""
 	mapping = defaultdict(list)
-	with codecs.open(filename,'r','utf8') as f:
-		for line in f:
-			split = line.split('|')
-			cuid = split[0]
-			lang = split[1]
-			externalID = split[13]
-			term = split[14]
-			if lang != 'ENG':
-				continue
-
-			if externalID.startswith('HGNC:'):
-				mapping[externalID].append(term)
+	for externalID,term in readMRCONSO(filename, [MRCONSO_CODE,MRCONSO_STR], lang='ENG', sab='HGNC', codePrefix='HGNC:', processes=processes):
+		mapping[getCodeKey('HGNC',externalID)].append(term)
 	return mapping
 
 if __name__ == '__main__':
 
 	parser = argparse.ArgumentParser(description='Generate term list from NCBI gene resource')
 	parser.add_argument('--ncbiGeneInfoFile', required=True, type=str, help='Path to NCBI Gene Info file')
-	parser.add_argument('--umlsConceptFile', required=True, type=str, help='Path on the MRCONSO.RRF file in UMLS metathesaurus')
+	parser.add_argument('--ncbiHumanGeneInfoFile', required=False, type=str, help='Path to the human-only NCBI Gene Info file (Homo_sapiens.gene_info.gz) to use instead if it exists')
+	parser.add_argument('--umlsConceptFile', required=False, type=str, help='Path on the MRCONSO.RRF file in UMLS metathesaurus')
+	parser.add_argument('--umlsIndex', required=False, type=str, help='Path to an index built by buildUMLSIndex.py (used instead of --umlsConceptFile)')
+	parser.add_argument('--processes', required=False, type=int, default=1, help='Number of processes to parse --umlsConceptFile with')
 	parser.add_argument('--geneStopwords',required=True,type=str,help='Stopword file for genes')
 	parser.add_argument('--customAdditions', required=False, type=str, help='Some custom additions to the wordlist')
 	parser.add_argument('--customDeletions', required=False, type=str, help='Some custom deletions from the wordlist')
 	parser.add_argument('--outFile', required=True, type=str, help='Path to output wordlist file')
 	args = parser.parse_args()
 
+	assert args.umlsConceptFile or args.umlsIndex, "One of --umlsConceptFile or --umlsIndex must be provided"
+
 	genes = []
 
 	print("Loading metathesaurus...")
-	hugoToMetathesaurus = loadHGNCToUMLSTerms(args.umlsConceptFile)
+	if args.umlsIndex:
+		hugoToMetathesaurus = IndexTable(args.umlsIndex, 'code')
+	else:
+		hugoToMetathesaurus = loadHGNCToUMLSTerms(args.umlsConceptFile, processes=args.processes)
 
 	print("Loading stopwords...")
-	with codecs.open(args.geneStopwords,'r','utf8') as f:
-		geneStopwords = [ line.strip().lower() for line in f ]
-		geneStopwords = set(geneStopwords)
+	geneStopwords = loadStopwords(args.geneStopwords)
 
-	customAdditions = defaultdict(list)
+	customAdditions = {}
 	if args.customAdditions:
 		print("Loading additions...")
-		with codecs.open(args.customAdditions,'r','utf-8') as f:
-			for line in f:
-				termid,singleterm,terms = line.strip().split('\t')
-				customAdditions[termid] += terms.split('|')
-	customDeletions = defaultdict(list)
+		_,customAdditions = loadAdditions(args.customAdditions)
+	customDeletions = {}
 	if args.customDeletions:
 		print("Loading deletions...")
-		with codecs.open(args.customDeletions,'r','utf-8') as f:
-			for line in f:
-				termid,singleterm,terms = line.strip().split('\t')
-				customDeletions[termid] += terms.split('|')
+		customDeletions = loadDeletions(args.customDeletions)
+
+	# Remove instances with commas, any syndromes and short names (as well as deletions and stopwords)
+	endings_to_skip = ('syndrome','cancer','disease')
+	termFilter = TermFilter(stopwords=geneStopwords, deletions=customDeletions, rules=[
+		('comma', lambda x : "," in x),
+		('disease ending', lambda x : x.endswith(endings_to_skip)),
+		('short', lambda x : len(x) < 3) ])
 
 	print("Processing")
 	skipCount = 0
-	with gzip.open(args.ncbiGeneInfoFile,'rt',encoding='utf8') as ncbiF:
+	# The human-only file from NCBI has the same format but is much smaller so use it if it is available
+	geneInfoFile = args.ncbiGeneInfoFile
+	if args.ncbiHumanGeneInfoFile and os.path.isfile(args.ncbiHumanGeneInfoFile):
+		print("Using human gene info file %s" % args.ncbiHumanGeneInfoFile)
+		geneInfoFile = args.ncbiHumanGeneInfoFile
+
+	with gzip.open(geneInfoFile,'rb') as ncbiF:
 		for line in ncbiF:
-			split = line.rstrip('\n\r').split('\t')
+			# Skip other organisms before doing any decoding or splitting
+			if not line.startswith(b'9606\t'):
+				continue
+
+			split = line.decode('utf8').rstrip('\n\r').split('\t')
 
 			# Get the relevant fields for the gene
 			taxonomy_id = split[0]
@@ -118,37 +129,25 @@ if __name__ == '__main__':
 
 				# Add in names from the Metathesaurus
 				metathesaurusTerms = []
-				if hugo_id in hugoToMetathesaurus:
-					metathesaurusTerms = hugoToMetathesaurus[hugo_id]
+				if getCodeKey('HGNC',hugo_id) in hugoToMetathesaurus:
+					metathesaurusTerms = hugoToMetathesaurus[getCodeKey('HGNC',hugo_id)]
 				allNames = allNames + metathesaurusTerms
 
-				allNames += customAdditions[hugo_id]
-
-				allNames = [ x.strip().lower() for x in allNames ]
-				allNames = [ x for x in allNames if x ]
-				allNames = [ x for x in allNames if x != '-' ]
-				allNames = [ cleanupQuotes(x) for x in allNames ]
+				allNames += customAdditions.get(hugo_id,())
 
-				# Try adding a few extra synonyms (by removing the final word gene, e.g. KRAS gene -> KRAS)
-				extraNames = []
+				names = set()
 				for name in allNames:
-					if name.endswith(' gene'):
-						extraNames.append(name[:-len(' gene')])
-				allNames = allNames + extraNames
-
-				allNames = [ x for x in allNames if not x in customDeletions[hugo_id] ]
-				
-				# Remove instances with commas
-				allNames = [ x for x in allNames if not "," in x ]
+					name = name.strip().lower()
+					if not name or name == '-':
+						continue
+					name = cleanupQuotes(name)
+					names.add(name)
 
-				# Remove any syndromes
-				endings_to_skip = ['syndrome','cancer','disease']
-				allNames = [ x for x in allNames if not any (x.lower().endswith(ending) for ending in endings_to_skip) ]
+					# Try adding a few extra synonyms (by removing the final word gene, e.g. KRAS gene -> KRAS)
+					if name.endswith(' gene'):
+						names.add(name[:-len(' gene')])
 
-				# Remove any duplicates
-				noDuplicates = sorted(list(set(allNames)))
-				noDuplicates = [ g for g in noDuplicates if not g in geneStopwords ]
-				noDuplicates = [ g for g in noDuplicates if len(g) >= 3 ]
+				noDuplicates = termFilter.filter(hugo_id, sorted(names))
 
 				if len(noDuplicates) > 0:
 
@@ -158,6 +157,7 @@ if __name__ == '__main__':
 					genes.append(gene)
 
 	print("%d items skipped as no HUGO ID could be found" % skipCount)
+	termFilter.report()
 	genes = sorted(genes)
 
 	with codecs.open(args.outFile,'w','utf8') as outF:
@@ -6,6 +6,7 @@ import sys
 import codecs
 import pronto
 from collections import defaultdict
+from umls import IndexTable, readMRCONSO, MRCONSO_CUI, MRCONSO_STR
 
 def tidyTermList(terms):
 	"""
@@ -88,15 +89,8 @@ def loadMetathesaurus(filename):
 		Dictionary where each key (CUID) points to a list of strings (terms)
 	"""
 	meta = defaultdict(list)
-	with codecs.open(filename,'r','utf8') as f:
-		for line in f:
-			split = line.split('|')
-			cuid = split[0]
-			lang = split[1]
-			term = split[14]
-			if lang != 'ENG':
-				continue
-			meta[cuid].append(term)
+	for cuid,term in readMRCONSO(filename, [MRCONSO_CUI,MRCONSO_STR], lang='ENG'):
+		meta[cuid].append(term)
 	return meta
 	
 if __name__ == '__main__':
@@ -104,23 +98,29 @@ if __name__ == '__main__':
 	parser = argparse.ArgumentParser(description='Generate term list from an ontology file and UMLS Metathesarus for cancer-specific terms')
 	parser.add_argument('--ontologyFile', required=True, type=str, help='Path to the Disease Ontology OBO file')
 	parser.add_argument('--stopwordsFile',required=True,type=str,help='File containing terms to ignore')
-	parser.add_argument('--umlsConceptFile', required=True, type=str, help='Path on the MRCONSO.RRF file in UMLS metathesaurus')
+	parser.add_argument('--umlsConceptFile', required=False, type=str, help='Path on the MRCONSO.RRF file in UMLS metathesaurus')
+	parser.add_argument('--umlsIndex', required=False, type=str, help='Path to an index built by buildUMLSIndex.py (used instead of --umlsConceptFile)')
 	parser.add_argument('--outFile', required=True, type=str, help='Path to output wordlist file')
 	args = parser.parse_args()
 
-	print "Loading metathesaurus..."
-	metathesaurus = loadMetathesaurus(args.umlsConceptFile)
+	assert args.umlsConceptFile or args.umlsIndex, "One of --umlsConceptFile or --umlsIndex must be provided"
 
-	print "Loading disease ontology..."
+	print("Loading metathesaurus...")
+	if args.umlsIndex:
+		metathesaurus = IndexTable(args.umlsIndex, 'cui')
+	else:
+		metathesaurus = loadMetathesaurus(args.umlsConceptFile)
+
+	print("Loading disease ontology...")
 	ont = pronto.Ontology(args.ontologyFile)
 	#cancerTerm = findTerm(ont,'cancer')
 
-	print "Loading stopwords..."
+	print("Loading stopwords...")
 	with codecs.open(args.stopwordsFile,'r','utf8') as f:
 		stopwords = [ line.strip().lower() for line in f ]
 		stopwords = set(stopwords)
 
-	print "Processing"
+	print("Processing")
 	allterms = []
 	# Skip down to the grandchildren of the cancer term and then find all their descendents (recursive children)
 	count = 0
@@ -161,15 +161,15 @@ if __name__ == '__main__':
 			allterms.append(tmpterm)
 	
 	allterms = sorted(allterms)
-	print "Generated %d terms" % len(allterms)
+	print("Generated %d terms" % len(allterms))
 	
-	print "Outputting to file..."
+	print("Outputting to file...")
 	with codecs.open(args.outFile,'w','utf8') as outF:
 		for termid, termtext in allterms:
 			line = u"%s\t%s\n" % (termid,termtext)
 			outF.write(line)
 	
-	print "Successfully output to %s" % args.outFile
+	print("Successfully output to %s" % args.outFile)
 
 		
 
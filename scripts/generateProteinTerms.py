@@ -1,8 +1,160 @@
+
 import argparse
-import codecs
-from collections import defaultdict
-import xml.etree.cElementTree as etree
+import xml.etree.ElementTree as etree
 import gzip
+import multiprocessing
+import re
+from curation import loadStopwords, loadAdditions, loadDeletions, TermFilter
+
+UNIPROT_NS = '{http://uniprot.org/uniprot}'
+ORGANISM_TAG = UNIPROT_NS + 'organism'
+
+# Used to find the start of each entry in the raw XML
+ENTRY_START = re.compile(rb'<entry[\s>]')
+ENTRY_END = b'</entry>'
+
+# Raw text that a human entry must contain (checked before parsing an entry block)
+HUMAN_TAXONOMY = b'<dbReference type="NCBI Taxonomy" id="9606"'
+
+def isHumanOrganism(organism):
+	"""
+	Checks whether an organism element of a UniProt entry refers to human (NCBI Taxonomy 9606)
+
+	Args:
+		organism (Element): The organism element
+
+	Returns:
+		True if it is human
+	"""
+	for taxonomy in organism.iterfind(UNIPROT_NS + 'dbReference'):
+		if taxonomy.attrib['type'] == 'NCBI Taxonomy' and taxonomy.attrib['id'] == '9606':
+			return True
+	return False
+
+def getEntryNames(entry):
+	"""
+	Gets the accession, the entry name and all the protein names for a UniProt entry
+
+	Args:
+		entry (Element): The entry element
+
+	Returns:
+		tuple of accession, name and list of all names (including the name)
+	"""
+	accessions = entry.findall('./{http://uniprot.org/uniprot}accession')
+	accession = accessions[0].text
+
+	names = entry.findall('./{http://uniprot.org/uniprot}name')
+	assert len(names) == 1
+	name = names[0].text
+
+	recommendedNames = entry.findall('./{http://uniprot.org/uniprot}protein/{http://uniprot.org/uniprot}recommendedName/{http://uniprot.org/uniprot}fullName')
+	recommendedNames = [ x.text for x in recommendedNames ]
+
+	alternativeNames = entry.findall('./{http://uniprot.org/uniprot}protein/{http://uniprot.org/uniprot}alternativeName/{http://uniprot.org/uniprot}fullName')
+	alternativeNames = [ x.text for x in alternativeNames ]
+
+	#print(accession,name,recommendedNames,alternativeNames)
+
+	return accession, name, [name] + recommendedNames + alternativeNames
+
+def iterEntryBlocks(openfile, readSize=16*1024*1024):
+	"""
+	Splits a UniProt XML file into the raw text of each entry element without parsing it
+
+	Args:
+		openfile (file): Open UniProt XML file (in binary mode)
+		readSize (int): Number of bytes to read at a time
+
+	Returns:
+		generator of bytes for each entry
+	"""
+	buffer = b''
+	finished = False
+	while not finished:
+		data = openfile.read(readSize)
+		finished = len(data) == 0
+		buffer += data
+
+		position = 0
+		while True:
+			match = ENTRY_START.search(buffer, position)
+			if match is None:
+				# Keep enough to catch an entry tag split across reads
+				position = max(position, len(buffer) - len(ENTRY_END))
+				break
+			end = buffer.find(ENTRY_END, match.start())
+			if end == -1:
+				position = match.start()
+				break
+			yield buffer[match.start():end+len(ENTRY_END)]
+			position = end + len(ENTRY_END)
+		buffer = buffer[position:]
+
+def parseEntryBlocks(blocks):
+	"""
+	Parses a batch of raw entry blocks and gets the names for the human entries. Blocks without the human taxonomy are rejected before they are parsed and each human entry is parsed on its own. Used by iterHumanEntryNames (and run in worker processes)
+
+	Args:
+		blocks (list of bytes): Raw text of each entry element
+
+	Returns:
+		list of tuples of accession, name and list of all names (see getEntryNames)
+	"""
+	results = []
+	for block in blocks:
+		if not HUMAN_TAXONOMY in block:
+			continue
+
+		# The blocks are outside the root element so add the namespace that they would inherit
+		entry = etree.fromstring(b'<entry xmlns="http://uniprot.org/uniprot"' + block[len(b'<entry'):])
+		organism = entry.find(ORGANISM_TAG)
+		if organism is not None and isHumanOrganism(organism):
+			results.append(getEntryNames(entry))
+	return results
+
+def iterBatches(items, batchSize):
+	"""
+	Groups items into lists of a fixed size (the last may be shorter)
+
+	Args:
+		items (iterable): Items to group
+		batchSize (int): Number of items in each batch
+
+	Returns:
+		generator of lists
+	"""
+	batch = []
+	for item in items:
+		batch.append(item)
+		if len(batch) == batchSize:
+			yield batch
+			batch = []
+	if batch:
+		yield batch
+
+def iterHumanEntryNames(openfile, processes=1, batchSize=1000):
+	"""
+	Gets the names of every human entry in a UniProt XML file in file order. The file is streamed as raw entry blocks (so no tree of the earlier entries is kept) which are parsed in batches, by a pool of processes if requested
+
+	Args:
+		openfile (file): Open UniProt XML file (in binary mode)
+		processes (int): Number of processes to parse with
+		batchSize (int): Number of entry blocks parsed at once
+
+	Returns:
+		generator of tuples of accession, name and list of all names (see getEntryNames)
+	"""
+	batches = iterBatches(iterEntryBlocks(openfile), batchSize)
+	if processes > 1:
+		with multiprocessing.Pool(processes) as pool:
+			for results in pool.imap(parseEntryBlocks, batches):
+				for result in results:
+					yield result
+	else:
+		for batch in batches:
+			for result in parseEntryBlocks(batch):
+				yield result
 
 def main():
 	parser = argparse.ArgumentParser('Generate protein word-list based on UniProt data')
@@ -11,90 +163,55 @@ def main():
 	parser.add_argument('--customAdditions', required=False, type=str, help='Some custom additions to the wordlist')
 	parser.add_argument('--customDeletions', required=False, type=str, help='Some custom deletions from the wordlist')
 	parser.add_argument('--outFile', required=True, type=str, help='Path to output wordlist file')
+	parser.add_argument('--processes', required=False, type=int, default=1, help='Number of processes to parse the UniProt entries with')
 	args = parser.parse_args()
 
 	print("Loading stopwords...")
-	with codecs.open(args.proteinStopwords,'r','utf8') as f:
-		proteinStopwords = [ line.strip().lower() for line in f ]
-		proteinStopwords = set(proteinStopwords)
+	proteinStopwords = loadStopwords(args.proteinStopwords)
 
-	customAdditions = defaultdict(list)
+	customAdditions = {}
 	if args.customAdditions:
 		print("Loading additions...")
-		with codecs.open(args.customAdditions,'r','utf-8') as f:
-			for line in f:
-				termid,singleterm,terms = line.strip().split('\t')
-				customAdditions[termid] += terms.split('|')
-	customDeletions = defaultdict(list)
+		_,customAdditions = loadAdditions(args.customAdditions)
+	customDeletions = {}
 	if args.customDeletions:
 		print("Loading deletions...")
-		with codecs.open(args.customDeletions,'r','utf-8') as f:
-			for line in f:
-				termid,singleterm,terms = line.strip().split('\t')
-				customDeletions[termid] += terms.lower().split('|')
-
-	print("Processing UniProt XML file...")
-	with gzip.open(args.uniprotXML, 'rt') as openfile, open(args.outFile,'w') as outF:
-
-		# Skip to the article element in the file
-		for event, elem in etree.iterparse(openfile, events=('start', 'end', 'start-ns', 'end-ns')):
-			#print(event,elem)
-			if event=='end' and elem.tag=='{http://uniprot.org/uniprot}entry':
-			
-				taxonomies = elem.findall('./{http://uniprot.org/uniprot}organism/{http://uniprot.org/uniprot}dbReference')
-				isHuman = False
-				for taxonomy in taxonomies:
-					if taxonomy.attrib['type'] == 'NCBI Taxonomy' and taxonomy.attrib['id'] == '9606':
-						isHuman = True
-						break
-
-				if isHuman:
-					accessions = elem.findall('./{http://uniprot.org/uniprot}accession')
-					accession = accessions[0].text
-
-					names = elem.findall('./{http://uniprot.org/uniprot}name')
-					assert len(names) == 1
-					name = names[0].text
+		customDeletions = loadDeletions(args.customDeletions)
 
+	termFilter = TermFilter(stopwords=proteinStopwords, deletions=customDeletions, rules=[('short', lambda x : len(x) < 3)])
 
+	print("Processing UniProt XML file...")
+	proteins = []
+	with gzip.open(args.uniprotXML, 'rb') as openfile:
+		for accession, name, allNames in iterHumanEntryNames(openfile, processes=args.processes):
+			# The length rule only applies to the UniProt names (not the trimmed names) and the additions are only checked against the deletions
+			allNames = termFilter.filter(accession, allNames, applyDeletions=False, applyStopwords=False)
 
-					recommendedNames = elem.findall('./{http://uniprot.org/uniprot}protein/{http://uniprot.org/uniprot}recommendedName/{http://uniprot.org/uniprot}fullName')
-					recommendedNames = [ x.text for x in recommendedNames ]
-					
-					alternativeNames = elem.findall('./{http://uniprot.org/uniprot}protein/{http://uniprot.org/uniprot}alternativeName/{http://uniprot.org/uniprot}fullName')
-					alternativeNames = [ x.text for x in alternativeNames ]
-
-					#print(accession,name,recommendedNames,alternativeNames)
-
-					allNames = [name] + recommendedNames + alternativeNames
-					allNames = [ x for x in allNames if len(x) >= 3 ]
-
-					trimProtein = [ x[:-len(" protein")] for x in allNames if x.lower().endswith(' protein') ]
-
-					allNames += trimProtein
+			trimProtein = [ x[:-len(" protein")] for x in allNames if x.lower().endswith(' protein') ]
 
-					allNames = [ x for x in allNames if not x.lower() in proteinStopwords ]
+			allNames += trimProtein
 
-					allNames += customAdditions[accession]
+			allNames = termFilter.filter(accession, allNames, applyRules=False)
 
-					allNames = [ x for x in allNames if not x.lower() in customDeletions[accession] ]
+			allNames += termFilter.filter(accession, customAdditions.get(accession,()), applyStopwords=False, applyRules=False)
 
-					allNames = sorted(list(set(allNames)))
-					if len(allNames) > 0:
-						for n in allNames:
-							assert not "|" in n, "| found in %s with accession %s" % (n,accession)
-						allNamesTxt = "|".join(allNames)
+			allNames = sorted(set(allNames))
+			if len(allNames) > 0:
+				for n in allNames:
+					assert not "|" in n, "| found in %s with accession %s" % (n,accession)
+				proteins.append( (accession, name, "|".join(allNames)) )
 
-						outData = [ accession, name, allNamesTxt ]
-						outLine = "\t".join(outData)
-						outF.write(outLine + "\n")
-					#break
+	termFilter.report()
 
-				elem.clear()
+	# Sort by accession so the output is the same however the entries were processed
+	proteins = sorted(proteins)
 
+	with open(args.outFile,'w') as outF:
+		for outData in proteins:
+			outLine = "\t".join(outData)
+			outF.write(outLine + "\n")
 
 	print("Done")
 
 if __name__ == '__main__':
 	main()
-
@@ -3,18 +3,23 @@ import sys
 import codecs
 from collections import defaultdict
 import urllib.request
+from umls import IndexTable, readRRF, readMRCONSO, MRCONSO_CUI, MRCONSO_STR
 
 if __name__ == '__main__':
 	selectedTopLevels = "ANAT,CHEM,DISO,GENE,PHYS".split(',')
 	filterOut = ['T033']
 
 	parser = argparse.ArgumentParser(description='Generate term list from NCBI gene resource')
-	parser.add_argument('--umlsConceptFile', required=True, type=str, help='Path on the MRCONSO.RRF file in UMLS metathesaurus')
+	parser.add_argument('--umlsConceptFile', required=False, type=str, help='Path on the MRCONSO.RRF file in UMLS metathesaurus')
+	parser.add_argument('--umlsIndex', required=False, type=str, help='Path to an index built by buildUMLSIndex.py (used instead of --umlsConceptFile)')
+	parser.add_argument('--processes', required=False, type=int, default=1, help='Number of processes to parse --umlsConceptFile with')
 	parser.add_argument('--umlsSemanticGroupsFile', required=True, type=str, help='Path on the MRSTY.RRF file in UMLS metathesaurus')
 	parser.add_argument('--stopwordsFile',required=True,type=str,help='Stopword file')
 	parser.add_argument('--outFile', required=True, type=str, help='Path to output wordlist file')
 	args = parser.parse_args()
 
+	assert args.umlsConceptFile or args.umlsIndex, "One of --umlsConceptFile or --umlsIndex must be provided"
+
 	print("Loading stopwords...")
 	with codecs.open(args.stopwordsFile,'r','utf8') as f:
 		stopwords = [ line.strip().lower() for line in f ]
@@ -35,33 +40,30 @@ if __name__ == '__main__':
 	print("Filtering CUIDs for semantic types")
 	selectedCUIDs = set()
 	cuidToTopLevel = defaultdict(set)
-	with codecs.open(args.umlsSemanticGroupsFile,'r','utf8') as f:
-		for line in f:
-			split = line.split('|')
-			cuid = split[0]
-			typeid = split[1]
-
-			if typeid in filterOut:
-				continue
-			#if groupid in semanticGroupIDs:
-			#	selectedCUIDs.add(cuid)
-			#	cuidToType[cuid] = group
-			toplevel = typeIDToTopLevel[typeid]
-			#assert not cuid in cuidToTopLevel or cuidToTopLevel[cuid] == toplevel, "%s already has type %s" (cuid, cuidToTopLevel[type])
-			#assert not cuid in cuidToTopLevel, "%s already has type %s" % (cuid, cuidToTopLevel[cuid])
-			cuidToTopLevel[cuid].add(toplevel)
+	for cuid,typeid in readRRF(args.umlsSemanticGroupsFile, [0,1]):
+		if typeid in filterOut:
+			continue
+		#if groupid in semanticGroupIDs:
+		#	selectedCUIDs.add(cuid)
+		#	cuidToType[cuid] = group
+		toplevel = typeIDToTopLevel[typeid]
+		#assert not cuid in cuidToTopLevel or cuidToTopLevel[cuid] == toplevel, "%s already has type %s" (cuid, cuidToTopLevel[type])
+		#assert not cuid in cuidToTopLevel, "%s already has type %s" % (cuid, cuidToTopLevel[cuid])
+		cuidToTopLevel[cuid].add(toplevel)
 
 	metathesaurus_singleterm = {}
 	metathesaurus_synonyms = defaultdict(list)
 	print("Loading metathesaurus...")
-	with codecs.open(args.umlsConceptFile,'r','utf8') as f:
-		for line in f:
-			split = line.split('|')
-			cuid = split[0]
-			lang = split[1]
-			term = split[14]
-			if lang != 'ENG':
-				continue
+	if args.umlsIndex:
+		metathesaurus = IndexTable(args.umlsIndex, 'cui')
+		for cuid in cuidToTopLevel:
+			terms = metathesaurus[cuid]
+			if len(terms) > 0:
+				metathesaurus_synonyms[cuid] = terms
+				metathesaurus_singleterm[cuid] = terms[0]
+		metathesaurus = None
+	else:
+		for cuid,term in readMRCONSO(args.umlsConceptFile, [MRCONSO_CUI,MRCONSO_STR], lang='ENG', processes=args.processes):
 			#if not cuid in selectedCUIDs:
 			#	continue
 
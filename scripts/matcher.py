@@ -0,0 +1,477 @@
+"""
+Matches the synonyms of a set of wordlists against text in a single pass using an Aho-Corasick automaton. Matching is case-insensitive and only reports matches that start and end on a token boundary (i.e. are not directly next to a letter or digit).
+
+Example:
+	matcher = loadMatcher(['terms_genes.tsv','terms_drugs.tsv'])
+	for start,end,termid,listType in matcher.match(text):
+		...
+
+A built matcher can be saved as a single binary file of flat arrays (see saveMatcher and buildMatcher.py). Loading it with loadMatcherFile memory-maps the file so it is not parsed again and the pages are shared read-only between all the processes that load it.
+"""
+import bisect
+import struct
+from array import array
+from collections import defaultdict, deque
+from wordlists import readWordlist, parseWordlistArgument, readInhibitorTemplates, writeSections, SectionReader
+
+# Transitions are stored in a single dictionary keyed by the state shifted by this many bits combined with the character code (all of Unicode fits in 21 bits)
+CHAR_BITS = 21
+
+# Most transitions of a saved matcher that are cached in memory by each process (about 100 bytes each)
+MAX_CACHED_TRANSITIONS = 1 << 20
+
+# Header of a saved matcher file: magic, then the number of states, transitions, outputs and entities and the sizes of the identifier, list type and inhibitor exclusion data
+MATCHER_MAGIC = b'BWLMATCH'
+MATCHER_HEADER = struct.Struct('=8s7Q')
+
+# Text around a gene match that makes it an inhibitor (for the inhibitor templates)
+INHIBITOR_SUFFIXES = [' inhibitor', ' inhibitors']
+INHIBITOR_PREFIXES = ['inhibitor of ', 'inhibitors of ']
+
+def lowerText(text):
+	"""
+	Lowercases text while keeping every character at the same offset (the few characters that lowercase to more than one character are left as they are)
+
+	Args:
+		text (str): Text to lowercase
+
+	Returns:
+		str of the same length
+	"""
+	lowered = text.lower()
+	if len(lowered) == len(text):
+		return lowered
+	return "".join( c if len(c.lower()) != 1 else c.lower() for c in text )
+
+class Matcher:
+	"""
+	Aho-Corasick automaton over the lowercased synonyms of one or more wordlists. Terms are added with addTerm (or addWordlist) and then build must be called before matching.
+
+	A synonym shared by several identifiers (or wordlists) gives one match for each of them.
+
+	Inhibitor templates (see addInhibitorTemplates) are resolved around the gene matches instead of adding every inhibitor term to the automaton.
+	"""
+	def __init__(self):
+		self.transitions = {}
+		self.depth = [0]
+		self.fail = [0]
+		self.dictLink = [0]
+		self.outputs = {}
+		self.entities = []
+		self.entityIndex = {}
+		self.inhibitorOf = {}
+		self.inhibitorExclusions = set()
+		self.built = False
+
+	def getEntityIndex(self, termid, listType):
+		"""
+		Gets the index of a (termid, listType) entity, adding it if it is new
+
+		Args:
+			termid (str): Identifier of the term in the wordlist
+			listType (str): Type of the wordlist (e.g. genes)
+
+		Returns:
+			int index into the entities
+		"""
+		entity = (termid,listType)
+		if not entity in self.entityIndex:
+			self.entityIndex[entity] = len(self.entities)
+			self.entities.append(entity)
+		return self.entityIndex[entity]
+
+	def addTerm(self, term, termid, listType):
+		"""
+		Adds a single synonym to the automaton
+
+		Args:
+			term (str): The synonym
+			termid (str): Identifier of the term in the wordlist
+			listType (str): Type of the wordlist (e.g. genes)
+
+		Returns:
+			Nothing
+		"""
+		assert not self.built, "Terms cannot be added after the automaton is built"
+		term = lowerText(term.strip())
+		if not term:
+			return
+
+		state = 0
+		for c in term:
+			key = (state << CHAR_BITS) | ord(c)
+			nextState = self.transitions.get(key)
+			if nextState is None:
+				nextState = len(self.depth)
+				self.transitions[key] = nextState
+				self.depth.append(self.depth[state]+1)
+				self.fail.append(0)
+				self.dictLink.append(0)
+			state = nextState
+
+		entityIndex = self.getEntityIndex(termid, listType)
+
+		stateOutputs = self.outputs.setdefault(state,[])
+		if not entityIndex in stateOutputs:
+			stateOutputs.append(entityIndex)
+
+	def addWordlist(self, filename, listType):
+		"""
+		Adds all the synonyms of a wordlist to the automaton
+
+		Args:
+			filename (str): Wordlist file (e.g. terms_genes.tsv)
+			listType (str): Type of the wordlist (e.g. genes)
+
+		Returns:
+			Nothing
+		"""
+		for termid,_,synonyms in readWordlist(filename):
+			for synonym in synonyms:
+				self.addTerm(synonym, termid, listType)
+
+	def addInhibitorTemplates(self, filename, geneListType='genes', listType='drugs'):
+		"""
+		Adds inhibitor templates (from generateDrugTerms_geneinhibitors.py). Each match of a gene with a template that is followed by "inhibitor(s)" or preceded by "inhibitor(s) of" also gives a match for the inhibitor. The genes must be added to the automaton separately (e.g. from terms_genes.tsv)
+
+		Args:
+			filename (str): Inhibitor templates file
+			geneListType (str): Type of the gene wordlist
+			listType (str): Type of wordlist to give the inhibitor matches
+
+		Returns:
+			Nothing
+		"""
+		assert not self.built, "Templates cannot be added after the automaton is built"
+		for drugid,_,geneid,exclusions in readInhibitorTemplates(filename):
+			drugIndex = self.getEntityIndex(drugid, listType)
+			self.inhibitorOf[self.getEntityIndex(geneid, geneListType)] = drugIndex
+			self.inhibitorExclusions.update( (drugIndex,lowerText(term)) for term in exclusions )
+
+	def build(self):
+		"""
+		Calculates the failure links (the longest proper suffix of each state that is also in the automaton) and the dictionary links (the longest such suffix that is a complete term)
+
+		Returns:
+			Nothing
+		"""
+		children = defaultdict(list)
+		for key,child in self.transitions.items():
+			children[key >> CHAR_BITS].append( (key & ((1 << CHAR_BITS)-1), child) )
+
+		queue = deque( child for _,child in children[0] )
+		while queue:
+			state = queue.popleft()
+			for code,child in children[state]:
+				queue.append(child)
+
+				failState = self.fail[state]
+				while failState != 0 and not ((failState << CHAR_BITS) | code) in self.transitions:
+					failState = self.fail[failState]
+				target = self.transitions.get((failState << CHAR_BITS) | code, 0)
+
+				self.fail[child] = target
+				self.dictLink[child] = target if target in self.outputs else self.dictLink[target]
+
+		self.built = True
+
+	def match(self, text):
+		"""
+		Finds all matches of the terms in a text
+
+		Args:
+			text (str): Text to search
+
+		Returns:
+			list of (start, end, termid, listType) tuples sorted by position, where text[start:end] is the matched text
+		"""
+		assert self.built, "build must be called before matching"
+
+		transitions, fail, dictLink, depth, outputs, entities, inhibitorOf = self.transitions, self.fail, self.dictLink, self.depth, self.outputs, self.entities, self.inhibitorOf
+		lowered = lowerText(text)
+		length = len(lowered)
+
+		# The transitions of a saved matcher are looked up in its cache first (where 0 is a known missing transition) so most lookups stay in a dictionary
+		cached = transitions.cache if isinstance(transitions, FlatTransitions) else transitions
+
+		matches = []
+		geneMatches = []
+		state = 0
+		for i,c in enumerate(lowered):
+			code = ord(c)
+			while True:
+				key = (state << CHAR_BITS) | code
+				nextState = cached.get(key)
+				if nextState is None and cached is not transitions:
+					nextState = transitions.get(key, 0)
+				if nextState:
+					state = nextState
+					break
+				elif state == 0:
+					break
+				state = fail[state]
+
+			if state == 0 or (i+1 < length and lowered[i+1].isalnum()):
+				continue
+
+			outputState = state if state in outputs else dictLink[state]
+			while outputState != 0:
+				start = i + 1 - depth[outputState]
+				if start == 0 or not lowered[start-1].isalnum():
+					for entityIndex in outputs[outputState]:
+						termid,listType = entities[entityIndex]
+						matches.append( (start, i+1, termid, listType) )
+						if entityIndex in inhibitorOf:
+							geneMatches.append( (start, i+1, inhibitorOf[entityIndex]) )
+				outputState = dictLink[outputState]
+
+		for start,end,drugIndex in geneMatches:
+			matches += self.resolveInhibitors(lowered, start, end, drugIndex)
+
+		return sorted(matches)
+
+	def resolveInhibitors(self, lowered, start, end, drugIndex):
+		"""
+		Checks the text around a gene match for the inhibitor templates
+
+		Args:
+			lowered (str): Lowercased text
+			start (int): Start of the gene match
+			end (int): End of the gene match
+			drugIndex (int): Entity index of the inhibitor for the gene
+
+		Returns:
+			list of (start, end, termid, listType) tuples for the inhibitor
+		"""
+		spans = []
+		for suffix in INHIBITOR_SUFFIXES:
+			if lowered.startswith(suffix, end):
+				spans.append( (start, end+len(suffix)) )
+		for prefix in INHIBITOR_PREFIXES:
+			if start >= len(prefix) and lowered.startswith(prefix, start-len(prefix)):
+				spans.append( (start-len(prefix), end) )
+
+		termid,listType = self.entities[drugIndex]
+		resolved = []
+		for spanStart,spanEnd in spans:
+			if spanEnd < len(lowered) and lowered[spanEnd].isalnum():
+				continue
+			if spanStart > 0 and lowered[spanStart-1].isalnum():
+				continue
+			if (drugIndex,lowered[spanStart:spanEnd]) in self.inhibitorExclusions:
+				continue
+			resolved.append( (spanStart, spanEnd, termid, listType) )
+		return resolved
+
+def loadMatcher(wordlists, inhibitorTemplates=None):
+	"""
+	Builds a matcher over a set of wordlists
+
+	Args:
+		wordlists (list of str): Wordlist files, either as filenames (where the type comes from the name, e.g. terms_genes.tsv) or as type=filename
+		inhibitorTemplates (str): Optional inhibitor templates file (see Matcher.addInhibitorTemplates)
+
+	Returns:
+		Matcher that is ready to use
+	"""
+	matcher = Matcher()
+	for argument in wordlists:
+		listType,filename = parseWordlistArgument(argument)
+		matcher.addWordlist(filename, listType)
+	if inhibitorTemplates:
+		matcher.addInhibitorTemplates(inhibitorTemplates)
+	matcher.build()
+	return matcher
+
+def selectLongestMatches(matches, suppressTypes=['conflicting']):
+	"""
+	Resolves overlapping matches by keeping the longest (and then earliest) non-overlapping spans. All the matches for a kept span are returned, so an ambiguous term gives several. Matches from the suppressed wordlists (e.g. conflicting) take part in the selection so that they remove the matches they overlap (including the other matches on the same span), but they are not returned themselves
+
+	Args:
+		matches (list of tuples): Matches from Matcher.match
+		suppressTypes (list of str): Wordlist types that only suppress other matches
+
+	Returns:
+		list of (start, end, termid, listType) tuples sorted by position
+	"""
+	spans = sorted(set( (start,end) for start,end,_,_ in matches ), key=lambda span : (span[0]-span[1], span[0]))
+
+	used = set()
+	kept = set()
+	for start,end in spans:
+		if any( i in used for i in range(start,end) ):
+			continue
+		used.update(range(start,end))
+		kept.add( (start,end) )
+
+	# A kept span with a match from a suppressed wordlist gives no matches at all
+	suppressed = set( (start,end) for start,end,_,listType in matches if listType in suppressTypes )
+	return [ m for m in matches if (m[0],m[1]) in kept and not (m[0],m[1]) in suppressed ]
+
+class FlatTransitions:
+	"""
+	Read-only transitions of a saved matcher, stored as keys (as for Matcher.transitions) sorted by state and then character with their target states. The transitions of each state are contiguous so only that range is searched. Transitions from the root state are the most common and are kept in a dictionary, and the others are cached once they have been looked up (up to MAX_CACHED_TRANSITIONS, after which the cache starts again).
+	"""
+	def __init__(self, keys, targets, starts):
+		self.keys = keys
+		self.targets = targets
+		self.starts = starts
+		self.root = { keys[i]:targets[i] for i in range(starts[0],starts[1]) }
+		self.cache = dict(self.root)
+
+	def find(self, key):
+		"""
+		Searches the transitions of the key's state
+
+		Args:
+			key (int): State shifted by CHAR_BITS combined with the character code
+
+		Returns:
+			int target state (or 0 if there is no transition, as no transition goes back to the root)
+		"""
+		state = key >> CHAR_BITS
+		i = bisect.bisect_left(self.keys, key, self.starts[state], self.starts[state+1])
+		if i < self.starts[state+1] and self.keys[i] == key:
+			return self.targets[i]
+		return 0
+
+	def get(self, key, default=None):
+		target = self.cache.get(key)
+		if target is None:
+			target = self.find(key)
+			if len(self.cache) >= MAX_CACHED_TRANSITIONS:
+				self.cache.clear()
+				self.cache.update(self.root)
+			self.cache[key] = target
+		return target if target else default
+
+	def __contains__(self, key):
+		return self.get(key) is not None
+
+class FlatOutputs:
+	"""
+	Read-only outputs of a saved matcher. The entities for each state are stored contiguously with the start of each state's entities in a separate array.
+	"""
+	def __init__(self, starts, entityIndices):
+		self.starts = starts
+		self.entityIndices = entityIndices
+
+	def __contains__(self, state):
+		return self.starts[state] != self.starts[state+1]
+
+	def __getitem__(self, state):
+		return self.entityIndices[self.starts[state]:self.starts[state+1]]
+
+class FlatEntities:
+	"""
+	Read-only (termid, listType) entities of a saved matcher. Identifiers are decoded from a string table when they are requested.
+	"""
+	def __init__(self, idOffsets, idData, listTypeIndices, listTypes):
+		self.idOffsets = idOffsets
+		self.idData = idData
+		self.listTypeIndices = listTypeIndices
+		self.listTypes = listTypes
+
+	def __len__(self):
+		return len(self.listTypeIndices)
+
+	def __getitem__(self, i):
+		termid = bytes(self.idData[self.idOffsets[i]:self.idOffsets[i+1]]).decode('utf8')
+		return termid, self.listTypes[self.listTypeIndices[i]]
+
+class FlatInhibitors:
+	"""
+	Read-only inhibitor templates of a saved matcher, stored as the inhibitor entity (plus one, with zero for none) for every entity
+	"""
+	def __init__(self, inhibitors):
+		self.inhibitors = inhibitors
+
+	def __contains__(self, entityIndex):
+		return self.inhibitors[entityIndex] != 0
+
+	def __getitem__(self, entityIndex):
+		return self.inhibitors[entityIndex] - 1
+
+def saveMatcher(matcher, filename):
+	"""
+	Saves a built matcher as a single file of flat arrays (in native byte order) that can be memory-mapped by loadMatcherFile
+
+	Args:
+		matcher (Matcher): Built matcher
+		filename (str): File to write
+
+	Returns:
+		Nothing
+	"""
+	assert matcher.built, "build must be called before saving"
+
+	keys = array('Q', sorted(matcher.transitions.keys()))
+	targets = array('I', ( matcher.transitions[key] for key in keys ))
+	transitionStarts = array('I', ( bisect.bisect_left(keys, state << CHAR_BITS) for state in range(len(matcher.depth)+1) ))
+
+	outputStarts = array('I', [0])
+	outputEntities = array('I')
+	for state in range(len(matcher.depth)):
+		outputEntities.extend(matcher.outputs.get(state,[]))
+		outputStarts.append(len(outputEntities))
+
+	listTypes = sorted(set( listType for _,listType in matcher.entities ))
+	listTypeIndex = { listType:i for i,listType in enumerate(listTypes) }
+
+	idOffsets = array('Q', [0])
+	idData = bytearray()
+	for termid,_ in matcher.entities:
+		idData += termid.encode('utf8')
+		idOffsets.append(len(idData))
+	listTypeIndices = array('I', ( listTypeIndex[listType] for _,listType in matcher.entities ))
+	listTypeData = "\n".join(listTypes).encode('utf8')
+
+	inhibitors = array('I', [0]) * len(matcher.entities)
+	for geneIndex,drugIndex in matcher.inhibitorOf.items():
+		inhibitors[geneIndex] = drugIndex + 1
+	exclusionData = "\n".join( "%d\t%s" % exclusion for exclusion in sorted(matcher.inhibitorExclusions) ).encode('utf8')
+
+	sections = [ keys, targets, transitionStarts, array('I',matcher.depth), array('I',matcher.fail), array('I',matcher.dictLink), outputStarts, outputEntities, idOffsets, listTypeIndices, inhibitors, bytes(idData), listTypeData, exclusionData ]
+
+	header = MATCHER_HEADER.pack(MATCHER_MAGIC, len(matcher.depth), len(keys), len(outputEntities), len(matcher.entities), len(idData), len(listTypeData), len(exclusionData))
+	writeSections(filename, header, sections)
+
+def loadMatcherFile(filename):
+	"""
+	Loads a matcher saved by saveMatcher. The file is memory-mapped and used directly so nothing is parsed or rebuilt
+
+	Args:
+		filename (str): Saved matcher file
+
+	Returns:
+		Matcher that is ready to use
+	"""
+	reader = SectionReader(filename, MATCHER_HEADER, MATCHER_MAGIC)
+	_,stateCount,transitionCount,outputCount,entityCount,idDataLength,listTypeDataLength,exclusionDataLength = reader.header
+	nextSection = reader.nextSection
+
+	matcher = Matcher()
+	keys = nextSection(transitionCount, 'Q')
+	targets = nextSection(transitionCount, 'I')
+	transitionStarts = nextSection(stateCount+1, 'I')
+	matcher.transitions = FlatTransitions(keys, targets, transitionStarts)
+	matcher.depth = nextSection(stateCount, 'I')
+	matcher.fail = nextSection(stateCount, 'I')
+	matcher.dictLink = nextSection(stateCount, 'I')
+	outputStarts = nextSection(stateCount+1, 'I')
+	outputEntities = nextSection(outputCount, 'I')
+	matcher.outputs = FlatOutputs(outputStarts, outputEntities)
+	idOffsets = nextSection(entityCount+1, 'Q')
+	listTypeIndices = nextSection(entityCount, 'I')
+	matcher.inhibitorOf = FlatInhibitors(nextSection(entityCount, 'I'))
+	idData = nextSection(idDataLength)
+	listTypes = bytes(nextSection(listTypeDataLength)).decode('utf8').split('\n')
+	matcher.entities = FlatEntities(idOffsets, idData, listTypeIndices, listTypes)
+
+	for line in bytes(nextSection(exclusionDataLength)).decode('utf8').split('\n'):
+		if line:
+			drugIndex,term = line.split('\t',1)
+			matcher.inhibitorExclusions.add( (int(drugIndex),term) )
+	matcher.built = True
+
+	return matcher
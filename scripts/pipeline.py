@@ -0,0 +1,446 @@
+"""
+This script is used to run the steps that build all the wordlists. Each step declares its input and output files and is skipped if the content of its inputs (and its command) has not changed since its outputs were last built. Steps that do not depend on each other can be run concurrently.
+"""
+import argparse
+import ast
+import concurrent.futures
+import hashlib
+import json
+import os
+import subprocess
+import sys
+from curation import CURATED_TYPES
+from wordlists import WORDLIST_TYPES, saveBinaryWordlist
+
+# File (inside the working directory) that records input hashes and the signature of each completed step
+STATE_FILE = '.pipeline_state.json'
+
+class Step:
+	"""
+	A single step of the pipeline. It either runs a command or calls a Python function to produce its outputs from its inputs. An exclusive step (e.g. one that uses several processes itself) is not run alongside any other step.
+	"""
+	def __init__(self, name, inputs, outputs, command=None, action=None, exclusive=False):
+		assert (command is None) != (action is None), "Step %s needs exactly one of a command or an action" % name
+		self.name = name
+		self.inputs = inputs
+		self.outputs = outputs
+		self.command = command
+		self.action = action
+		self.exclusive = exclusive
+
+	def describe(self):
+		"""
+		Gives a description of what the step runs (which is included in its signature)
+
+		Returns:
+			str describing the command or action
+		"""
+		if self.command:
+			return " ".join(self.command)
+		else:
+			return "%s(%s)" % (self.action.__name__, ",".join(self.inputs + self.outputs))
+
+	def run(self):
+		"""
+		Runs the step
+
+		Returns:
+			Nothing
+		"""
+		if self.command:
+			subprocess.run(self.command, check=True)
+		else:
+			self.action(self.inputs, self.outputs)
+
+def hashFile(filename, fileCache):
+	"""
+	Gets the SHA-256 hash of the content of a file. Hashes are cached by path, size and modification time so unchanged large files are not read again
+
+	Args:
+		filename (str): File to hash
+		fileCache (dict): Cache of earlier hashes (updated in place)
+
+	Returns:
+		Hex digest of the file content
+	"""
+	path = os.path.realpath(filename)
+	stat = os.stat(path)
+	cached = fileCache.get(path)
+	if cached and cached['size'] == stat.st_size and cached['mtime'] == stat.st_mtime_ns:
+		return cached['sha256']
+
+	sha = hashlib.sha256()
+	with open(path,'rb') as f:
+		for block in iter(lambda : f.read(1024*1024), b''):
+			sha.update(block)
+
+	fileCache[path] = { 'size':stat.st_size, 'mtime':stat.st_mtime_ns, 'sha256':sha.hexdigest() }
+	return sha.hexdigest()
+
+def hashPath(path, fileCache):
+	"""
+	Gets the hash of a file or of all the files within a directory
+
+	Args:
+		path (str): File or directory to hash
+		fileCache (dict): Cache of earlier file hashes (updated in place)
+
+	Returns:
+		Hex digest of the content
+	"""
+	if not os.path.isdir(path):
+		return hashFile(path, fileCache)
+
+	sha = hashlib.sha256()
+	for root,dirs,files in os.walk(path):
+		dirs.sort()
+		for filename in sorted(files):
+			fullpath = os.path.join(root,filename)
+			sha.update(os.path.relpath(fullpath,path).encode('utf8'))
+			sha.update(hashFile(fullpath, fileCache).encode('utf8'))
+	return sha.hexdigest()
+
+def stepSignature(step, fileCache):
+	"""
+	Calculates a signature for a step from its command and the content of its inputs
+
+	Args:
+		step (Step): Step to calculate the signature for
+		fileCache (dict): Cache of earlier file hashes (updated in place)
+
+	Returns:
+		Hex digest for the step
+	"""
+	sha = hashlib.sha256()
+	sha.update(step.describe().encode('utf8'))
+	for path in step.inputs:
+		sha.update(path.encode('utf8'))
+		sha.update(hashPath(path, fileCache).encode('utf8'))
+	return sha.hexdigest()
+
+def loadState(filename):
+	"""
+	Loads the pipeline state from a previous run (if there was one)
+
+	Args:
+		filename (str): State file
+
+	Returns:
+		Dictionary with the cached file hashes and step signatures
+	"""
+	if os.path.isfile(filename):
+		with open(filename) as f:
+			return json.load(f)
+	return { 'files':{}, 'steps':{} }
+
+def saveState(state, filename):
+	"""
+	Saves the pipeline state so that later runs can skip up-to-date steps
+
+	Args:
+		state (dict): Cached file hashes and step signatures
+		filename (str): State file
+
+	Returns:
+		Nothing
+	"""
+	with open(filename + '.tmp','w') as outF:
+		json.dump(state,outF,indent=2,sort_keys=True)
+	os.replace(filename + '.tmp', filename)
+
+def findDependencies(steps):
+	"""
+	Works out which steps each step depends on (the steps that produce any of its inputs)
+
+	Args:
+		steps (list of Step): All the steps of the pipeline
+
+	Returns:
+		Dictionary of step name to the set of step names it depends on
+	"""
+	producers = {}
+	for step in steps:
+		for path in step.outputs:
+			assert not path in producers, "%s is an output of both %s and %s" % (path, producers[path], step.name)
+			producers[path] = step.name
+
+	return { step.name:set( producers[path] for path in step.inputs if path in producers ) for step in steps }
+
+def runPipeline(steps, stateFile, force=[], dryRun=False, workers=1):
+	"""
+	Runs the steps once their dependencies are complete, skipping those that are up to date. Independent steps are run concurrently up to the worker limit, except for exclusive steps which are run on their own
+
+	Args:
+		steps (list of Step): Steps of the pipeline
+		stateFile (str): File to load and save the pipeline state
+		force (list of str): Names of steps to run regardless (or 'all')
+		dryRun (bool): Only report which steps would be run
+		workers (int): Maximum number of steps to run at once
+
+	Returns:
+		Nothing
+	"""
+	state = loadState(stateFile)
+	dependencies = findDependencies(steps)
+
+	completed = set()
+	failed = []
+	running = {}
+	pending = list(steps)
+	with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+		while pending or running:
+			# Start (or skip) steps whose dependencies are complete until no more can be started
+			ready = [ step for step in pending if dependencies[step.name].issubset(completed) ]
+			while ready and not failed and len(running) < workers:
+				# Exclusive steps already use the cores so nothing else is started alongside them
+				if any( s.exclusive for s,_ in running.values() ):
+					break
+				step = ready[0] if not running else next(( s for s in ready if not s.exclusive ), None)
+				if step is None:
+					break
+				ready.remove(step)
+				pending.remove(step)
+
+				if dryRun and not all( os.path.exists(path) for path in step.inputs ):
+					print("%s: would run (after its inputs are built)" % step.name)
+					completed.add(step.name)
+				else:
+					missing = [ path for path in step.inputs if not os.path.exists(path) ]
+					assert len(missing) == 0, "Step %s is missing inputs: %s" % (step.name, str(missing))
+
+					signature = stepSignature(step, state['files'])
+					outputsExist = all( os.path.exists(path) for path in step.outputs )
+					forced = step.name in force or 'all' in force
+					if outputsExist and state['steps'].get(step.name) == signature and not forced:
+						print("%s: up to date" % step.name)
+						completed.add(step.name)
+					elif dryRun:
+						print("%s: would run" % step.name)
+						completed.add(step.name)
+					else:
+						print("%s: running %s" % (step.name, step.describe()))
+						sys.stdout.flush()
+						running[executor.submit(step.run)] = (step,signature)
+
+				if not ready:
+					ready = [ step for step in pending if dependencies[step.name].issubset(completed) ]
+
+			if not running:
+				assert failed or not pending, "Steps cannot be run as their dependencies are never completed: %s" % str([ step.name for step in pending ])
+				break
+
+			done, _ = concurrent.futures.wait(running.keys(), return_when=concurrent.futures.FIRST_COMPLETED)
+			for future in done:
+				step,signature = running.pop(future)
+				try:
+					future.result()
+				except Exception as e:
+					print("%s: failed (%s)" % (step.name, str(e)))
+					failed.append(step.name)
+					continue
+
+				print("%s: done" % step.name)
+				completed.add(step.name)
+				state['steps'][step.name] = signature
+				saveState(state, stateFile)
+
+	assert len(failed) == 0, "Pipeline failed at step(s): %s" % ", ".join(failed)
+
+def combineUniqueLines(inputs, outputs):
+	"""
+	Combines the lines from multiple files into one sorted set of unique lines (like cat | sort -u)
+
+	Args:
+		inputs (list of str): Files to combine
+		outputs (list of str): Single output file
+
+	Returns:
+		Nothing
+	"""
+	lines = set()
+	for filename in inputs:
+		with open(filename,encoding='utf8') as f:
+			lines.update( line.rstrip('\n') for line in f )
+
+	with open(outputs[0],'w',encoding='utf8') as outF:
+		for line in sorted(lines):
+			outF.write(line + "\n")
+
+def concatenateFiles(inputs, outputs):
+	"""
+	Concatenates multiple files into one (like cat)
+
+	Args:
+		inputs (list of str): Files to concatenate
+		outputs (list of str): Single output file
+
+	Returns:
+		Nothing
+	"""
+	with open(outputs[0],'wb') as outF:
+		for filename in inputs:
+			with open(filename,'rb') as f:
+				for block in iter(lambda : f.read(1024*1024), b''):
+					outF.write(block)
+
+def convertToBinaryWordlist(inputs, outputs):
+	"""
+	Saves a TSV wordlist in the binary format (see wordlists.saveBinaryWordlist)
+
+	Args:
+		inputs (list of str): TSV wordlist (followed by the scripts it depends on)
+		outputs (list of str): Single binary wordlist file
+
+	Returns:
+		Nothing
+	"""
+	saveBinaryWordlist(inputs[0], outputs[0])
+
+def findLocalImports(filename, found=None):
+	"""
+	Finds the modules in the same directory that a script imports, directly or through those modules, so that edits to them change the signature of the steps that run the script
+
+	Args:
+		filename (str): Python script
+		found (set): Modules found so far (updated in place)
+
+	Returns:
+		sorted list of filenames of the imported modules
+	"""
+	if found is None:
+		found = set()
+
+	with open(filename,'rb') as f:
+		tree = ast.parse(f.read(), filename=filename)
+
+	names = []
+	for node in ast.walk(tree):
+		if isinstance(node, ast.Import):
+			names += [ alias.name.split('.')[0] for alias in node.names ]
+		elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+			names.append(node.module.split('.')[0])
+
+	directory = os.path.dirname(os.path.abspath(filename))
+	for name in names:
+		module = os.path.join(directory, name + '.py')
+		if os.path.isfile(module) and not module in found:
+			found.add(module)
+			findLocalImports(module, found)
+
+	return sorted(found)
+
+def buildSteps(scriptsDir, umlsConceptFile, processes=1, wikidataDump=None):
+	"""
+	Creates the steps to build all the wordlists (run inside the working directory with the custom and predefined files linked in). Steps that use several processes are exclusive so they do not oversubscribe the cores when steps are run concurrently
+
+	Args:
+		scriptsDir (str): Directory containing the generator scripts
+		umlsConceptFile (str): Path on the MRCONSO.RRF file in UMLS metathesaurus
+		processes (int): Number of processes for steps that can use them
+		wikidataDump (str): Wikidata JSON dump to read the drugs from (or None to query Wikidata)
+
+	Returns:
+		list of Step
+	"""
+	def script(name):
+		return os.path.join(scriptsDir, name)
+
+	def scriptInputs(name):
+		# The script along with the local modules it imports
+		return [script(name)] + [ m for m in findLocalImports(script(name)) if m != os.path.abspath(script(name)) ]
+
+	python = sys.executable
+
+	steps = []
+	for termtype in CURATED_TYPES:
+		steps.append(Step('stopwords_%s' % termtype,
+			inputs=['stopwords_%s.txt' % termtype, 'stopwords_selected.txt'],
+			outputs=['stopwords_%s.combined.txt' % termtype],
+			action=combineUniqueLines))
+
+	steps.append(Step('umls_index',
+		inputs=[umlsConceptFile] + scriptInputs('buildUMLSIndex.py'),
+		outputs=['umls_index'],
+		command=[python, script('buildUMLSIndex.py'), '--umlsConceptFile', umlsConceptFile, '--outDir', 'umls_index', '--processes', str(processes)],
+		exclusive=processes > 1))
+
+	steps.append(Step('cancers',
+		inputs=['doid-non-classified.obo', 'stopwords_cancers.combined.txt', 'umls_index', 'additions_cancers.tsv', 'deletions_cancers.tsv'] + scriptInputs('generateCancerTerms.py'),
+		outputs=['terms_cancers.tsv'],
+		command=[python, script('generateCancerTerms.py'), '--diseaseOntologyFile', 'doid-non-classified.obo', '--cancerStopwords', 'stopwords_cancers.combined.txt', '--umlsIndex', 'umls_index', '--customAdditions', 'additions_cancers.tsv', '--customDeletions', 'deletions_cancers.tsv', '--outFile', 'terms_cancers.tsv']))
+
+	steps.append(Step('genes',
+		inputs=['gene_info.gz', 'stopwords_genes.combined.txt', 'umls_index', 'additions_genes.tsv', 'deletions_genes.tsv'] + scriptInputs('generateGeneTerms.py'),
+		outputs=['terms_genes.tsv'],
+		command=[python, script('generateGeneTerms.py'), '--ncbiGeneInfoFile', 'gene_info.gz', '--umlsIndex', 'umls_index', '--geneStopwords', 'stopwords_genes.combined.txt', '--customAdditions', 'additions_genes.tsv', '--customDeletions', 'deletions_genes.tsv', '--outFile', 'terms_genes.tsv']))
+
+	wikidataInputs = [wikidataDump] if wikidataDump else []
+	wikidataOptions = ['--wikidataDump', wikidataDump, '--processes', str(processes)] if wikidataDump else ['--cacheDir', 'wikidata_cache']
+	wikidataOptions += ['--hierarchyFile', 'wikidata_hierarchy.bin']
+	steps.append(Step('drugs_wikidata',
+		inputs=['stopwords_drugs.combined.txt', 'additions_drugs.tsv', 'deletions_drugs.tsv'] + scriptInputs('generateDrugTerms_sparql.py') + wikidataInputs,
+		outputs=['terms_drugs.wikidata.tsv'],
+		command=[python, script('generateDrugTerms_sparql.py'), '--drugStopwords', 'stopwords_drugs.combined.txt', '--customAdditions', 'additions_drugs.tsv', '--customDeletions', 'deletions_drugs.tsv'] + wikidataOptions + ['--outFile', 'terms_drugs.wikidata.tsv'],
+		exclusive=bool(wikidataDump) and processes > 1))
+
+	steps.append(Step('drugs_inhibitors',
+		inputs=['terms_genes.tsv', 'deletions_drugs.tsv'] + scriptInputs('generateDrugTerms_geneinhibitors.py'),
+		outputs=['terms_drugs.inhibitors.tsv', 'templates_drugs.inhibitors.tsv'],
+		command=[python, script('generateDrugTerms_geneinhibitors.py'), '--geneTerms', 'terms_genes.tsv', '--customDeletions', 'deletions_drugs.tsv', '--outFile', 'terms_drugs.inhibitors.tsv', '--outTemplates', 'templates_drugs.inhibitors.tsv']))
+
+	steps.append(Step('drugs',
+		inputs=['terms_drugs.wikidata.tsv', 'terms_drugs.inhibitors.tsv', 'terms_drugs.custom.tsv'],
+		outputs=['terms_drugs.tsv'],
+		action=concatenateFiles))
+
+	steps.append(Step('proteins',
+		inputs=['uniprot_sprot.xml.gz', 'stopwords_proteins.combined.txt', 'additions_proteins.tsv', 'deletions_proteins.tsv'] + scriptInputs('generateProteinTerms.py'),
+		outputs=['terms_proteins.tsv'],
+		command=[python, script('generateProteinTerms.py'), '--uniprotXML', 'uniprot_sprot.xml.gz', '--proteinStopwords', 'stopwords_proteins.combined.txt', '--customAdditions', 'additions_proteins.tsv', '--customDeletions', 'deletions_proteins.tsv', '--outFile', 'terms_proteins.tsv', '--processes', str(processes)],
+		exclusive=processes > 1))
+
+	for termtype in WORDLIST_TYPES:
+		steps.append(Step('binary_%s' % termtype,
+			inputs=['terms_%s.tsv' % termtype] + scriptInputs('wordlists.py'),
+			outputs=['terms_%s.bin' % termtype],
+			action=convertToBinaryWordlist))
+
+	wordlists = [ 'terms_%s.tsv' % termtype for termtype in WORDLIST_TYPES ]
+	steps.append(Step('synonym_index',
+		inputs=wordlists + scriptInputs('buildSynonymIndex.py'),
+		outputs=['synonyms.index', 'synonyms.stats.json'],
+		command=[python, script('buildSynonymIndex.py'), '--wordlists', ",".join(wordlists), '--outFile', 'synonyms.index', '--statsFile', 'synonyms.stats.json']))
+
+	# The inhibitor drugs are matched with templates around the genes instead of adding all of their terms to the automaton
+	wordlists = ['terms_cancers.tsv', 'terms_conflicting.tsv', 'terms_drugs.wikidata.tsv', 'terms_drugs.custom.tsv', 'terms_genes.tsv', 'terms_proteins.tsv', 'terms_variants.tsv']
+	steps.append(Step('matcher',
+		inputs=wordlists + ['templates_drugs.inhibitors.tsv'] + scriptInputs('buildMatcher.py'),
+		outputs=['wordlists.automaton'],
+		command=[python, script('buildMatcher.py'), '--wordlists', ",".join(wordlists), '--inhibitorTemplates', 'templates_drugs.inhibitors.tsv', '--outFile', 'wordlists.automaton']))
+
+	return steps
+
+def main():
+	parser = argparse.ArgumentParser(description='Build all the wordlists, skipping steps whose inputs have not changed')
+	parser.add_argument('--umlsConceptFile', required=True, type=str, help='Path on the MRCONSO.RRF file in UMLS metathesaurus')
+	parser.add_argument('--processes', required=False, type=int, default=1, help='Number of processes for steps that can use them')
+	parser.add_argument('--wikidataDump', required=False, type=str, help='Wikidata JSON dump (optionally gzip or bz2 compressed) to read the drugs from instead of querying Wikidata')
+	parser.add_argument('--force', required=False, type=str, default='', help='Comma-separated names of steps to run even if up to date (or all)')
+	parser.add_argument('--workers', required=False, type=int, default=1, help='Maximum number of independent steps to run at once (steps that use --processes run on their own)')
+	parser.add_argument('--dryRun', action='store_true', help='Only report which steps would be run')
+	args = parser.parse_args()
+
+	scriptsDir = os.path.dirname(os.path.abspath(__file__))
+	wikidataDump = os.path.abspath(args.wikidataDump) if args.wikidataDump else None
+	steps = buildSteps(scriptsDir, os.path.abspath(args.umlsConceptFile), processes=args.processes, wikidataDump=wikidataDump)
+
+	force = [ name for name in args.force.split(',') if name ]
+	unknown = [ name for name in force if name != 'all' and not name in [ step.name for step in steps ] ]
+	assert len(unknown) == 0, "Unknown steps to force: %s" % str(unknown)
+
+	runPipeline(steps, STATE_FILE, force=force, dryRun=args.dryRun, workers=args.workers)
+
+	print("Done")
+
+if __name__ == '__main__':
+	main()
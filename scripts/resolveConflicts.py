@@ -1,42 +1,96 @@
 import argparse
+import os
+import tempfile
 from collections import defaultdict
+from curation import loadDeletions
+from wordlists import parseWordlistArgument, getWordlistSources, saveSynonymIndex, isSynonymIndex, SynonymIndex
+
+def loadSynonymIndex(wordlists, indexFile):
+	"""
+	Loads a persisted synonym index for the wordlists, building it first unless it was built from exactly these files (for their types) and none of them have changed since. An index that also has other types is never overwritten, as it would lose them
+
+	Args:
+		wordlists (list of (str,str)): Type and filename of each wordlist
+		indexFile (str): Synonym index file
+
+	Returns:
+		SynonymIndex
+	"""
+	if os.path.isfile(indexFile) and isSynonymIndex(indexFile):
+		index = SynonymIndex(indexFile)
+		# An index with other types too (e.g. the one built by the pipeline for all the wordlists) can also be used
+		sources = getWordlistSources(wordlists)
+		types = set( listType for listType,_,_,_ in sources )
+		if [ source for source in index.sources if source[0] in types ] == sources:
+			print("Using existing synonym index...")
+			return index
+
+		otherTypes = sorted(set( source[0] for source in index.sources if not source[0] in types ))
+		assert not otherTypes, "%s is out of date for these wordlists but also has other types (%s) so it is not rebuilt for them. Rebuild it with buildSynonymIndex.py or use another synonym index file" % (indexFile, ",".join(otherTypes))
+
+	print("Building synonym index...")
+	saveSynonymIndex(wordlists, indexFile)
+	return SynonymIndex(indexFile)
 
 def main():
 	parser = argparse.ArgumentParser(description='')
-	parser.add_argument('--wordlist',required=True,type=str,help='Wordlist to help resolve conflicts')
-	parser.add_argument('--conflicts',required=True,type=str,help='File with conflicting terms (separated by ;)')
+	parser.add_argument('--wordlist',required=True,type=str,nargs='+',help='Wordlist(s) to help resolve conflicts (each either a terms_TYPE.tsv filename or as TYPE=filename)')
+	parser.add_argument('--conflicts',required=True,type=str,nargs='+',help='File(s) with conflicting terms (one per line)')
+	parser.add_argument('--synonymIndex',required=False,type=str,help='Synonym index to reuse between runs (rebuilt if it was built from other files or any wordlist has changed, unless it also has other types)')
+	parser.add_argument('--existingDeletions',required=False,type=str,nargs='*',default=[],help='Existing deletions file(s) (each either a deletions_TYPE.tsv filename or as TYPE=filename). Only rows that are not already resolved by them are output')
 	parser.add_argument('--nowarn', action='store_true', help='Do not check for missing conflicts where one is expected')
-	parser.add_argument('--outFile',required=True,type=str,help='Output file with resolution options (for deletions file)')
+	parser.add_argument('--outFile',required=True,type=str,help='Output file with resolution options (for deletions file). With wordlists of several types, {type} in the name is replaced by each type')
 	args = parser.parse_args()
 
-	print("Loading wordlist...")
-	main_terms = {}
-	synonym_to_identifier = defaultdict(list)
-	with open(args.wordlist) as f:
-		for line in f:
-			split = line.strip('\n').split('\t')
-			identifier,main,synonyms = split[:3]
-			
-			main_terms[identifier] = main
-			for s in synonyms.lower().split('|'):
-				synonym_to_identifier[s].append(identifier)
-
-	print("Processing conflicts...")
-	with open(args.conflicts) as f, open(args.outFile,'w') as outF:
-		conflicting_terms = sorted(set([ line.strip().lower() for line in f ]))
-		for ct in conflicting_terms:
-			identifiers = synonym_to_identifier[ct]
+	wordlists = [ parseWordlistArgument(argument) for argument in args.wordlist ]
+	types = sorted(set( listType for listType,_ in wordlists ))
+	assert len(types) == 1 or '{type}' in args.outFile, "--outFile needs {type} in the name for wordlists of several types"
+
+	# Without a persisted index, a temporary one is built and removed at the end
+	with tempfile.TemporaryDirectory() as tempDir:
+		index = loadSynonymIndex(wordlists, args.synonymIndex or os.path.join(tempDir, 'synonyms.index'))
+
+		deletions = defaultdict(dict)
+		for argument in args.existingDeletions:
+			listType,filename = parseWordlistArgument(argument)
+			for termid,terms in loadDeletions(filename).items():
+				deletions[listType][termid] = deletions[listType].get(termid,frozenset()).union(terms)
+
+		print("Processing conflicts...")
+		conflicting_terms = set()
+		for filename in args.conflicts:
+			with open(filename) as f:
+				conflicting_terms.update( line.strip().lower() for line in f )
+		conflicting_terms.discard('')
+
+		outputs = defaultdict(list)
+		resolvedCount = 0
+		for ct in sorted(conflicting_terms):
+			postings = [ posting for posting in index.lookupWithNames(ct) if posting[0] in types ]
 
 			if not args.nowarn:
-				assert len(identifiers) > 1, "Couldn't find conflict for term: %s" % ct
+				assert len(postings) > 1, "Couldn't find conflict for term: %s" % ct
+
+			# Conflicts that are already resolved by the existing deletions (so at most one identifier is left) are skipped
+			remaining = [ (listType,identifier,main) for listType,identifier,main in postings if not ct in deletions[listType].get(identifier,()) ]
+			if len(postings) > 1 and len(remaining) <= 1:
+				resolvedCount += 1
+				continue
 
-			if len(identifiers) > 1:
-				for identifier in identifiers:
-					outData = [ identifier, main_terms[identifier], ct ]
+			if len(remaining) > 1:
+				for listType,identifier,main in remaining:
+					outputs[listType].append( [ identifier, main, ct ] )
+
+		for listType in types:
+			with open(args.outFile.replace('{type}',listType),'w') as outF:
+				for outData in outputs[listType]:
 					outF.write("\t".join(outData) + "\n")
 
+		if resolvedCount > 0:
+			print("Skipped %d conflicts that are already resolved" % resolvedCount)
+
 	print("Done")
-			
+
 
 if __name__ == '__main__':
 	main()
@@ -4,6 +4,7 @@ import json
 import time
 import os
 import sys
+from wordlists import readWordlist
 
 #for url in search('egfr gene', stop=10):
 #	print(url)
@@ -15,11 +16,8 @@ if __name__ == '__main__':
 	args = parser.parse_args()
 
 	genes = set()
-	with open(args.genes) as f:
-		for line in f:
-			gene_hugo_id,name,terms,gene_entrez_id = line.strip('\n').split('\t')
-			terms = terms.split('|')
-			genes.update(terms)
+	for gene_hugo_id,name,terms in readWordlist(args.genes):
+		genes.update(terms)
 
 	genes = sorted(list(genes))
 	print("%d gene names loaded" % len(genes))
@@ -0,0 +1,28 @@
+import io
+import json
+from annotateDocuments import readDocuments, annotateDocuments
+
+def test_readDocumentsSkipsMissingText(capsys):
+	lines = [ json.dumps({ 'id':'a', 'text':'EGFR' }), '', json.dumps({ 'id':'b', 'title':'no text' }), json.dumps({ 'text':'ERBB2' }) ]
+
+	documents = list(readDocuments(io.StringIO("\n".join(lines) + "\n"), 'jsonl', 'id', 'text'))
+
+	assert documents == [ ('a','EGFR'), (3,'ERBB2') ]
+	assert capsys.readouterr().out == "Skipped 1 documents without a text field\n"
+
+def test_annotateDocumentsInOrder(tmp_path):
+	genes = tmp_path / 'terms_genes.tsv'
+	genes.write_text("HGNC:1\tEGFR\tegfr\t1956\nHGNC:2\tERBB2\terbb2|her2\t2064\n")
+	conflicting = tmp_path / 'terms_conflicting.tsv'
+	conflicting.write_text("UNUSED\tUNUSED\ther2 negative\n")
+	wordlists = [str(genes), str(conflicting)]
+
+	documents = [ (i, "EGFR and HER2 negative tumours %d with ERBB2" % i if i % 3 else "no genes") for i in range(50) ]
+	serial = [ line for lines in annotateDocuments(documents, wordlists, None, None, processes=1, batchSize=4) for line in lines ]
+	parallel = [ line for lines in annotateDocuments(documents, wordlists, None, None, processes=3, batchSize=4) for line in lines ]
+
+	assert parallel == serial
+	mentions = [ json.loads(line) for line in serial ]
+	assert [ m['document'] for m in mentions ] == sorted( m['document'] for m in mentions )
+	assert mentions[:2] == [ { 'document':1, 'start':0, 'end':4, 'text':'EGFR', 'type':'genes', 'id':'HGNC:1' }, { 'document':1, 'start':38, 'end':43, 'text':'ERBB2', 'type':'genes', 'id':'HGNC:2' } ]
+	assert len(mentions) == 2 * len([ i for i in range(50) if i % 3 ])
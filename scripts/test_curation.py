@@ -0,0 +1,56 @@
+import os
+from curation import loadDeletions, appendLinesAtomically, TermFilter
+
+def test_appendLinesAtomically(tmp_path):
+	filename = str(tmp_path / 'deletions_genes.tsv')
+	with open(filename,'w') as f:
+		f.write("1\tA1BG\ta1b")
+
+	appendLinesAtomically(filename, ["2\tA2M\ta2m"])
+
+	with open(filename) as f:
+		assert f.read() == "1\tA1BG\ta1b\n2\tA2M\ta2m\n"
+	assert not os.path.exists(filename + '.tmp')
+
+def test_appendLinesAtomicallyThroughSymlink(tmp_path):
+	# The curation files in working/ are symlinks into custom/
+	(tmp_path / 'custom').mkdir()
+	(tmp_path / 'working').mkdir()
+	target = str(tmp_path / 'custom' / 'deletions_genes.tsv')
+	link = str(tmp_path / 'working' / 'deletions_genes.tsv')
+	with open(target,'w') as f:
+		f.write("1\tA1BG\ta1b\n")
+	os.symlink(target, link)
+
+	appendLinesAtomically(link, ["2\tA2M\ta2m"])
+
+	assert os.path.islink(link)
+	assert loadDeletions(target) == { '1':frozenset(['a1b']), '2':frozenset(['a2m']) }
+
+def test_appendLinesAtomicallyNewFile(tmp_path):
+	filename = str(tmp_path / 'stopwords_genes.txt')
+	appendLinesAtomically(filename, ["all","was"])
+	with open(filename) as f:
+		assert f.read() == "all\nwas\n"
+
+def test_termFilter():
+	termFilter = TermFilter(stopwords=frozenset(['all']), deletions={ 'X':frozenset(['bad']) }, rules=[('short', lambda x : len(x) <= 2)])
+	assert termFilter.filter('X', ['All','bad','ok','good']) == ['good']
+	assert termFilter.removed['stopword'] == 1
+	assert termFilter.removed['custom deletion'] == 1
+	assert termFilter.removed['short'] == 1
+
+def test_termFilterSelectedChecks():
+	termFilter = TermFilter(stopwords=frozenset(['all']), deletions={ 'X':frozenset(['bad']) }, rules=[('short', lambda x : len(x) <= 2)])
+	assert termFilter.filter('X', ['all','bad','ok'], applyStopwords=False, applyRules=False) == ['all','ok']
+	assert termFilter.filter('X', ['all','bad','ok'], applyDeletions=False, applyStopwords=False) == ['all','bad']
+
+def test_termFilterDefaults(capsys):
+	termFilter = TermFilter()
+	assert termFilter.filter('X', ['all','bad']) == ['all','bad']
+	assert termFilter.deletions == {} and termFilter.rules == []
+	assert termFilter.deletions is not TermFilter().deletions
+	assert termFilter.rules is not TermFilter().rules
+
+	termFilter.report()
+	assert capsys.readouterr().out == "Terms removed by each rule:\n  custom deletion: 0\n  stopword: 0\n"
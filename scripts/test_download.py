@@ -0,0 +1,134 @@
+import http.server
+import os
+import threading
+import pytest
+import download
+from download import fetchResource, fetchAll
+
+class ResourceHandler(http.server.BaseHTTPRequestHandler):
+	"""
+	Serves a single resource with an ETag, supporting conditional and range requests. The server can be told to drop the connection part way through the next responses
+	"""
+	def do_GET(self):
+		server = self.server
+		server.requests.append(dict(self.headers))
+		content, etag = server.content, server.etag
+
+		if self.headers.get('If-None-Match') == etag:
+			self.send_response(304)
+			self.end_headers()
+			return
+
+		offset = 0
+		rangeHeader = self.headers.get('Range')
+		if rangeHeader and self.headers.get('If-Range', etag) == etag:
+			offset = int(rangeHeader[len('bytes='):].rstrip('-'))
+
+		body = content[offset:]
+		self.send_response(206 if offset else 200)
+		self.send_header('ETag', etag)
+		self.send_header('Content-Length', str(len(body)))
+		if offset:
+			self.send_header('Content-Range', 'bytes %d-%d/%d' % (offset, len(content)-1, len(content)))
+		self.end_headers()
+
+		if server.drops > 0:
+			server.drops -= 1
+			self.wfile.write(body[:len(body)//2])
+			self.wfile.flush()
+			self.close_connection = True
+			return
+		self.wfile.write(body)
+
+	def log_message(self, *args):
+		pass
+
+@pytest.fixture
+def server(monkeypatch):
+	monkeypatch.setattr(download.time, 'sleep', lambda seconds : None)
+	# Small blocks so that a dropped connection leaves part of the file behind
+	monkeypatch.setattr(download, 'BLOCK_SIZE', 16)
+
+	httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), ResourceHandler)
+	httpd.content, httpd.etag, httpd.drops, httpd.requests = b'0123456789' * 100, '"v1"', 0, []
+	thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+	thread.start()
+	yield httpd
+	httpd.shutdown()
+	httpd.server_close()
+
+def getURL(httpd):
+	return 'http://127.0.0.1:%d/gene_info' % httpd.server_address[1]
+
+def test_fetchConditional(server, tmp_path):
+	filename = str(tmp_path / 'gene_info')
+
+	assert fetchResource(getURL(server), filename) == True
+	assert fetchResource(getURL(server), filename) == False
+	assert server.requests[-1]['If-None-Match'] == '"v1"'
+
+	server.content, server.etag = b'changed', '"v2"'
+	assert fetchResource(getURL(server), filename) == True
+	with open(filename,'rb') as f:
+		assert f.read() == b'changed'
+	assert not os.path.exists(filename + '.part')
+
+def test_fetchResumesAfterDrop(server, tmp_path):
+	filename = str(tmp_path / 'gene_info')
+	server.drops = 1
+
+	assert fetchResource(getURL(server), filename, retries=2) == True
+
+	with open(filename,'rb') as f:
+		assert f.read() == server.content
+	assert len(server.requests) == 2
+	assert server.requests[1]['Range'] == 'bytes=%d-' % (len(server.content)//2)
+	assert server.requests[1]['If-Range'] == '"v1"'
+
+def test_fetchRestartsWhenChangedDuringResume(server, tmp_path):
+	filename = str(tmp_path / 'gene_info')
+	server.drops = 1
+	with pytest.raises(Exception):
+		fetchResource(getURL(server), filename, retries=0)
+	assert os.path.isfile(filename + '.part')
+
+	# The range no longer applies to the new version so the whole file is sent
+	server.content, server.etag = b'abcdefghij' * 50, '"v2"'
+	assert fetchResource(getURL(server), filename) == True
+	with open(filename,'rb') as f:
+		assert f.read() == server.content
+
+def test_fetchGivesUpAfterRetries(server, tmp_path):
+	filename = str(tmp_path / 'gene_info')
+	server.drops = 3
+
+	with pytest.raises(Exception):
+		fetchResource(getURL(server), filename, retries=2)
+	assert len(server.requests) == 3
+
+def test_fetchLocalFile(tmp_path):
+	source = tmp_path / 'doid.obo'
+	source.write_text('format-version: 1.2\n')
+	filename = str(tmp_path / 'mirror.obo')
+	url = source.as_uri()
+
+	assert fetchResource(url, filename) == True
+	assert fetchResource(url, filename) == False
+
+	source.write_text('format-version: 1.4\n')
+	assert fetchResource(url, filename) == True
+	with open(filename) as f:
+		assert f.read() == 'format-version: 1.4\n'
+
+def test_fetchAll(server, tmp_path, capsys):
+	source = tmp_path / 'doid.obo'
+	source.write_text('format-version: 1.2\n')
+	mirrorDir = str(tmp_path / 'mirror')
+	resources = [ ('gene_info',getURL(server)), ('doid.obo',source.as_uri()) ]
+
+	fetchAll(resources, mirrorDir, workers=2)
+	fetchAll(resources, mirrorDir, workers=2)
+
+	lines = capsys.readouterr().out.splitlines()
+	assert sorted(lines[:2]) == [ 'Downloaded doid.obo from %s' % source.as_uri(), 'Downloaded gene_info from %s' % getURL(server) ]
+	assert sorted(lines[2:]) == [ 'doid.obo is up to date', 'gene_info is up to date' ]
@@ -0,0 +1,132 @@
+import sys
+import pytest
+from collections import defaultdict
+
+pytest.importorskip('pronto')
+
+import generateCancerTerms
+from generateCancerTerms import loadMetathesaurus, loadMetathesaurusSubset, subsetMetathesaurus
+from umls import buildMetathesaurusIndex
+
+OBO = """format-version: 1.2
+ontology: doid
+
+[Term]
+id: DOID:162
+name: cancer
+
+[Term]
+id: DOID:0050687
+name: cell type cancer
+is_a: DOID:162 ! cancer
+
+[Term]
+id: DOID:305
+name: carcinoma
+synonym: "epithelial neoplasm" EXACT []
+synonym: "carcinomatous growth" RELATED []
+xref: UMLS_CUI:C0007097
+is_a: DOID:0050687 ! cell type cancer
+
+[Term]
+id: DOID:1612
+name: breast cancer
+xref: UMLS_CUI:C0006142
+is_a: DOID:305 ! carcinoma
+
+[Term]
+id: DOID:9256
+name: colorectal cancer
+is_a: DOID:305 ! carcinoma
+
+[Term]
+id: DOID:1240
+name: leukemia
+is_a: DOID:0050687 ! cell type cancer
+
+[Term]
+id: DOID:9952
+name: acute lymphocytic leukemia
+is_a: DOID:1240 ! leukemia
+
+[Term]
+id: DOID:0000001
+name: old tumor
+is_obsolete: true
+"""
+
+# Sorted by CUID as in UMLS releases. The colorectal cancer CUID is only found by its first English term
+ROWS = [
+	('C0006142', 'ENG', 'MTH', 'Malignant neoplasm of breast'),
+	('C0006142', 'FRE', 'MSHFRE', 'Tumeurs du sein'),
+	('C0006142', 'ENG', 'MSH', 'Breast Carcinoma'),
+	('C0007097', 'ENG', 'MSH', 'Carcinoma'),
+	('C0007097', 'ENG', 'NCI', 'carcinoma, NOS'),
+	('C0009402', 'ENG', 'MTH', 'Colorectal Cancer'),
+	('C0009402', 'ENG', 'NCI', 'colorectal tumor'),
+	('C0023418', 'GER', 'MSHGER', 'Leukämie'),
+	('C0023418', 'ENG', 'MSH', 'Leukemia'),
+	('C0023418', 'ENG', 'NCI', 'leukemia, NOS'),
+	('C0023449', 'ENG', 'MSH', 'acute lymphocytic leukemia'),
+	('C0023449', 'ENG', 'NCI', 'ALL'),
+	('C0023449', 'ENG', 'NCI', 'lymphoblastic leukemia'),
+	('C9999999', 'ENG', 'MTH', 'unrelated term'),
+]
+
+def writeMRCONSO(filename, rows):
+	with open(filename,'w',encoding='utf8') as f:
+		for i,(cui,lat,sab,term) in enumerate(rows):
+			columns = [cui, lat, 'P', 'L%07d' % i, 'PF', 'S%07d' % i, 'Y', 'A%07d' % i, '', '', '', sab, 'PT', 'X%d' % i, term, '0', 'N', '256']
+			f.write("|".join(columns) + "|\n")
+
+def runMain(monkeypatch, arguments):
+	monkeypatch.setattr(sys, 'argv', ['generateCancerTerms.py'] + arguments)
+	generateCancerTerms.main()
+
+def test_umlsModesGiveSameOutput(tmp_path, monkeypatch, capsys):
+	oboFile = tmp_path / 'doid.obo'
+	oboFile.write_text(OBO)
+	stopwords = tmp_path / 'cancer_stopwords.txt'
+	stopwords.write_text("cancer\n")
+	mrconso = str(tmp_path / 'MRCONSO.RRF')
+	writeMRCONSO(mrconso, ROWS)
+	indexDir = str(tmp_path / 'umls_index')
+	buildMetathesaurusIndex(mrconso, indexDir)
+
+	common = ['--diseaseOntologyFile', str(oboFile), '--cancerStopwords', str(stopwords)]
+	modes = {
+		'full': ['--umlsConceptFile', mrconso],
+		'subset': ['--umlsConceptFile', mrconso, '--umlsSubsetOnly'],
+		'index': ['--umlsIndex', indexDir],
+	}
+	outputs = {}
+	for mode,arguments in modes.items():
+		outFile = str(tmp_path / ('terms_cancers_%s.tsv' % mode))
+		runMain(monkeypatch, common + arguments + ['--outFile', outFile])
+		with open(outFile,'rb') as f:
+			outputs[mode] = f.read()
+
+	# The fixture is sorted so the subset is streamed rather than taken from a full load
+	assert not "not sorted by CUID" in capsys.readouterr().out
+	assert outputs['subset'] == outputs['full']
+	assert outputs['index'] == outputs['full']
+
+	lines = outputs['full'].decode('utf8').splitlines()
+	assert [ line.split('\t')[0] for line in lines ] == ['DOID:1240','DOID:1612','DOID:305','DOID:9256','DOID:9952']
+	assert "DOID:9256\tcolorectal cancer\tcolorectal cancer|colorectal cancers|colorectal tumor|colorectal tumors|colorectal tumour|colorectal tumours" in lines
+
+def test_subsetFallsBackWhenUnsorted(tmp_path, capsys):
+	# The rows of one CUID are split by another CUID
+	rows = ROWS[3:5] + ROWS[:3] + [('C0007097', 'ENG', 'MTH', 'Epithelioma')] + ROWS[5:]
+	mrconso = str(tmp_path / 'MRCONSO.RRF')
+	writeMRCONSO(mrconso, rows)
+	wantedCUIDs = set(['C0007097','C0006142'])
+	wantedNames = set(['colorectal cancer','leukemia','missing'])
+
+	meta, mainTerm = loadMetathesaurusSubset(mrconso, wantedCUIDs, wantedNames)
+
+	assert "not sorted by CUID" in capsys.readouterr().out
+	assert (meta, mainTerm) == subsetMetathesaurus(loadMetathesaurus(mrconso), wantedCUIDs, wantedNames)
+	assert meta['C0007097'] == ['Carcinoma', 'carcinoma, NOS', 'Epithelioma']
+	assert sorted(meta.keys()) == ['C0006142','C0007097','C0009402','C0023418']
+	assert mainTerm == { 'colorectal cancer':'C0009402', 'leukemia':'C0023418' }
@@ -0,0 +1,84 @@
+import gzip
+import os
+import subprocess
+import sys
+from umls import buildMetathesaurusIndex
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'generateGeneTerms.py')
+
+HEADER = "#tax_id\tGeneID\tSymbol\tLocusTag\tSynonyms\tdbXrefs\tchromosome\tmap_location\tdescription\ttype_of_gene\tSymbol_from_nomenclature_authority\tFull_name_from_nomenclature_authority\tNomenclature_status\tOther_designations\tModification_date\tFeature_type"
+
+def makeGene(taxonomy, geneID, symbol, synonyms, dbXrefs, typeOfGene, fullName):
+	return "\t".join([taxonomy, geneID, symbol, '-', synonyms, dbXrefs, '7', '7p11.2', fullName, typeOfGene, symbol, fullName, 'O', '-', '20200101', '-'])
+
+HUMAN_GENES = [
+	makeGene('9606', '1956', 'EGFR', 'ERBB|ERBB1|HER1', 'MIM:131550|HGNC:HGNC:3236|Ensembl:ENSG00000146648', 'protein-coding', 'epidermal growth factor receptor'),
+	makeGene('9606', '7157', 'TP53', 'P53|LFS1', 'MIM:191170|HGNC:HGNC:11998', 'protein-coding', 'tumor protein p53'),
+	makeGene('9606', '2064', 'ERBB2', 'HER2|"NEU"', 'HGNC:HGNC:3430', 'protein-coding', 'erb-b2 receptor tyrosine kinase 2'),
+	# Skipped as not protein coding or without an HGNC identifier
+	makeGene('9606', '100', 'PSEUDO1', '-', 'HGNC:HGNC:1', 'pseudo', 'a pseudogene'),
+	makeGene('9606', '101', 'NOHGNC', '-', 'MIM:1', 'protein-coding', 'no hgnc gene'),
+]
+
+OTHER_GENES = [
+	makeGene('10090', '13649', 'Egfr', 'Erbb|wa5', 'MGI:MGI:95294|HGNC:HGNC:3236', 'protein-coding', 'epidermal growth factor receptor'),
+	makeGene('96060', '1', 'FAKE', '-', 'HGNC:HGNC:99', 'protein-coding', 'fake gene'),
+	makeGene('19606', '2', 'FAKE2', '-', 'HGNC:HGNC:98', 'protein-coding', 'fake gene two'),
+]
+
+MRCONSO_ROWS = [
+	('C1414996', 'ENG', 'HGNC', 'HGNC:3236', 'EGFR gene'),
+	('C1414996', 'ENG', 'HGNC', 'HGNC:3236', 'Proto-Oncogene c-ErbB-1'),
+	('C1414996', 'FRE', 'HGNC', 'HGNC:3236', 'récepteur'),
+	# Another source with an HGNC code is not used
+	('C1414996', 'ENG', 'OTHER', 'HGNC:3236', 'other source name'),
+	('C0079419', 'ENG', 'HGNC', 'HGNC:11998', 'TP53 gene'),
+	('C0079419', 'ENG', 'HGNC', 'HGNC:99', 'fake umls name'),
+]
+
+def writeGeneInfo(filename, lines):
+	with gzip.open(filename,'wb') as f:
+		for line in lines:
+			f.write(line.encode('utf8') + b"\n")
+
+def writeMRCONSO(filename):
+	with open(filename,'w',encoding='utf8') as f:
+		for i,(cui,lat,sab,code,term) in enumerate(MRCONSO_ROWS):
+			columns = [cui, lat, 'P', 'L%07d' % i, 'PF', 'S%07d' % i, 'Y', 'A%07d' % i, '', '', '', sab, 'PT', code, term, '0', 'N', '256']
+			f.write("|".join(columns) + "|\n")
+
+def runGenerateGeneTerms(tmp_path, geneInfo, umlsArguments, outName):
+	stopwords = tmp_path / 'stopwords_genes.txt'
+	stopwords.write_text("lfs1\n")
+	outFile = str(tmp_path / outName)
+	subprocess.run([sys.executable, SCRIPT, '--ncbiGeneInfoFile', geneInfo, '--geneStopwords', str(stopwords), '--outFile', outFile] + umlsArguments, check=True, stdout=subprocess.DEVNULL)
+	with open(outFile,'rb') as f:
+		return f.read()
+
+def test_otherOrganismsSkipped(tmp_path):
+	mrconso = str(tmp_path / 'MRCONSO.RRF')
+	writeMRCONSO(mrconso)
+	indexDir = str(tmp_path / 'umls_index')
+	buildMetathesaurusIndex(mrconso, indexDir)
+
+	# The other organisms are mixed in with the human genes (including one that is not valid UTF-8)
+	allGenes = str(tmp_path / 'gene_info.gz')
+	writeGeneInfo(allGenes, [HEADER] + OTHER_GENES[:1] + HUMAN_GENES[:2] + OTHER_GENES[1:] + HUMAN_GENES[2:])
+	with gzip.open(allGenes,'ab') as f:
+		f.write(b"7955\t3\tlatin\t-\t-\tHGNC:HGNC:97\t-\t-\tcaf\xe9\tprotein-coding\tlatin\tcaf\xe9\n")
+	humanGenes = str(tmp_path / 'Homo_sapiens.gene_info.gz')
+	writeGeneInfo(humanGenes, [HEADER] + HUMAN_GENES)
+
+	outputs = [ runGenerateGeneTerms(tmp_path, geneInfo, umlsArguments, 'terms_genes_%d.tsv' % i) for i,(geneInfo,umlsArguments) in enumerate([
+		(allGenes, ['--umlsConceptFile', mrconso]),
+		(humanGenes, ['--umlsConceptFile', mrconso]),
+		(allGenes, ['--umlsIndex', indexDir]),
+	]) ]
+
+	assert outputs[1] == outputs[0]
+	assert outputs[2] == outputs[0]
+	assert outputs[0].decode('utf8').splitlines() == [
+		"HGNC:3236\tEGFR\tegfr|egfr gene|epidermal growth factor receptor|erbb|erbb1|her1|proto-oncogene c-erbb-1\t1956",
+		"HGNC:3430\tERBB2\terb-b2 receptor tyrosine kinase 2|erbb2|her2|neu\t2064",
+		"HGNC:11998\tTP53\tp53|tp53|tp53 gene|tumor protein p53\t7157",
+	]
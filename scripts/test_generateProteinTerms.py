@@ -0,0 +1,104 @@
+import io
+import sys
+import gzip
+import xml.etree.ElementTree as etree
+import generateProteinTerms
+from generateProteinTerms import iterHumanEntryNames, iterEntryBlocks, parseEntryBlocks, getEntryNames, isHumanOrganism, UNIPROT_NS, HUMAN_TAXONOMY
+
+def makeEntry(accession, taxonomy, names, hostTaxonomy=None):
+	alternatives = "".join( "<alternativeName><fullName>%s</fullName></alternativeName>" % n for n in names[1:] )
+	host = '<organismHost><dbReference type="NCBI Taxonomy" id="%s"/></organismHost>' % hostTaxonomy if hostTaxonomy else ''
+	return """<entry dataset="Swiss-Prot" created="2000-05-30">
+  <accession>%s</accession>
+  <accession>%s2</accession>
+  <name>%s_NAME</name>
+  <protein>
+    <recommendedName><fullName>%s</fullName></recommendedName>%s
+  </protein>
+  <organism>
+    <name type="scientific">Organism %s</name>
+    <dbReference type="NCBI Taxonomy" id="%s"/>
+  </organism>%s
+  <sequence length="3">MAG</sequence>
+</entry>
+""" % (accession, accession, accession, names[0], alternatives, taxonomy, taxonomy, host)
+
+def makeUniProt(entries):
+	return ('<?xml version="1.0" encoding="UTF-8"?>\n<uniprot xmlns="http://uniprot.org/uniprot" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">\n' + "".join(entries) + '<copyright>\nCopyrighted by the UniProt Consortium\n</copyright>\n</uniprot>\n').encode('utf8')
+
+ENTRIES = [
+	makeEntry('P00001', '9606', ['Epidermal growth factor receptor', 'Proto-oncogene c-ErbB-1', 'Receptor tyrosine-protein kinase erbB-1']),
+	makeEntry('P00002', '10090', ['Mouse protein']),
+	# A virus that infects humans is not a human entry
+	makeEntry('P00003', '11676', ['Envelope glycoprotein gp160'], hostTaxonomy='9606'),
+	makeEntry('P00004', '9606', ['Cellular tumor antigen p53 protein', 'Tumor suppressor p53', 'Phosphoprotein p53']),
+	makeEntry('P00005', '9606', ['Protéine kinase', 'AB']),
+]
+
+def parseFullTree(data):
+	# The original approach: parse the whole file and check the organism of every entry
+	root = etree.fromstring(data)
+	results = []
+	for entry in root.iterfind(UNIPROT_NS + 'entry'):
+		if isHumanOrganism(entry.find(UNIPROT_NS + 'organism')):
+			results.append(getEntryNames(entry))
+	return results
+
+def test_streamedEntriesMatchFullTree():
+	data = makeUniProt(ENTRIES)
+
+	streamed = list(iterHumanEntryNames(io.BytesIO(data)))
+
+	assert streamed == parseFullTree(data)
+	assert [ accession for accession,_,_ in streamed ] == ['P00001','P00004','P00005']
+	assert streamed[0] == ('P00001', 'P00001_NAME', ['P00001_NAME', 'Epidermal growth factor receptor', 'Proto-oncogene c-ErbB-1', 'Receptor tyrosine-protein kinase erbB-1'])
+
+def test_iterEntryBlocksAcrossReads():
+	data = makeUniProt(ENTRIES)
+
+	# Small reads split the entry tags and the end tags across reads
+	for readSize in [1,7,64,len(data)]:
+		assert list(iterEntryBlocks(io.BytesIO(data), readSize=readSize)) == [ entry.rstrip('\n').encode('utf8') for entry in ENTRIES ]
+
+def test_parseEntryBlocks():
+	blocks = [ entry.rstrip('\n').encode('utf8') for entry in ENTRIES ]
+	# Mentions the human taxonomy so gets past the prefilter, but only for its host
+	assert HUMAN_TAXONOMY in blocks[2]
+
+	results = parseEntryBlocks(blocks)
+
+	assert [ accession for accession,_,_ in results ] == ['P00001','P00004','P00005']
+	assert results[2] == ('P00005', 'P00005_NAME', ['P00005_NAME', 'Protéine kinase', 'AB'])
+
+def writeUniProtFixture(tmp_path, entries):
+	uniprotXML = str(tmp_path / 'uniprot.xml.gz')
+	with gzip.open(uniprotXML,'wb') as f:
+		f.write(makeUniProt(entries))
+	stopwords = tmp_path / 'stopwords.txt'
+	stopwords.write_text("ab\n")
+	return uniprotXML, str(stopwords)
+
+def test_mainSameWithProcesses(tmp_path, monkeypatch):
+	# Enough entries to cross the batch boundaries, with some non-human entries that have a human host
+	entries = []
+	for i in range(2500):
+		if i % 7 == 0:
+			entries.append(makeEntry('Q%05d' % i, '11676', ['Envelope glycoprotein %d' % i], hostTaxonomy='9606'))
+		elif i % 5 == 0:
+			entries.append(makeEntry('Q%05d' % i, '10090', ['Mouse protein %d' % i]))
+		else:
+			entries.append(makeEntry('Q%05d' % i, '9606', ['Kinase %d protein' % i, 'K%d' % i]))
+	uniprotXML, stopwords = writeUniProtFixture(tmp_path, entries)
+
+	outputs = {}
+	for processes in [1,3]:
+		outFile = str(tmp_path / ('terms_proteins_%d.tsv' % processes))
+		monkeypatch.setattr(sys, 'argv', ['generateProteinTerms.py', '--uniprotXML', uniprotXML, '--proteinStopwords', stopwords, '--outFile', outFile, '--processes', str(processes)])
+		generateProteinTerms.main()
+		with open(outFile) as f:
+			outputs[processes] = f.read()
+
+	assert outputs[3] == outputs[1]
+	lines = outputs[1].splitlines()
+	assert len(lines) == len([ i for i in range(2500) if i % 7 != 0 and i % 5 != 0 ])
+	assert lines[0] == "Q00001\tQ00001_NAME\tKinase 1|Kinase 1 protein|Q00001_NAME"
@@ -0,0 +1,51 @@
+import pytest
+from matcher import loadMatcher, saveMatcher, loadMatcherFile, selectLongestMatches
+
+TEXT = "EGFR inhibitors and HER-2 inhibitor in lung cancer, not egfrvIII or inhibitor of ERBB."
+
+@pytest.fixture
+def wordlists(tmp_path):
+	genes = tmp_path / 'terms_genes.tsv'
+	genes.write_text("HGNC:1\tEGFR\tegfr|her1|erbb\t1956\nHGNC:2\tERBB2\therb2|erbb2|her-2|erbb\t2064\n")
+	cancers = tmp_path / 'terms_cancers.tsv'
+	cancers.write_text("DOID:1\tlung cancer\tlung cancer|cancer\n")
+	templates = tmp_path / 'templates_drugs.inhibitors.tsv'
+	templates.write_text("D1\tegfr inhibitor\tHGNC:1\tegfr inhibitors\nD2\therb2 inhibitor\tHGNC:2\t\n")
+	return [str(genes), str(cancers)], str(templates)
+
+def test_savedMatcherMatchesInMemory(wordlists, tmp_path):
+	filenames, templates = wordlists
+	matcher = loadMatcher(filenames, inhibitorTemplates=templates)
+	saveMatcher(matcher, str(tmp_path / 'wordlists.automaton'))
+
+	flat = loadMatcherFile(str(tmp_path / 'wordlists.automaton'))
+
+	assert flat.match(TEXT) == matcher.match(TEXT)
+	assert len(matcher.match(TEXT)) > 0
+
+def test_matchTokenBoundaries(wordlists):
+	filenames, templates = wordlists
+	matcher = loadMatcher(filenames, inhibitorTemplates=templates)
+
+	matches = [ (TEXT[start:end],termid) for start,end,termid,_ in matcher.match(TEXT) ]
+
+	# egfrvIII is not a match as it runs on into letters, and "EGFR inhibitors" is excluded for its inhibitor
+	assert matches == [ ('EGFR','HGNC:1'), ('HER-2','HGNC:2'), ('HER-2 inhibitor','D2'), ('lung cancer','DOID:1'), ('cancer','DOID:1'), ('inhibitor of ERBB','D1'), ('inhibitor of ERBB','D2'), ('ERBB','HGNC:1'), ('ERBB','HGNC:2') ]
+
+def test_matchEdgesOfText(wordlists):
+	filenames, _ = wordlists
+	matcher = loadMatcher(filenames)
+
+	assert matcher.match("egfr") == [ (0,4,'HGNC:1','genes') ]
+	assert matcher.match("(EGFR)") == [ (1,5,'HGNC:1','genes') ]
+	assert matcher.match("xegfr egfrx egfr2 2egfr") == []
+
+def test_selectLongestMatchesSuppressesSameSpan():
+	matches = [ (0,7,'UNUSED4','conflicting'), (0,7,'HGNC:9','genes'), (0,3,'HGNC:1','genes') ]
+	assert selectLongestMatches(matches) == []
+
+def test_selectLongestMatchesOverlaps():
+	matches = [ (0,4,'HGNC:1','genes'), (0,11,'DOID:1','cancers'), (5,11,'DOID:2','cancers'), (5,11,'Q1','drugs'), (9,15,'HGNC:2','genes'), (16,20,'HGNC:3','genes'), (16,20,'HGNC:4','genes'), (18,25,'UNUSED','conflicting'), (21,30,'UNUSED','conflicting'), (26,28,'HGNC:5','genes') ]
+
+	# The longest span wins, ties go to the earliest and all the matches of a span are kept unless it is conflicting
+	assert selectLongestMatches(matches) == [ (0,11,'DOID:1','cancers'), (16,20,'HGNC:3','genes'), (16,20,'HGNC:4','genes') ]
@@ -0,0 +1,77 @@
+import os
+import threading
+import time
+from pipeline import Step, findLocalImports, stepSignature, buildSteps, runPipeline
+
+def writeScripts(directory, scripts):
+	for name,content in scripts.items():
+		with open(os.path.join(directory,name),'w') as f:
+			f.write(content)
+
+def test_findLocalImports(tmp_path):
+	writeScripts(str(tmp_path), {
+		'generate.py':'import os\nfrom curation import TermFilter\nimport wordlists\n',
+		'curation.py':'from collections import Counter\n',
+		'wordlists.py':'import struct\nfrom helpers import x\n',
+		'helpers.py':'import wordlists\n' })
+
+	found = findLocalImports(str(tmp_path / 'generate.py'))
+
+	assert found == sorted( str(tmp_path / name) for name in ['curation.py','wordlists.py','helpers.py'] )
+
+def test_signatureChangesWithImportedModule(tmp_path):
+	scriptsDir = str(tmp_path)
+	writeScripts(scriptsDir, { 'generate.py':'from curation import TermFilter\n', 'curation.py':'TermFilter = None\n' })
+	script = os.path.join(scriptsDir,'generate.py')
+	step = Step('generate', inputs=[script] + findLocalImports(script), outputs=[], command=['python',script])
+
+	before = stepSignature(step, {})
+	writeScripts(scriptsDir, { 'curation.py':'TermFilter = 1\n' })
+	after = stepSignature(step, {})
+
+	assert before != after
+
+def test_buildStepsIncludesSharedModules():
+	scriptsDir = os.path.dirname(os.path.abspath(__file__))
+	steps = { step.name:step for step in buildSteps(scriptsDir, 'MRCONSO.RRF') }
+
+	for name in ['cancers','genes','drugs_wikidata','drugs_inhibitors','proteins']:
+		assert os.path.join(scriptsDir,'curation.py') in steps[name].inputs, name
+	for name in ['drugs_wikidata','drugs_inhibitors','synonym_index','matcher','binary_genes']:
+		assert os.path.join(scriptsDir,'wordlists.py') in steps[name].inputs, name
+	assert os.path.join(scriptsDir,'matcher.py') in steps['matcher'].inputs
+	for step in steps.values():
+		assert len(step.inputs) == len(set(step.inputs)), step.name
+
+def test_runPipelineExclusiveSteps(tmp_path):
+	lock = threading.Lock()
+	active, overlaps = set(), {}
+
+	def makeAction(name):
+		def action(inputs, outputs):
+			with lock:
+				active.add(name)
+				overlaps[name] = set(active)
+			time.sleep(0.05)
+			with lock:
+				overlaps[name] |= active
+				active.remove(name)
+			with open(outputs[0],'w') as f:
+				f.write(name)
+		action.__name__ = name
+		return action
+
+	steps = [ Step(name, inputs=[], outputs=[str(tmp_path / name)], action=makeAction(name), exclusive=(name == 'umls_index')) for name in ['cancers','umls_index','genes','proteins'] ]
+	runPipeline(steps, str(tmp_path / 'state.json'), workers=3)
+
+	assert overlaps['umls_index'] == set(['umls_index'])
+	for name in ['cancers','genes','proteins']:
+		assert not 'umls_index' in overlaps[name], name
+
+def test_buildStepsExclusiveWithProcesses():
+	scriptsDir = os.path.dirname(os.path.abspath(__file__))
+	exclusive = lambda steps : sorted( step.name for step in steps if step.exclusive )
+
+	assert exclusive(buildSteps(scriptsDir, 'MRCONSO.RRF')) == []
+	assert exclusive(buildSteps(scriptsDir, 'MRCONSO.RRF', processes=4)) == ['proteins','umls_index']
+	assert exclusive(buildSteps(scriptsDir, 'MRCONSO.RRF', processes=4, wikidataDump='latest-all.json.gz')) == ['drugs_wikidata','proteins','umls_index']
@@ -0,0 +1,74 @@
+import os
+import pytest
+from resolveConflicts import loadSynonymIndex
+
+def writeGenes(filename, lines):
+	with open(filename,'w') as f:
+		for line in lines:
+			f.write(line + "\n")
+
+def test_loadSynonymIndexReusesUnchanged(tmp_path, capsys):
+	genes = str(tmp_path / 'terms_genes.tsv')
+	indexFile = str(tmp_path / 'synonyms.index')
+	writeGenes(genes, ["HGNC:1\tCCK\tcck|cholecystokinin\t885"])
+
+	loadSynonymIndex([('genes',genes)], indexFile)
+	index = loadSynonymIndex([('genes',genes)], indexFile)
+
+	assert capsys.readouterr().out == "Building synonym index...\nUsing existing synonym index...\n"
+	assert index.lookup('CCK') == [('genes','HGNC:1')]
+
+def test_loadSynonymIndexRebuildsForOtherFile(tmp_path, capsys):
+	oldGenes = str(tmp_path / 'genes_old.tsv')
+	newGenes = str(tmp_path / 'genes_new.tsv')
+	indexFile = str(tmp_path / 'synonyms.index')
+	writeGenes(oldGenes, ["HGNC:1\tCCK\tcck|cholecystokinin\t885"])
+	writeGenes(newGenes, ["HGNC:2\tFOO\tfoo\t1"])
+
+	loadSynonymIndex([('genes',oldGenes)], indexFile)
+	index = loadSynonymIndex([('genes',newGenes)], indexFile)
+
+	assert capsys.readouterr().out == "Building synonym index...\nBuilding synonym index...\n"
+	assert index.lookup('cck') == []
+	assert index.lookup('foo') == [('genes','HGNC:2')]
+
+def test_loadSynonymIndexRebuildsForChangedFile(tmp_path, capsys):
+	genes = str(tmp_path / 'terms_genes.tsv')
+	indexFile = str(tmp_path / 'synonyms.index')
+	writeGenes(genes, ["HGNC:1\tCCK\tcck\t885"])
+	loadSynonymIndex([('genes',genes)], indexFile)
+
+	writeGenes(genes, ["HGNC:1\tCCK\tcck|cholecystokinin\t885"])
+	index = loadSynonymIndex([('genes',genes)], indexFile)
+
+	assert capsys.readouterr().out == "Building synonym index...\nBuilding synonym index...\n"
+	assert index.lookup('cholecystokinin') == [('genes','HGNC:1')]
+
+def test_loadSynonymIndexReusesWiderIndex(tmp_path, capsys):
+	# An index built for all the wordlists can be used for a subset of them
+	genes = str(tmp_path / 'terms_genes.tsv')
+	cancers = str(tmp_path / 'terms_cancers.tsv')
+	indexFile = str(tmp_path / 'synonyms.index')
+	writeGenes(genes, ["HGNC:1\tCCK\tcck\t885"])
+	writeGenes(cancers, ["DOID:1\tcancer\tcancer"])
+
+	loadSynonymIndex([('genes',genes),('cancers',cancers)], indexFile)
+	loadSynonymIndex([('genes',genes)], indexFile)
+
+	assert capsys.readouterr().out == "Building synonym index...\nUsing existing synonym index...\n"
+
+def test_loadSynonymIndexKeepsWiderIndex(tmp_path, capsys):
+	# An out of date index with other types is not replaced by one with fewer types
+	genes = str(tmp_path / 'terms_genes.tsv')
+	cancers = str(tmp_path / 'terms_cancers.tsv')
+	indexFile = str(tmp_path / 'synonyms.index')
+	writeGenes(genes, ["HGNC:1\tCCK\tcck\t885"])
+	writeGenes(cancers, ["DOID:1\tcancer\tcancer"])
+	loadSynonymIndex([('genes',genes),('cancers',cancers)], indexFile)
+
+	writeGenes(genes, ["HGNC:1\tCCK\tcck|cholecystokinin\t885"])
+	with pytest.raises(AssertionError, match='other types \\(cancers\\)'):
+		loadSynonymIndex([('genes',genes)], indexFile)
+
+	assert [ listType for listType,_,_,_ in loadSynonymIndex([('genes',genes),('cancers',cancers)], indexFile).sources ] == ['cancers','genes']
+	assert capsys.readouterr().out == "Building synonym index...\nBuilding synonym index...\n"
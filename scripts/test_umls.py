@@ -0,0 +1,97 @@
+import pytest
+import umls
+from collections import defaultdict
+from umls import buildMetathesaurusIndex, getCodeKey, IndexTable, readMRCONSO, MRCONSO_CUI, MRCONSO_CODE, MRCONSO_STR
+
+ROWS = [
+	('C0006826', 'ENG', 'MTH', 'C0006826', 'Malignant Neoplasms'),
+	('C0006826', 'FRE', 'MSHFRE', 'D009369', 'Tumeurs malignes'),
+	('C0006826', 'ENG', 'MSH', 'D009369', 'Cancer'),
+	('C0007097', 'ENG', 'MSH', 'D002277', 'Carcinoma'),
+	('C0007097', 'ENG', 'NCI', 'C2916', 'carcinoma, NOS'),
+	('C1414996', 'ENG', 'HGNC', 'HGNC:3236', 'EGFR'),
+	('C1414996', 'ENG', 'HGNC', 'HGNC:3236', 'epidermal growth factor receptor'),
+	('C1414996', 'GER', 'MSHGER', 'D066246', 'EGF-Rezeptor'),
+	('C0079419', 'ENG', 'HGNC', 'HGNC:11998', 'TP53'),
+	('C0079419', 'ENG', 'MSH', 'D016159', 'p53 Protein – tumor suppressor'),
+	('C9999999', 'ENG', 'MTH', 'C9999999', 'cancer'),
+	('C8888888', 'SPA', 'MSHSPA', 'D000001', 'Cáncer'),
+	# The same code in two English sources
+	('C0153594', 'ENG', 'ICD10', 'C80', 'Malignant neoplasm without specification of site'),
+	('C0153595', 'ENG', 'ICD10CM', 'C80', 'Malignant (primary) neoplasm, unspecified'),
+]
+
+def writeMRCONSO(filename):
+	with open(filename,'w',encoding='utf8') as f:
+		for i,(cui,lat,sab,code,term) in enumerate(ROWS):
+			columns = [cui, lat, 'P', 'L%07d' % i, 'PF', 'S%07d' % i, 'Y', 'A%07d' % i, '', '', '', sab, 'PT', code, term, '0', 'N', '256']
+			f.write("|".join(columns) + "|\n")
+
+def parseMRCONSO(filename):
+	# Reference parse of the whole file (splitting every column of every row)
+	cuiTerms, codeTerms, mainTerms = defaultdict(list), defaultdict(list), {}
+	with open(filename,encoding='utf8') as f:
+		for line in f:
+			split = line.rstrip('\n').split('|')
+			cui, lat, sab, code, term = split[0], split[1], split[11], split[13], split[14]
+			if lat != 'ENG':
+				continue
+			if not cui in cuiTerms:
+				mainTerms[term.lower()] = cui
+			cuiTerms[cui].append(term)
+			codeTerms[(sab,code)].append(term)
+	return cuiTerms, codeTerms, mainTerms
+
+@pytest.mark.parametrize('processes', [1,2])
+def test_indexMatchesFullParse(tmp_path, monkeypatch, processes):
+	# Small chunks so that the rows are split over several of them
+	monkeypatch.setattr(umls, 'CHUNK_SIZE', 256)
+	filename = str(tmp_path / 'MRCONSO.RRF')
+	writeMRCONSO(filename)
+	indexDir = str(tmp_path / 'umls_index')
+
+	buildMetathesaurusIndex(filename, indexDir, processes=processes)
+	cuiTerms, codeTerms, mainTerms = parseMRCONSO(filename)
+
+	for tableName,expected in [('cui',cuiTerms),('code',codeTerms)]:
+		table = IndexTable(indexDir, tableName)
+		assert len(table) == len(expected), tableName
+		for key,terms in expected.items():
+			key = getCodeKey(*key) if tableName == 'code' else key
+			assert table[key] == terms, key
+		assert table['missing'] == []
+
+	codes = IndexTable(indexDir, 'code')
+	assert codes[getCodeKey('ICD10','C80')] == ['Malignant neoplasm without specification of site']
+	assert codes[getCodeKey('HGNC','HGNC:3236')] == ['EGFR', 'epidermal growth factor receptor']
+	assert codes['HGNC:3236'] == []
+
+	names = IndexTable(indexDir, 'name')
+	assert len(names) == len(mainTerms)
+	for name,cui in mainTerms.items():
+		assert names[name] == cui
+	assert not 'cáncer' in names
+	with pytest.raises(KeyError):
+		names['missing']
+
+def test_readMRCONSOMatchesFullParse(tmp_path, monkeypatch):
+	monkeypatch.setattr(umls, 'CHUNK_SIZE', 256)
+	filename = str(tmp_path / 'MRCONSO.RRF')
+	writeMRCONSO(filename)
+	_, codeTerms, _ = parseMRCONSO(filename)
+
+	rows = list(readMRCONSO(filename, [MRCONSO_CODE,MRCONSO_STR], codePrefix='HGNC:', processes=2))
+
+	assert rows == [ (code,term) for (_,code),terms in codeTerms.items() if code.startswith('HGNC:') for term in terms ]
+	assert list(readMRCONSO(filename, [MRCONSO_CUI], lang=None)) == [ (row[0],) for row in ROWS ]
+
+def test_indexWithoutCodeSources(tmp_path):
+	# A code table from before the keys included the source
+	indexDir = tmp_path / 'umls_index'
+	indexDir.mkdir()
+	for tableName,line in [('cui','C1414996\tEGFR\n'),('code','HGNC:3236\tEGFR\n'),('name','egfr\tC1414996\n')]:
+		(indexDir / ('%s.tsv' % tableName)).write_text(line)
+
+	assert IndexTable(str(indexDir), 'cui')['C1414996'] == ['EGFR']
+	with pytest.raises(AssertionError, match='Rebuild the index'):
+		IndexTable(str(indexDir), 'code')
@@ -0,0 +1,217 @@
+import http.server
+import json
+import bz2
+import gzip
+import os
+import re
+import tempfile
+import threading
+import urllib.parse
+import pytest
+import wikidata
+from wikidata import runQuery, runPagedQuery, loadSubclasses, readDumpEntities
+
+class SparqlHandler(http.server.BaseHTTPRequestHandler):
+	"""
+	Answers paged queries (from makePagedQuery) over a fixed list of items, with two rows for each item. Pages can be made to fail a number of times or always
+	"""
+	def do_POST(self):
+		server = self.server
+		body = self.rfile.read(int(self.headers['Content-Length'])).decode('utf8')
+		query = urllib.parse.parse_qs(body)['query'][0]
+		limit, offset = map(int, re.search(r'LIMIT (\d+) OFFSET (\d+)', query).groups())
+		server.requests.append(offset)
+
+		if offset in server.failing or server.failures.get(offset,0) > 0:
+			server.failures[offset] = server.failures.get(offset,0) - 1
+			self.send_response(503)
+			self.send_header('Retry-After', '0')
+			self.end_headers()
+			return
+
+		bindings = []
+		for item in server.items[offset:offset+limit]:
+			for alias in ['a','b']:
+				bindings.append({ 'item1':{ 'type':'uri', 'value':'http://www.wikidata.org/entity/%s' % item }, 'alias':{ 'type':'literal', 'value':'%s%s' % (item,alias) } })
+		data = json.dumps({ 'head':{ 'vars':['item1','alias'] }, 'results':{ 'bindings':bindings } }).encode('utf8')
+
+		self.send_response(200)
+		self.send_header('Content-Type', 'application/sparql-results+json')
+		self.send_header('Content-Length', str(len(data)))
+		self.end_headers()
+		self.wfile.write(data)
+
+	def log_message(self, *args):
+		pass
+
+@pytest.fixture
+def endpoint(monkeypatch):
+	monkeypatch.setattr(wikidata.time, 'sleep', lambda seconds : None)
+
+	httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), SparqlHandler)
+	httpd.items = [ 'Q%d' % i for i in range(1,26) ]
+	httpd.requests, httpd.failures, httpd.failing = [], {}, set()
+	thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+	thread.start()
+	yield httpd
+	httpd.shutdown()
+	httpd.server_close()
+
+def getURL(httpd):
+	return 'http://127.0.0.1:%d/sparql' % httpd.server_address[1]
+
+def runItemsQuery(httpd, **options):
+	rows = runPagedQuery(selectClause='?item1 ?alias', itemPattern='?item1 wdt:P31 wd:Q12140 .', rowPatterns='?item1 skos:altLabel ?alias .', itemVariable='item1', endpoint=getURL(httpd), **options)
+	return [ (row['item1']['value'].split('/')[-1], row['alias']['value']) for row in rows ]
+
+def test_runPagedQuery(endpoint):
+	rows = runItemsQuery(endpoint, pageSize=10, workers=2)
+
+	assert rows == [ (item,item+alias) for item in endpoint.items for alias in ['a','b'] ]
+	assert sorted(set(endpoint.requests))[:3] == [0,10,20]
+
+def test_runPagedQueryExactPages(endpoint):
+	# A full last page is followed by an empty one
+	endpoint.items = endpoint.items[:20]
+	rows = runItemsQuery(endpoint, pageSize=10, workers=1)
+
+	assert len(rows) == 40
+	assert endpoint.requests == [0,10,20]
+
+def test_runPagedQueryRetries(endpoint, capsys):
+	endpoint.failures = { 10:2 }
+	rows = runItemsQuery(endpoint, pageSize=10, workers=2, retries=2)
+
+	assert len(rows) == 50
+	assert endpoint.requests.count(10) == 3
+	assert capsys.readouterr().out.count("Retrying query after error") == 2
+
+def test_runPagedQueryGivesUp(endpoint):
+	endpoint.failing = set([10])
+	with pytest.raises(Exception):
+		runItemsQuery(endpoint, pageSize=10, workers=2, retries=1)
+
+def test_runPagedQueryIgnoresPagesAfterLast(endpoint):
+	# The first page is the last one so the page requested alongside it does not matter, even if it fails
+	endpoint.items = endpoint.items[:5]
+	endpoint.failing = set([10])
+	rows = runItemsQuery(endpoint, pageSize=10, workers=2, retries=1)
+
+	assert len(rows) == 10
+
+def test_runQueryCache(endpoint, tmp_path):
+	cacheDir = str(tmp_path / 'cache')
+	query = wikidata.makePagedQuery('?item1 ?alias', '?item1 wdt:P31 wd:Q12140 .', '', '?item1', 10, 0)
+
+	first = runQuery(query, endpoint=getURL(endpoint), cacheDir=cacheDir)
+	second = runQuery(query, endpoint=getURL(endpoint), cacheDir=cacheDir)
+
+	assert first == second
+	assert len(first) == 20
+	assert endpoint.requests == [0]
+
+def writeDump(filename, edges):
+	with open(filename,'w') as f:
+		f.write("[\n")
+		for child,parent,rank in edges:
+			claims = { 'P279':[ { 'mainsnak':{ 'datavalue':{ 'value':{ 'id':parent } } }, 'rank':rank } ] }
+			f.write(json.dumps({ 'id':child, 'claims':claims }) + ",\n")
+		f.write("]\n")
+
+def test_loadSubclassesFromDump(tmp_path, capsys):
+	dump = str(tmp_path / 'latest-all.json')
+	hierarchyFile = str(tmp_path / 'hierarchy.bin')
+	writeDump(dump, [ ('Q2','Q1','normal'), ('Q3','Q2','normal'), ('Q4','Q9','normal'), ('Q5','Q3','deprecated') ])
+
+	assert loadSubclasses('Q1', hierarchyFile=hierarchyFile, wikidataDump=dump) == set(['Q1','Q2','Q3'])
+	assert loadSubclasses('Q1', hierarchyFile=hierarchyFile, wikidataDump=dump) == set(['Q1','Q2','Q3'])
+	assert capsys.readouterr().out == "Building class hierarchy from dump...\nUsing existing class hierarchy...\n"
+
+def test_loadSubclassesRebuildsForOtherSource(tmp_path, capsys):
+	dump = str(tmp_path / 'latest-all.json')
+	otherDump = str(tmp_path / 'other-all.json')
+	hierarchyFile = str(tmp_path / 'hierarchy.bin')
+	writeDump(dump, [ ('Q2','Q1','normal'), ('Q4','Q9','normal') ])
+	writeDump(otherDump, [ ('Q2','Q1','normal'), ('Q3','Q1','normal') ])
+
+	loadSubclasses('Q1', hierarchyFile=hierarchyFile, wikidataDump=dump)
+	assert loadSubclasses('Q1', hierarchyFile=hierarchyFile, wikidataDump=otherDump) == set(['Q1','Q2','Q3'])
+	assert loadSubclasses('Q9', hierarchyFile=hierarchyFile, wikidataDump=otherDump) == set(['Q9'])
+
+	writeDump(otherDump, [ ('Q2','Q1','normal'), ('Q3','Q1','normal'), ('Q4','Q9','normal') ])
+	assert loadSubclasses('Q9', hierarchyFile=hierarchyFile, wikidataDump=otherDump) == set(['Q4','Q9'])
+	assert capsys.readouterr().out.count("Building class hierarchy from dump...") == 4
+
+def test_loadSubclassesTemporary(tmp_path, monkeypatch):
+	dump = str(tmp_path / 'latest-all.json')
+	writeDump(dump, [ ('Q2','Q1','normal') ])
+	tempDir = tmp_path / 'tmp'
+	tempDir.mkdir()
+	monkeypatch.setattr(tempfile, 'tempdir', str(tempDir))
+
+	assert loadSubclasses('Q1', wikidataDump=dump) == set(['Q1','Q2'])
+	assert os.listdir(str(tempDir)) == []
+
+def makeEntity(entityID, classes, label=None, aliases=()):
+	claims = { 'P31':[ { 'mainsnak':{ 'datavalue':{ 'value':{ 'id':c } } }, 'rank':rank } for c,rank in classes ] }
+	entity = { 'id':entityID, 'claims':claims }
+	if label:
+		entity['labels'] = { 'en':{ 'language':'en', 'value':label }, 'fr':{ 'language':'fr', 'value':label + ' (fr)' } }
+	entity['aliases'] = { 'en':[ { 'language':'en', 'value':a } for a in aliases ] }
+	return json.dumps(entity)
+
+def makeEntityDump():
+	lines = []
+	expected = []
+	for i in range(1,200):
+		entityID = 'Q%d' % (1000+i)
+		if i % 4 == 0:
+			lines.append(makeEntity(entityID, [('Q12140','normal')], 'drug %d' % i, ['alias %d' % i, 'other %d' % i]))
+			expected.append( (entityID, 'drug %d' % i, ['alias %d' % i, 'other %d' % i]) )
+		elif i % 4 == 1:
+			# A subclass of medication
+			lines.append(makeEntity(entityID, [('Q5','normal'),('Q777','normal')], 'subclass drug %d' % i))
+			expected.append( (entityID, 'subclass drug %d' % i, []) )
+		elif i % 4 == 2:
+			# Only a deprecated statement, no English label or another class
+			classes = [[('Q12140','deprecated')], [('Q12140','normal')], [('Q5','normal')]][i % 3]
+			lines.append(makeEntity(entityID, classes, None if i % 3 == 1 else 'not a drug %d' % i))
+		else:
+			lines.append(makeEntity(entityID, [('Q777','preferred'),('Q12140','normal')], 'preferred drug %d' % i))
+			expected.append( (entityID, 'preferred drug %d' % i, []) )
+	return "[\n" + "".join( line + ",\n" for line in lines ) + "]\n", expected
+
+@pytest.mark.parametrize('extension,opener', [('',open), ('.gz',gzip.open), ('.bz2',bz2.open)])
+def test_readDumpEntities(tmp_path, extension, opener):
+	data, expected = makeEntityDump()
+	dump = str(tmp_path / ('latest-all.json' + extension))
+	with opener(dump,'wb') as f:
+		f.write(data.encode('utf8'))
+
+	serial = list(readDumpEntities(dump, ['Q12140','Q777'], processes=1, chunkSize=16))
+	parallel = list(readDumpEntities(dump, ['Q12140','Q777'], processes=3, chunkSize=16))
+
+	assert serial == expected
+	assert parallel == serial
+
+def test_readDumpEntitiesManyClasses(tmp_path, monkeypatch):
+	# More classes than are checked as substrings, so the item IDs in each line are matched instead
+	monkeypatch.setattr(wikidata, 'MAX_SUBSTRING_CLASSES', 1)
+	data, expected = makeEntityDump()
+	dump = str(tmp_path / 'latest-all.json')
+	with open(dump,'w') as f:
+		f.write(data)
+
+	assert list(readDumpEntities(dump, ['Q12140','Q777'], chunkSize=16)) == expected
+
+def test_readDumpEntitiesTruncated(tmp_path, capsys):
+	data, expected = makeEntityDump()
+	# Cut off part way through the last drug
+	data = data[:data.rindex('preferred drug')]
+	dump = str(tmp_path / 'latest-all.json.gz')
+	with gzip.open(dump,'wb') as f:
+		f.write(data.encode('utf8'))
+
+	for processes in [1,2]:
+		assert list(readDumpEntities(dump, ['Q12140','Q777'], processes=processes, chunkSize=16)) == expected[:-1]
+		assert capsys.readouterr().out == "Skipped 1 lines of the dump that could not be parsed\n"
@@ -0,0 +1,74 @@
+import gzip
+import os
+import pytest
+from argparse import Namespace
+from collections import Counter
+from wordlists import saveSynonymIndex
+from wordlistMakeBetter import countKnowledgeBaseTerms, findRankedConflicts, getDecisionLines, resolveConflicts, ruleShortAllCaps, DEFAULT_TERMTYPES
+
+def writeFile(filename, lines):
+	with open(filename,'w') as f:
+		f.write("".join( line + "\n" for line in lines ))
+
+def test_countKnowledgeBaseTerms(tmp_path):
+	filename = str(tmp_path / 'kb.tsv.gz')
+	with gzip.open(filename,'wt') as f:
+		f.write("gene\tcancer\nALL\tall\nEGFR\tALL\nall\tbreast cancer\n")
+
+	capitalCounts = Counter()
+	counts = countKnowledgeBaseTerms([filename], set(['all','egfr']), chunkSize=7, capitalCounts=capitalCounts)
+
+	assert counts == Counter({ 'all':4, 'egfr':1 })
+	assert capitalCounts == Counter({ 'all':2, 'egfr':1 })
+	assert countKnowledgeBaseTerms([filename], set(['all','egfr']), chunkSize=7) == counts
+
+def test_ruleShortAllCaps():
+	postings = [('genes','HGNC:1'),('cancers','DOID:9952')]
+	assert ruleShortAllCaps('all', postings, {}, {}, set(['all'])) == ('stopword',)
+	assert ruleShortAllCaps('all', postings, {}, {}, set()) is None
+	assert ruleShortAllCaps('leukemia', postings, {}, {}, set(['leukemia'])) is None
+
+def test_getDecisionLinesSkipsUncuratedTypes():
+	names = { ('genes','HGNC:1'):'SYM1', ('variants','fusion'):'fusion' }
+	postings = sorted(names.keys())
+
+	assert getDecisionLines('fus', postings, ('keep',('genes','HGNC:1')), names) == {}
+	assert getDecisionLines('fus', postings, ('keep',('variants','fusion')), names) == { 'deletions_genes.tsv':["HGNC:1\tSYM1\tfus"] }
+	assert getDecisionLines('fus', postings, ('stopword',), names) == { 'stopwords_genes.txt':['fus'] }
+
+def test_resolveConflictsGeneCancerAcronym(tmp_path, monkeypatch):
+	# The wordlists are lowercased so the capitals only come from the knowledge base
+	monkeypatch.chdir(tmp_path)
+	writeFile('terms_genes.tsv', ["HGNC:1\tSYM1\tall|sym1", "HGNC:2\tSYM2\tsym2"])
+	writeFile('terms_cancers.tsv', ["DOID:9952\tacute lymphoblastic leukemia\tacute lymphoblastic leukemia|all"])
+	writeFile('kb.tsv', ["gene\tcancer", "SYM1\tALL", "SYM2\tALL", "sym2\tall"])
+
+	args = Namespace(knowledgebase=['kb.tsv'], rules=None, noReview=True, synonymIndex=None, termtypes='genes,cancers')
+	resolveConflicts(args)
+
+	with open('stopwords_genes.txt') as f:
+		assert f.read() == "all\n"
+	with open('stopwords_cancers.txt') as f:
+		assert f.read() == "all\n"
+
+def test_defaultTermtypes():
+	assert not 'conflicting' in DEFAULT_TERMTYPES
+
+def test_findRankedConflictsChecksIndex(tmp_path, monkeypatch, capsys):
+	monkeypatch.chdir(tmp_path)
+	writeFile('terms_genes.tsv', ["HGNC:1\tSYM1\tall|sym1", "HGNC:2\tSYM2\tsym2"])
+	writeFile('terms_cancers.tsv', ["DOID:9952\tacute lymphoblastic leukemia\tacute lymphoblastic leukemia|all"])
+	writeFile('terms_drugs.tsv', ["Q1\terlotinib\terlotinib"])
+	writeFile('kb.tsv', ["gene\tcancer", "SYM1\tALL"])
+	# Built for all the wordlists like the pipeline's index
+	saveSynonymIndex([ (termtype,'terms_%s.tsv' % termtype) for termtype in ['genes','cancers','drugs'] ], 'synonyms.index')
+	args = Namespace(knowledgebase=['kb.tsv'], synonymIndex='synonyms.index')
+
+	assert findRankedConflicts(args, ['genes','cancers']) == [ (1,'all',[('cancers','DOID:9952'),('genes','HGNC:1')]) ]
+	assert "Using existing synonym index..." in capsys.readouterr().out
+
+	# The index no longer matches the wordlists so it is not used (or replaced)
+	writeFile('terms_genes.tsv', ["HGNC:1\tSYM1\tall|sym1", "HGNC:2\tSYM2\tsym2|erlotinib"])
+	with pytest.raises(AssertionError):
+		findRankedConflicts(args, ['genes','cancers'])
+	assert findRankedConflicts(Namespace(knowledgebase=['kb.tsv'], synonymIndex=None), ['genes','drugs']) == [ (0,'erlotinib',[('drugs','Q1'),('genes','HGNC:2')]) ]
@@ -0,0 +1,61 @@
+from wordlists import readWordlist, saveBinaryWordlist, isBinaryWordlist, BinaryWordlist, saveSynonymIndex, SynonymIndex, calculateAmbiguityStats
+
+GENES = [
+	"HGNC:1\tEGFR\tegfr|HER1|ERBB\t1956",
+	"HGNC:2\tERBB2\therb2|ERBB2|HER-2|erbb\t2064",
+	"HGNC:3\tCDKN2A\tp16ᴵᴺᴷ⁴ᵃ|cdkn2a\t1029",
+	"HGNC:4\tNOEXTRA\tnoextra",
+]
+
+def test_binaryWordlistRoundTrip(tmp_path):
+	tsvFilename = str(tmp_path / 'terms_genes.tsv')
+	with open(tsvFilename,'w',encoding='utf8') as f:
+		f.write("\n".join(GENES) + "\n")
+	filename = str(tmp_path / 'terms_genes.bin')
+
+	saveBinaryWordlist(tsvFilename, filename)
+	wordlist = BinaryWordlist(filename)
+
+	assert isBinaryWordlist(filename) and not isBinaryWordlist(tsvFilename)
+	assert list(readWordlist(filename)) == list(readWordlist(tsvFilename))
+
+	# The TSV can be recreated with its extra columns
+	lines = [ "\t".join([termid, singleterm, "|".join(synonyms)] + wordlist.getExtra(i)) for i,(termid,singleterm,synonyms) in enumerate(wordlist) ]
+	assert lines == GENES
+
+	assert sorted(wordlist.lookup('ERBB')) == ['HGNC:1','HGNC:2']
+	assert wordlist.lookup('her-2') == ['HGNC:2']
+	assert wordlist.lookup('P16ᴵᴺᴷ⁴ᵃ') == ['HGNC:3']
+	assert wordlist.lookup('missing') == []
+
+def test_synonymIndexRoundTrip(tmp_path):
+	genes = str(tmp_path / 'terms_genes.tsv')
+	with open(genes,'w',encoding='utf8') as f:
+		f.write("\n".join(GENES) + "\n")
+	drugs = str(tmp_path / 'terms_drugs.tsv')
+	with open(drugs,'w',encoding='utf8') as f:
+		f.write("Q1\terlotinib\terlotinib| Tarceva \nQ2\therceptin\therceptin|HER-2\n")
+	binaryDrugs = str(tmp_path / 'terms_drugs.bin')
+	saveBinaryWordlist(drugs, binaryDrugs)
+	filename = str(tmp_path / 'synonyms.index')
+
+	# The index is the same whether the wordlists are TSV or binary
+	saveSynonymIndex([('genes',genes),('drugs',binaryDrugs)], filename)
+	index = SynonymIndex(filename)
+
+	expected = {}
+	for listType,wordlist in [('genes',genes),('drugs',drugs)]:
+		for termid,_,synonyms in readWordlist(wordlist):
+			for synonym in synonyms:
+				expected.setdefault(synonym.strip().lower(),set()).add( (listType,termid) )
+	assert [ (synonym,set(postings)) for synonym,postings in index ] == sorted(expected.items())
+
+	assert sorted(index.lookupWithNames(' Her-2')) == [ ('drugs','Q2','herceptin'), ('genes','HGNC:2','ERBB2') ]
+	assert 'tarceva' in index and not 'missing' in index
+	assert sorted( synonym for synonym,_ in index.iterAmbiguous() ) == ['erbb','her-2']
+	assert [ listType for listType,_,_,_ in index.sources ] == ['drugs','genes']
+
+	stats = calculateAmbiguityStats(index)
+	assert (stats['synonyms'], stats['ambiguous'], stats['crossListAmbiguous']) == (len(expected), 2, 1)
+	assert stats['types']['genes'] == { 'synonyms':9, 'ambiguous':1, 'crossListAmbiguous':1 }
+	assert stats['crossList'] == { 'drugs|genes':1 }
@@ -0,0 +1,296 @@
+"""
+Shared helpers for the UMLS Metathesaurus. The MRCONSO.RRF file can be converted once into a compact on-disk index (see buildUMLSIndex.py) which the generator scripts then open instead of re-parsing the full RRF file.
+
+Each index table is a tab-delimited file sorted by key with a matching table of line offsets. Tables are memory-mapped and only the requested keys are decoded.
+
+RRF files can also be read directly with readRRF (or readMRCONSO) which splits the file into chunks that can be parsed by a pool of processes and only decodes the columns that are needed.
+"""
+import os
+import mmap
+import multiprocessing
+from array import array
+from collections import defaultdict
+
+# Tables stored in a Metathesaurus index directory
+INDEX_TABLES = ['cui','code','name']
+
+# Column indices in MRCONSO.RRF
+MRCONSO_CUI = 0
+MRCONSO_LAT = 1
+MRCONSO_SAB = 11
+MRCONSO_CODE = 13
+MRCONSO_STR = 14
+
+# Target size of each chunk of MRCONSO.RRF that is parsed at once
+CHUNK_SIZE = 64*1024*1024
+
+def getCodeKey(sab, code):
+	"""
+	Gets the key of a source code in the code table of a Metathesaurus index. Codes are only unique within a source (e.g. D009369 is in MSH and MSHFRE) so the key includes the source. The separator cannot appear in MRCONSO.RRF fields
+
+	Args:
+		sab (str): Source abbreviation (e.g. HGNC)
+		code (str): Code in the source (e.g. HGNC:1097)
+
+	Returns:
+		str of the key
+	"""
+	return "%s|%s" % (sab, code)
+
+def findChunkBoundaries(filename, chunkCount):
+	"""
+	Splits a file into byte ranges of roughly equal size where each range starts at the beginning of a line
+
+	Args:
+		filename (str): File to split
+		chunkCount (int): Number of chunks to aim for
+
+	Returns:
+		list of (start,end) byte offsets
+	"""
+	size = os.path.getsize(filename)
+	boundaries = [0]
+	with open(filename,'rb') as f:
+		for i in range(1,chunkCount):
+			f.seek(size*i // chunkCount)
+			f.readline()
+			position = f.tell()
+			if position > boundaries[-1] and position < size:
+				boundaries.append(position)
+	boundaries.append(size)
+
+	return [ (start,end) for start,end in zip(boundaries[:-1],boundaries[1:]) if end > start ]
+
+def parseRRFChunk(task):
+	"""
+	Parses one chunk of an RRF file and extracts the requested columns from the rows that pass the filters. Rows are handled as bytes and only the requested columns are decoded. Used by readRRF (and run in worker processes).
+
+	Args:
+		task (tuple): Filename, start offset, end offset, columns, language, source vocabulary and code prefix
+
+	Returns:
+		list of tuples with the requested columns
+	"""
+	filename,start,end,columns,lat,sab,codePrefix = task
+	with open(filename,'rb') as f:
+		f.seek(start)
+		data = f.read(end-start)
+
+	# Only split as far as the last column that is needed
+	maxSplit = max(columns + [ c for c,value in [(MRCONSO_SAB,sab),(MRCONSO_CODE,codePrefix)] if value ]) + 1
+
+	latField = lat.encode('utf8') + b'|' if lat else None
+	sab = sab.encode('utf8') if sab else None
+	codePrefix = codePrefix.encode('utf8') if codePrefix else None
+
+	rows = []
+	for line in data.split(b'\n'):
+		if not line:
+			continue
+
+		# Check the language (the second column) before splitting the row
+		if latField and not line.startswith(latField, line.find(b'|')+1):
+			continue
+
+		split = line.split(b'|', maxSplit)
+		if sab and split[MRCONSO_SAB] != sab:
+			continue
+		if codePrefix and not split[MRCONSO_CODE].startswith(codePrefix):
+			continue
+		rows.append(tuple( split[c].decode('utf8') for c in columns ))
+	return rows
+
+def readRRF(filename, columns, lat=None, sab=None, codePrefix=None, processes=1):
+	"""
+	Reads a UMLS RRF file in chunks (in parallel if requested) and yields the requested columns of each row that passes the filters. Rows are always yielded in file order. The filters use the MRCONSO.RRF column layout.
+
+	Args:
+		filename (str): Filename of the RRF file (e.g. MRCONSO.RRF)
+		columns (list of int): Column indices to extract (e.g. MRCONSO_CUI)
+		lat (str): Only include rows in this language (or all languages if None)
+		sab (str): Only include rows from this source vocabulary (or all if None)
+		codePrefix (str): Only include rows where the code starts with this (or all if None)
+		processes (int): Number of processes to parse with
+
+	Returns:
+		generator of tuples with the requested columns
+	"""
+	columns = list(columns)
+	chunkCount = max(processes, (os.path.getsize(filename) // CHUNK_SIZE) + 1)
+	tasks = [ (filename,start,end,columns,lat,sab,codePrefix) for start,end in findChunkBoundaries(filename, chunkCount) ]
+
+	if processes > 1:
+		with multiprocessing.Pool(processes) as pool:
+			for rows in pool.imap(parseRRFChunk, tasks):
+				for row in rows:
+					yield row
+	else:
+		for task in tasks:
+			for row in parseRRFChunk(task):
+				yield row
+
+def readMRCONSO(filename, columns, lang='ENG', sab=None, codePrefix=None, processes=1):
+	"""
+	Reads the UMLS metathesaurus with readRRF, by default only keeping English rows
+
+	Args:
+		filename (str): Filename of UMLS Concept file (MRCONSO.RRF)
+		columns (list of int): Column indices to extract (e.g. MRCONSO_CUI)
+		lang (str): Only include rows in this language (or all languages if None)
+		sab (str): Only include rows from this source vocabulary (or all if None)
+		codePrefix (str): Only include rows where the code starts with this (or all if None)
+		processes (int): Number of processes to parse with
+
+	Returns:
+		generator of tuples with the requested columns
+	"""
+	return readRRF(filename, columns, lat=lang, sab=sab, codePrefix=codePrefix, processes=processes)
+
+def buildMetathesaurusIndex(filename, indexDir, processes=1):
+	"""
+	Scans the UMLS metathesaurus once and writes an index with three tables. Only English terms are included.
+	  cui: CUID to the list of terms (in file order)
+	  code: source and code (e.g. HGNC|HGNC:1097, see getCodeKey) to the list of terms (in file order)
+	  name: lowercased first term of a CUID to the CUID
+
+	Args:
+		filename (str): Filename of UMLS Concept file (MRCONSO.RRF)
+		indexDir (str): Directory to write the index tables to
+		processes (int): Number of processes to parse MRCONSO.RRF with
+
+	Returns:
+		Nothing
+	"""
+	cuiTerms = defaultdict(list)
+	codeTerms = defaultdict(list)
+	mainTerms = {}
+	for cuid,sab,externalID,term in readMRCONSO(filename, [MRCONSO_CUI,MRCONSO_SAB,MRCONSO_CODE,MRCONSO_STR], processes=processes):
+		# Later CUIDs with the same first term win, matching a dictionary built over the CUIDs in file order
+		if not cuid in cuiTerms:
+			mainTerms[term.lower()] = cuid
+
+		cuiTerms[cuid].append(term)
+		codeTerms[getCodeKey(sab,externalID)].append(term)
+
+	if not os.path.isdir(indexDir):
+		os.makedirs(indexDir)
+
+	writeIndexTable(os.path.join(indexDir,'cui.tsv'), { k:"|".join(v) for k,v in cuiTerms.items() })
+	writeIndexTable(os.path.join(indexDir,'code.tsv'), { k:"|".join(v) for k,v in codeTerms.items() })
+	writeIndexTable(os.path.join(indexDir,'name.tsv'), mainTerms)
+
+def writeIndexTable(filename, table):
+	"""
+	Writes a table of the index as tab-delimited key/value lines sorted by key, along with a file of the offset of each line (as native unsigned 64-bit integers)
+
+	Args:
+		filename (str): File to write to (offsets are written to the same name with .offsets appended)
+		table (dict): Mapping from key (str) to value (str)
+
+	Returns:
+		Nothing
+	"""
+	offsets = array('Q')
+	position = 0
+	with open(filename,'wb') as outF:
+		for key in sorted(table.keys()):
+			line = (u"%s\t%s\n" % (key,table[key])).encode('utf8')
+			offsets.append(position)
+			outF.write(line)
+			position += len(line)
+
+	with open(filename + '.offsets','wb') as outF:
+		offsets.tofile(outF)
+
+class IndexTable:
+	"""
+	Read-only lookup into one table of a Metathesaurus index created by buildMetathesaurusIndex. The table is memory-mapped and located with a binary search over the offset table so only the requested entries are decoded.
+
+	Lookups of missing keys in the cui and code tables return an empty list (as a defaultdict of lists would) while the name table raises a KeyError.
+	"""
+	def __init__(self, indexDir, tableName):
+		assert tableName in INDEX_TABLES, "Unknown index table: %s" % tableName
+		self.tableName = tableName
+
+		filename = os.path.join(indexDir,'%s.tsv' % tableName)
+		self.data = mapFile(filename)
+
+		if os.path.isfile(filename + '.offsets'):
+			offsetData = mapFile(filename + '.offsets')
+			self.offsets = memoryview(offsetData).cast('Q') if len(offsetData) > 0 else array('Q')
+		else:
+			self.offsets = findLineOffsets(self.data)
+
+		# Indexes from before the code keys included the source would silently find nothing
+		if tableName == 'code' and len(self.offsets) > 0:
+			firstKey = self.data[:self.data.find(b'\t')]
+			assert b'|' in firstKey, "The code table in %s has no sources in its keys. Rebuild the index with buildUMLSIndex.py" % indexDir
+
+	def __len__(self):
+		return len(self.offsets)
+
+	def _findValue(self, key):
+		keyBytes = key.encode('utf8')
+		lo, hi = 0, len(self.offsets)
+		while lo < hi:
+			mid = (lo+hi) // 2
+			start = self.offsets[mid]
+			tab = self.data.find(b'\t', start)
+			candidate = self.data[start:tab]
+			if candidate < keyBytes:
+				lo = mid + 1
+			elif candidate > keyBytes:
+				hi = mid
+			else:
+				end = self.data.find(b'\n', tab)
+				return self.data[tab+1:end].decode('utf8')
+		return None
+
+	def __contains__(self, key):
+		return self._findValue(key) is not None
+
+	def __getitem__(self, key):
+		value = self._findValue(key)
+		if self.tableName == 'name':
+			if value is None:
+				raise KeyError(key)
+			return value
+		return [] if value is None else value.split('|')
+
+	def get(self, key, default=None):
+		return self[key] if key in self else default
+
+def mapFile(filename):
+	"""
+	Memory-maps a file read-only (empty files cannot be mapped so an empty bytes object is returned instead)
+
+	Args:
+		filename (str): File to map
+
+	Returns:
+		mmap object (or bytes for an empty file)
+	"""
+	if os.path.getsize(filename) == 0:
+		return b''
+	with open(filename,'rb') as f:
+		return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def findLineOffsets(data):
+	"""
+	Finds the start offsets of all lines in a block of data (used for index tables without a .offsets file)
+
+	Args:
+		data (bytes or mmap): Data to scan
+
+	Returns:
+		array of offsets
+	"""
+	offsets = array('Q')
+	position = 0
+	while position < len(data):
+		offsets.append(position)
+		end = data.find(b'\n', position)
+		if end == -1:
+			break
+		position = end + 1
+	return offsets
@@ -0,0 +1,664 @@
+"""
+This module is used to get data from Wikidata, either live or from a dump. Large SPARQL queries are paged (with LIMIT/OFFSET over an ordered subquery) so that each request stays well within the endpoint's timeout, pages are fetched concurrently with retries and the raw JSON responses are cached on disk for the day, so reruns do not download everything again.
+
+Any endpoint that speaks the SPARQL protocol can be used, including a local HTTP server for testing. Alternatively, entities can be read offline from a Wikidata JSON dump (gzip or bz2 compressed), which is parsed in chunks by a pool of processes so the output does not depend on the state of the endpoint.
+
+Subclass hierarchies (P279) are saved as a compact graph (see saveClassHierarchy) that is memory-mapped by ClassHierarchy. It holds the child to parents and parent to children adjacency as sorted arrays of numeric item IDs, so the transitive subclasses of a class are found locally without a query per class.
+"""
+import bisect
+import bz2
+import concurrent.futures
+import datetime
+import gzip
+import hashlib
+import http.client
+import itertools
+import json
+import multiprocessing
+import os
+import re
+import struct
+import tempfile
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from array import array
+from collections import deque
+from wordlists import writeSections, SectionReader
+
+WIKIDATA_ENDPOINT = 'https://query.wikidata.org/sparql'
+
+# Number of lines of a dump (one entity per line) that are parsed at once
+DUMP_CHUNK_SIZE = 1000
+
+# Lines of a dump are only checked for classes by substring below this number of classes (and with a regular expression above it)
+MAX_SUBSTRING_CLASSES = 16
+ITEM_ID_PATTERN = re.compile(rb'"id": ?"(Q[0-9]+)"')
+
+# Number of classes given in a VALUES clause of a single query
+CLASS_BATCH_SIZE = 200
+
+# Header of a class hierarchy: magic, then the number of children, parents and edges and the size of the description of its source
+CLASS_HIERARCHY_MAGIC = b'WDCLASS2'
+CLASS_HIERARCHY_HEADER = struct.Struct('=8s4Q')
+
+def getCacheFilename(cacheDir, endpoint, query, date=None):
+	"""
+	Gets the cache file for the response to a query. The file is keyed by the date and a hash of the endpoint and query, so the cache expires daily
+
+	Args:
+		cacheDir (str): Directory of cached responses
+		endpoint (str): URL of the SPARQL endpoint
+		query (str): SPARQL query
+		date (datetime.date): Date of the response (today if None)
+
+	Returns:
+		Filename of the cached response
+	"""
+	if date is None:
+		date = datetime.date.today()
+	queryHash = hashlib.sha256(("%s\n%s" % (endpoint,query)).encode('utf8')).hexdigest()
+	return os.path.join(cacheDir, "%s_%s.json" % (date.isoformat(), queryHash))
+
+def fetchQuery(query, endpoint, timeout):
+	"""
+	Makes a single request for a query to a SPARQL endpoint
+
+	Args:
+		query (str): SPARQL query
+		endpoint (str): URL of the SPARQL endpoint
+		timeout (int): Timeout in seconds for the request
+
+	Returns:
+		Raw JSON response (as bytes)
+	"""
+	data = urllib.parse.urlencode({ 'query':query, 'format':'json' }).encode('utf8')
+	headers = { 'User-Agent':'biowordlists', 'Accept':'application/sparql-results+json', 'Content-Type':'application/x-www-form-urlencoded' }
+	request = urllib.request.Request(endpoint, data=data, headers=headers)
+	with urllib.request.urlopen(request, timeout=timeout) as response:
+		return response.read()
+
+def runQuery(query, endpoint=WIKIDATA_ENDPOINT, cacheDir=None, retries=5, timeout=90):
+	"""
+	Runs a SPARQL query with retries (backing off exponentially or as long as the endpoint asks) and returns the result rows. The raw response is cached if a cache directory is given
+
+	Args:
+		query (str): SPARQL query
+		endpoint (str): URL of the SPARQL endpoint
+		cacheDir (str): Directory to cache responses in (or None to not cache)
+		retries (int): Number of times to retry after a failure
+		timeout (int): Timeout in seconds for each request
+
+	Returns:
+		list of bindings (one dictionary per row)
+	"""
+	cacheFilename = getCacheFilename(cacheDir, endpoint, query) if cacheDir else None
+	if cacheFilename and os.path.isfile(cacheFilename):
+		with open(cacheFilename,'rb') as f:
+			return json.loads(f.read().decode('utf8'))['results']['bindings']
+
+	for attempt in range(retries+1):
+		try:
+			raw = fetchQuery(query, endpoint, timeout)
+			results = json.loads(raw.decode('utf8'))
+			break
+		except (OSError, http.client.HTTPException, ValueError) as e:
+			# Errors in the query itself will not go away so only server errors, rate limits and timeouts are retried
+			if isinstance(e, urllib.error.HTTPError) and e.code < 500 and e.code != 429:
+				raise
+			if attempt == retries:
+				raise
+			delay = 2 ** attempt
+			if isinstance(e, urllib.error.HTTPError) and (e.headers.get('Retry-After') or '').isdigit():
+				delay = max(delay, int(e.headers['Retry-After']))
+			print("Retrying query after error: %s" % str(e))
+			sys.stdout.flush()
+			time.sleep(delay)
+
+	if cacheFilename:
+		if not os.path.isdir(cacheDir):
+			os.makedirs(cacheDir, exist_ok=True)
+		with open(cacheFilename + '.tmp','wb') as outF:
+			outF.write(raw)
+		os.replace(cacheFilename + '.tmp', cacheFilename)
+
+	return results['results']['bindings']
+
+def makePagedQuery(selectClause, itemPattern, rowPatterns, itemVariable, pageSize, page):
+	"""
+	Makes the query for one page of items. The items are selected (in a stable order) by a subquery so that all the rows for an item are in the same page
+
+	Args:
+		selectClause (str): Variables to select in the outer query (e.g. "?item1 ?item1Label ?alias")
+		itemPattern (str): Graph pattern that selects the items (e.g. "?item1 wdt:P31 wd:Q12140 .")
+		rowPatterns (str): Graph patterns that add the data for each item (e.g. the label service and aliases)
+		itemVariable (str): Variable of the items (e.g. "?item1")
+		pageSize (int): Number of items in each page
+		page (int): Index of the page
+
+	Returns:
+		SPARQL query
+	"""
+	return """
+	SELECT %s WHERE {
+		{ SELECT DISTINCT %s WHERE { %s } ORDER BY %s LIMIT %d OFFSET %d }
+		%s
+	}
+	""" % (selectClause, itemVariable, itemPattern, itemVariable, pageSize, page*pageSize, rowPatterns)
+
+def runPagedQuery(selectClause, itemPattern, rowPatterns, itemVariable, pageSize=10000, workers=4, endpoint=WIKIDATA_ENDPOINT, cacheDir=None, retries=5, timeout=90):
+	"""
+	Runs a query page by page until a page has fewer items than the page size. Up to a fixed number of pages are requested at once and the rows are returned in page order. Pages after the last one are cancelled rather than waited for
+
+	Args:
+		selectClause (str): Variables to select in the outer query
+		itemPattern (str): Graph pattern that selects the items
+		rowPatterns (str): Graph patterns that add the data for each item
+		itemVariable (str): Variable of the items (without the ?, the bindings are keyed by it)
+		pageSize (int): Number of items in each page
+		workers (int): Maximum number of pages requested at once
+		endpoint (str): URL of the SPARQL endpoint
+		cacheDir (str): Directory to cache responses in (or None to not cache)
+		retries (int): Number of times to retry each page after a failure
+		timeout (int): Timeout in seconds for each request
+
+	Returns:
+		list of bindings (one dictionary per row)
+	"""
+	rows = []
+	executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+	try:
+		def submit(page):
+			query = makePagedQuery(selectClause, itemPattern, rowPatterns, '?'+itemVariable, pageSize, page)
+			return executor.submit(runQuery, query, endpoint, cacheDir, retries, timeout)
+
+		inFlight = deque( submit(page) for page in range(workers) )
+		nextPage = workers
+		while inFlight:
+			pageRows = inFlight.popleft().result()
+			rows += pageRows
+
+			itemCount = len(set( row[itemVariable]['value'] for row in pageRows ))
+			if itemCount < pageSize:
+				# This is the last page so the later pages (already requested) are empty and are not waited for
+				break
+			inFlight.append(submit(nextPage))
+			nextPage += 1
+	finally:
+		# Pages that have not started are cancelled and the results (or errors) of any that are still running are ignored
+		executor.shutdown(wait=False, cancel_futures=True)
+
+	return rows
+
+def openDump(filename):
+	"""
+	Opens a Wikidata JSON dump as bytes, decompressing it if the filename ends with .gz or .bz2
+
+	Args:
+		filename (str): Dump file
+
+	Returns:
+		Open file object
+	"""
+	if filename.endswith('.gz'):
+		return gzip.open(filename, 'rb')
+	elif filename.endswith('.bz2'):
+		return bz2.open(filename, 'rb')
+	return open(filename, 'rb')
+
+def getTruthyValues(entity, propertyID):
+	"""
+	Gets the item values of a property of an entity in the same way as the wdt: prefix in SPARQL, so deprecated statements are skipped and only the preferred statements are used if there are any
+
+	Args:
+		entity (dict): Entity from a JSON dump
+		propertyID (str): Property (e.g. P31)
+
+	Returns:
+		list of item IDs
+	"""
+	statements = [ s for s in entity.get('claims',{}).get(propertyID,[]) if s.get('rank') != 'deprecated' ]
+	if any( s.get('rank') == 'preferred' for s in statements ):
+		statements = [ s for s in statements if s.get('rank') == 'preferred' ]
+
+	values = []
+	for s in statements:
+		datavalue = s.get('mainsnak',{}).get('datavalue')
+		if datavalue and isinstance(datavalue.get('value'),dict) and 'id' in datavalue['value']:
+			values.append(datavalue['value']['id'])
+	return values
+
+def parseEntitiesChunk(lines, propertyID, classIDs):
+	"""
+	Parses lines of a JSON dump and extracts the English label and aliases of the entities that are instances of the classes. Lines are only decoded when they mention one of the classes. Used by readDumpEntities (and run in worker processes).
+
+	Args:
+		lines (list of bytes): Lines of the dump
+		propertyID (str): Property that links the entities to the classes
+		classIDs (list of str): Classes that the entities must be instances of
+
+	Returns:
+		tuple of list of (entity ID, label, list of aliases) and number of lines that could not be parsed
+	"""
+	classIDs = set(classIDs)
+	if len(classIDs) <= MAX_SUBSTRING_CLASSES:
+		quotedIDs = [ ('"%s"' % c).encode('utf8') for c in classIDs ]
+		mentionsClass = lambda line : any( q in line for q in quotedIDs )
+	else:
+		encodedIDs = set( c.encode('utf8') for c in classIDs )
+		mentionsClass = lambda line : not encodedIDs.isdisjoint(ITEM_ID_PATTERN.findall(line))
+
+	entities = []
+	errorCount = 0
+	for line in lines:
+		# The full dump is one JSON array with an entity on each line
+		line = line.strip().rstrip(b',')
+		if line in (b'', b'[', b']'):
+			continue
+		if not mentionsClass(line):
+			continue
+
+		try:
+			entity = json.loads(line.decode('utf8'))
+		except ValueError:
+			# e.g. the last line of a truncated dump
+			errorCount += 1
+			continue
+
+		if classIDs.isdisjoint(getTruthyValues(entity, propertyID)):
+			continue
+
+		label = entity.get('labels',{}).get('en',{}).get('value')
+		if label is None:
+			continue
+		aliases = [ a['value'] for a in entity.get('aliases',{}).get('en',[]) ]
+		entities.append( (entity['id'], label, aliases) )
+
+	return entities, errorCount
+
+def parseEdgesChunk(lines, propertyID):
+	"""
+	Parses lines of a JSON dump and extracts the edges of a property between items (e.g. subclass of). Used by readDumpEdges (and run in worker processes).
+
+	Args:
+		lines (list of bytes): Lines of the dump
+		propertyID (str): Property of the edges (e.g. P279)
+
+	Returns:
+		tuple of list of (item ID, value item ID) and number of lines that could not be parsed
+	"""
+	quotedProperty = ('"%s"' % propertyID).encode('utf8')
+
+	edges = []
+	errorCount = 0
+	for line in lines:
+		line = line.strip().rstrip(b',')
+		if line in (b'', b'[', b']') or not quotedProperty in line:
+			continue
+
+		try:
+			entity = json.loads(line.decode('utf8'))
+		except ValueError:
+			errorCount += 1
+			continue
+
+		edges += [ (entity['id'],value) for value in getTruthyValues(entity, propertyID) ]
+
+	return edges, errorCount
+
+def parseDumpChunk(task):
+	"""
+	Runs a chunk parser on its lines. Used by mapDumpChunks (and run in worker processes).
+
+	Args:
+		task (tuple): Parser function, list of lines and the other arguments for the parser
+
+	Returns:
+		Result of the parser
+	"""
+	parser,lines,arguments = task
+	return parser(lines, *arguments)
+
+def mapDumpChunks(filename, parser, arguments, processes=1, chunkSize=DUMP_CHUNK_SIZE):
+	"""
+	Streams a Wikidata JSON dump and parses it in chunks of lines, by a pool of processes with only a couple of chunks per process in flight. The results are yielded in dump order
+
+	Args:
+		filename (str): Dump file (optionally gzip or bz2 compressed)
+		parser (function): Chunk parser that takes the lines and the arguments and returns a list of results and the number of lines that could not be parsed
+		arguments (tuple): Other arguments for the parser
+		processes (int): Number of processes to parse with
+		chunkSize (int): Number of lines parsed at once
+
+	Returns:
+		generator of results
+	"""
+	errorCount = 0
+	with openDump(filename) as f:
+		def iterTasks():
+			while True:
+				lines = list(itertools.islice(f, chunkSize))
+				if not lines:
+					break
+				yield (parser, lines, arguments)
+
+		if processes > 1:
+			with multiprocessing.Pool(processes) as pool:
+				inFlight = deque()
+				for task in iterTasks():
+					inFlight.append(pool.apply_async(parseDumpChunk, (task,)))
+					while len(inFlight) >= 2*processes or (inFlight and inFlight[0].ready()):
+						results,errors = inFlight.popleft().get()
+						errorCount += errors
+						yield from results
+				while inFlight:
+					results,errors = inFlight.popleft().get()
+					errorCount += errors
+					yield from results
+		else:
+			for task in iterTasks():
+				results,errors = parseDumpChunk(task)
+				errorCount += errors
+				yield from results
+
+	if errorCount > 0:
+		print("Skipped %d lines of the dump that could not be parsed" % errorCount)
+
+def readDumpEntities(filename, classIDs, propertyID='P31', processes=1, chunkSize=DUMP_CHUNK_SIZE):
+	"""
+	Streams a Wikidata JSON dump and yields the English label and aliases of each entity that is an instance of any of the classes (with a label in English), in dump order
+
+	Args:
+		filename (str): Dump file (optionally gzip or bz2 compressed)
+		classIDs (list of str): Classes that the entities must be instances of (e.g. Q12140)
+		propertyID (str): Property that links the entities to the classes
+		processes (int): Number of processes to parse with
+		chunkSize (int): Number of lines parsed at once
+
+	Returns:
+		generator of (entity ID, label, list of aliases) tuples
+	"""
+	return mapDumpChunks(filename, parseEntitiesChunk, (propertyID, sorted(classIDs)), processes=processes, chunkSize=chunkSize)
+
+def readDumpEdges(filename, propertyID='P279', processes=1, chunkSize=DUMP_CHUNK_SIZE):
+	"""
+	Streams a Wikidata JSON dump and yields the edges of a property between items (e.g. every subclass of edge), in dump order
+
+	Args:
+		filename (str): Dump file (optionally gzip or bz2 compressed)
+		propertyID (str): Property of the edges
+		processes (int): Number of processes to parse with
+		chunkSize (int): Number of lines parsed at once
+
+	Returns:
+		generator of (item ID, value item ID) tuples
+	"""
+	return mapDumpChunks(filename, parseEdgesChunk, (propertyID,), processes=processes, chunkSize=chunkSize)
+
+def iterBatches(items, batchSize):
+	"""
+	Groups items into lists of a fixed size (the last may be shorter)
+
+	Args:
+		items (iterable): Items to group
+		batchSize (int): Number of items in each batch
+
+	Returns:
+		generator of lists
+	"""
+	items = iter(items)
+	while True:
+		batch = list(itertools.islice(items, batchSize))
+		if not batch:
+			break
+		yield batch
+
+def queryInstances(classIDs, rowPatterns, propertyID='P31', batchSize=CLASS_BATCH_SIZE, **options):
+	"""
+	Queries the instances of any of the classes, giving batches of classes in a VALUES clause (so there is no query per class) and paging each batch. An item that is an instance of several of the classes can be in the rows of several batches
+
+	Args:
+		classIDs (list of str): Classes of the items (e.g. Q12140)
+		rowPatterns (str): Graph patterns that add the data for each item (as ?item1)
+		propertyID (str): Property that links the items to the classes
+		batchSize (int): Number of classes in each query
+		options: Other options for runPagedQuery (e.g. endpoint and cacheDir)
+
+	Returns:
+		list of bindings (one dictionary per row)
+	"""
+	rows = []
+	for batch in iterBatches(sorted(classIDs), batchSize):
+		values = " ".join( "wd:%s" % c for c in batch )
+		rows += runPagedQuery(selectClause='?item1 ?item1Label ?alias',
+			itemPattern='VALUES ?class { %s } ?item1 wdt:%s ?class .' % (values,propertyID),
+			rowPatterns=rowPatterns, itemVariable='item1', **options)
+	return rows
+
+def querySubclassEdges(rootID, propertyID='P279', batchSize=CLASS_BATCH_SIZE, **options):
+	"""
+	Queries the subclass edges below a class one level at a time, giving the classes found at each level in batches in a VALUES clause
+
+	Args:
+		rootID (str): Class at the top of the hierarchy (e.g. Q12140)
+		propertyID (str): Property of the edges
+		batchSize (int): Number of parent classes in each query
+		options: Other options for runPagedQuery (e.g. endpoint and cacheDir)
+
+	Returns:
+		list of (child ID, parent ID) tuples
+	"""
+	edges = []
+	seen = set([rootID])
+	frontier = [rootID]
+	while frontier:
+		nextFrontier = []
+		for batch in iterBatches(sorted(frontier), batchSize):
+			pattern = 'VALUES ?parent { %s } ?child wdt:%s ?parent .' % (" ".join( "wd:%s" % c for c in batch ), propertyID)
+			for row in runPagedQuery(selectClause='?child ?parent', itemPattern=pattern, rowPatterns=pattern, itemVariable='child', **options):
+				child,parent = row['child']['value'].split('/')[-1], row['parent']['value'].split('/')[-1]
+				edges.append( (child,parent) )
+				if not child in seen:
+					seen.add(child)
+					nextFrontier.append(child)
+		frontier = nextFrontier
+	return edges
+
+def buildAdjacency(pairs):
+	"""
+	Builds compressed sparse rows from pairs of numeric IDs
+
+	Args:
+		pairs (array of Q): Sorted unique pairs with the source ID in the high 32 bits and the target ID in the low 32 bits
+
+	Returns:
+		tuple of the sorted source IDs, the start of each source's targets (with the end as the last value) and the targets
+	"""
+	sources, starts, targets = array('I'), array('Q'), array('I')
+	for i,pair in enumerate(pairs):
+		source = pair >> 32
+		if len(sources) == 0 or sources[-1] != source:
+			sources.append(source)
+			starts.append(i)
+		targets.append(pair & 0xFFFFFFFF)
+	starts.append(len(pairs))
+	return sources, starts, targets
+
+def saveClassHierarchy(edges, filename, source=''):
+	"""
+	Saves subclass edges as a graph with the parents of each child and the children of each parent
+
+	Args:
+		edges (iterable of (str,str)): Child and parent item IDs (e.g. Q12140)
+		filename (str): File to write
+		source (str): Description of where the edges came from (see describeHierarchySource)
+
+	Returns:
+		Nothing
+	"""
+	upwards, downwards = set(), set()
+	for child,parent in edges:
+		if not (child.startswith('Q') and parent.startswith('Q')):
+			continue
+		child,parent = int(child[1:]), int(parent[1:])
+		upwards.add( (child << 32) | parent )
+		downwards.add( (parent << 32) | child )
+
+	children, parentStarts, parents = buildAdjacency(array('Q',sorted(upwards)))
+	del upwards
+	parentNodes, childStarts, childTargets = buildAdjacency(array('Q',sorted(downwards)))
+	del downwards
+
+	sourceData = source.encode('utf8')
+	header = CLASS_HIERARCHY_HEADER.pack(CLASS_HIERARCHY_MAGIC, len(children), len(parentNodes), len(parents), len(sourceData))
+	writeSections(filename, header, [children, parentStarts, parents, parentNodes, childStarts, childTargets, sourceData])
+
+class ClassHierarchy:
+	"""
+	Memory-mapped class hierarchy saved by saveClassHierarchy. The description of where its edges came from is in source
+	"""
+	def __init__(self, filename):
+		reader = SectionReader(filename, CLASS_HIERARCHY_HEADER, CLASS_HIERARCHY_MAGIC)
+		self.data = reader.data
+		_,childCount,parentCount,edgeCount,sourceLength = reader.header
+
+		self.children = reader.nextSection(childCount, 'I')
+		self.parentStarts = reader.nextSection(childCount+1, 'Q')
+		self.parents = reader.nextSection(edgeCount, 'I')
+		self.parentNodes = reader.nextSection(parentCount, 'I')
+		self.childStarts = reader.nextSection(parentCount+1, 'Q')
+		self.childTargets = reader.nextSection(edgeCount, 'I')
+		self.source = bytes(reader.nextSection(sourceLength)).decode('utf8')
+
+	def __len__(self):
+		return len(self.parents)
+
+	def findTargets(self, nodes, starts, targets, node):
+		"""
+		Gets the targets of a node from one direction of the graph
+
+		Args:
+			nodes (memoryview): Sorted numeric IDs of the nodes with targets
+			starts (memoryview): Start of each node's targets
+			targets (memoryview): Numeric IDs of the targets
+			node (int): Numeric ID of the node
+
+		Returns:
+			memoryview of numeric IDs
+		"""
+		i = bisect.bisect_left(nodes, node)
+		if i == len(nodes) or nodes[i] != node:
+			return targets[0:0]
+		return targets[starts[i]:starts[i+1]]
+
+	def getParents(self, classID):
+		"""
+		Gets the direct parents of a class
+
+		Args:
+			classID (str): Class (e.g. Q12140)
+
+		Returns:
+			list of class IDs
+		"""
+		return [ 'Q%d' % p for p in self.findTargets(self.children, self.parentStarts, self.parents, int(classID[1:])) ]
+
+	def getChildren(self, classID):
+		"""
+		Gets the direct children of a class
+
+		Args:
+			classID (str): Class (e.g. Q12140)
+
+		Returns:
+			list of class IDs
+		"""
+		return [ 'Q%d' % c for c in self.findTargets(self.parentNodes, self.childStarts, self.childTargets, int(classID[1:])) ]
+
+	def getDescendants(self, classID):
+		"""
+		Gets the transitive closure of the subclasses of a class (including the class itself) with a breadth-first search down the graph
+
+		Args:
+			classID (str): Class (e.g. Q12140)
+
+		Returns:
+			set of class IDs
+		"""
+		root = int(classID[1:])
+		seen = set([root])
+		frontier = [root]
+		while frontier:
+			nextFrontier = []
+			for node in frontier:
+				for child in self.findTargets(self.parentNodes, self.childStarts, self.childTargets, node):
+					if not child in seen:
+						seen.add(child)
+						nextFrontier.append(child)
+			frontier = nextFrontier
+		return set( 'Q%d' % node for node in seen )
+
+def describeHierarchySource(rootID, propertyID, wikidataDump=None, endpoint=WIKIDATA_ENDPOINT):
+	"""
+	Describes where the edges of a class hierarchy come from, so a saved hierarchy is only reused for the same class and property and the same dump (by its path, size and modification time) or, without a dump, the same endpoint on the same day
+
+	Args:
+		rootID (str): Class at the top of the hierarchy (e.g. Q12140)
+		propertyID (str): Property of the subclass edges
+		wikidataDump (str): Dump that the edges are read from (or None if they are queried)
+		endpoint (str): URL of the SPARQL endpoint that the edges are queried from
+
+	Returns:
+		str of the description
+	"""
+	if wikidataDump:
+		stat = os.stat(wikidataDump)
+		return "%s\t%s\tdump\t%s\t%d\t%d" % (rootID, propertyID, os.path.realpath(wikidataDump), stat.st_size, stat.st_mtime_ns)
+	return "%s\t%s\tquery\t%s\t%s" % (rootID, propertyID, endpoint, datetime.date.today().isoformat())
+
+def isClassHierarchy(filename):
+	"""
+	Checks whether a file is a class hierarchy in the current format
+
+	Args:
+		filename (str): File to check
+
+	Returns:
+		True if it is a class hierarchy
+	"""
+	with open(filename,'rb') as f:
+		return f.read(len(CLASS_HIERARCHY_MAGIC)) == CLASS_HIERARCHY_MAGIC
+
+def loadSubclasses(rootID, propertyID='P279', hierarchyFile=None, wikidataDump=None, processes=1, **options):
+	"""
+	Gets all the subclasses of a class from a saved class hierarchy, building it first unless it was built for the same class and property from the same source. The hierarchy is built from every subclass edge in the dump if one is given (and reused while the dump is unchanged) or by querying the edges below the class (and reused on the same day)
+
+	Args:
+		rootID (str): Class at the top of the hierarchy (e.g. Q12140)
+		propertyID (str): Property of the subclass edges
+		hierarchyFile (str): Class hierarchy file to reuse between runs (or None to build a temporary one)
+		wikidataDump (str): Dump to read the subclass edges from (or None to query them)
+		processes (int): Number of processes to parse the dump with
+		options: Other options for runPagedQuery (e.g. endpoint and cacheDir)
+
+	Returns:
+		set of class IDs (including the class itself)
+	"""
+	source = describeHierarchySource(rootID, propertyID, wikidataDump=wikidataDump, endpoint=options.get('endpoint',WIKIDATA_ENDPOINT))
+
+	with tempfile.TemporaryDirectory() as tempDir:
+		if hierarchyFile is None:
+			hierarchyFile = os.path.join(tempDir, 'hierarchy.bin')
+
+		if os.path.isfile(hierarchyFile) and isClassHierarchy(hierarchyFile) and ClassHierarchy(hierarchyFile).source == source:
+			print("Using existing class hierarchy...")
+		elif wikidataDump:
+			print("Building class hierarchy from dump...")
+			saveClassHierarchy(readDumpEdges(wikidataDump, propertyID=propertyID, processes=processes), hierarchyFile, source=source)
+		else:
+			print("Building class hierarchy from queries...")
+			saveClassHierarchy(querySubclassEdges(rootID, propertyID=propertyID, **options), hierarchyFile, source=source)
+
+		return ClassHierarchy(hierarchyFile).getDescendants(rootID)
@@ -2,18 +2,361 @@
 import argparse
 import sys
 import os
+import gzip
+import json
+import tempfile
 from collections import Counter,defaultdict
+from curation import loadDeletions, loadStopwords, appendLinesAtomically, CURATED_TYPES
+from wordlists import readWordlist, normalizeSynonym, WORDLIST_TYPES
+from resolveConflicts import loadSynonymIndex
+
+# Number of characters of a knowledge base to read at a time
+KB_CHUNK_SIZE = 16*1024*1024
+
+# Term types included in the report and resolution by default. The conflicting terms are left out as they overlap the other wordlists on purpose
+DEFAULT_TERMTYPES = [ termtype for termtype in WORDLIST_TYPES if termtype != 'conflicting' ]
+
+def countKnowledgeBaseTerms(filenames, terms, chunkSize=KB_CHUNK_SIZE, capitalCounts=None):
+	"""
+	Counts how often each of a set of terms appears as a value in tab-delimited knowledge bases (after each header line). The files are streamed in chunks so only one chunk is in memory at a time and only the requested terms are counted
+
+	Args:
+		filenames (list of str): Knowledge base files (gzipped if they end with .gz)
+		terms (set of str): Lowercased terms to count
+		chunkSize (int): Number of characters to read at a time
+		capitalCounts (Counter): If given, also counts how often each term is written in capitals (e.g. as an abbreviation), updated in place
+
+	Returns:
+		Counter of lowercased values
+	"""
+	def countValues(text):
+		lowered = text.lower().replace('\t','\n').split('\n')
+		if capitalCounts is None:
+			counts.update( v for v in lowered if v in terms )
+		else:
+			# Lowercasing does not change the tabs and newlines so the values line up
+			for v,original in zip(lowered, text.replace('\t','\n').split('\n')):
+				if v in terms:
+					counts[v] += 1
+					if original.isupper():
+						capitalCounts[v] += 1
+
+	counts = Counter()
+	for filename in filenames:
+		opener = gzip.open if filename.endswith('.gz') else open
+		with opener(filename,'rt',encoding='utf8') as f:
+			headers = f.readline()
+
+			remainder = ''
+			for chunk in iter(lambda : f.read(chunkSize), ''):
+				# Only count complete lines and keep the rest for the next chunk
+				chunk = remainder + chunk
+				end = chunk.rfind('\n') + 1
+				chunk, remainder = chunk[:end], chunk[end:]
+				countValues(chunk)
+			countValues(remainder)
+	return counts
+
+def findConflicts(index, termtypes, deletions, stopwords):
+	"""
+	Finds all the synonyms that are shared by more than one identifier, either within a wordlist or across wordlists, in one pass over a synonym index
+
+	Args:
+		index (SynonymIndex): Synonym index across the wordlists
+		termtypes (list of str): Term types to include
+		deletions (dict): Custom deletions for each term type (see curation.loadDeletions) which are already resolved
+		stopwords (dict): Stopwords for each term type which are already resolved
+
+	Returns:
+		generator of (synonym, list of (type, identifier) tuples)
+	"""
+	for synonym,postings in index.iterAmbiguous():
+		postings = [ (termtype,termid) for termtype,termid in postings if termtype in termtypes and not synonym in stopwords[termtype] and not synonym in deletions[termtype].get(termid,()) ]
+		if len(postings) > 1:
+			yield synonym, postings
+
+def findRankedConflicts(args, termtypes, capitalCounts=None):
+	"""
+	Finds the conflicts within and across the wordlists (in the current directory) that are not already resolved by the curation files and ranks them by how often they appear in the knowledge base
+
+	Args:
+		args (Namespace): Command line arguments
+		termtypes (list of str): Term types to include
+		capitalCounts (Counter): If given, also counts how often each conflicting term is written in capitals in the knowledge base (see countKnowledgeBaseTerms)
+
+	Returns:
+		list of (count, synonym, list of (type, identifier) tuples) sorted by decreasing count
+	"""
+	deletions, stopwords = {}, {}
+	for termtype in termtypes:
+		filename = "deletions_%s.tsv" % termtype
+		deletions[termtype] = loadDeletions(filename) if os.path.isfile(filename) else {}
+		filename = "stopwords_%s.txt" % termtype
+		stopwords[termtype] = loadStopwords(filename) if os.path.isfile(filename) else frozenset()
+
+	# A given index is only used if it was built from the current wordlists (see loadSynonymIndex), otherwise a temporary one is built and removed at the end
+	with tempfile.TemporaryDirectory() as tempDir:
+		index = loadSynonymIndex([ (termtype,"terms_%s.tsv" % termtype) for termtype in termtypes ], args.synonymIndex or os.path.join(tempDir, 'synonyms.index'))
+
+		print("Finding conflicts...")
+		conflicts = list(findConflicts(index, termtypes, deletions, stopwords))
+
+	print("Counting conflicting terms in knowledge base...")
+	counts = countKnowledgeBaseTerms(args.knowledgebase, set( synonym for synonym,_ in conflicts ), capitalCounts=capitalCounts)
+
+	ranked = sorted( (-counts[synonym],synonym,postings) for synonym,postings in conflicts )
+	return [ (-negativeCount,synonym,postings) for negativeCount,synonym,postings in ranked ]
+
+def writeConflictReport(conflicts, filename):
+	"""
+	Writes the ranked conflicts as JSON lines
+
+	Args:
+		conflicts (list of (count, synonym, postings)): Conflicts from findRankedConflicts
+		filename (str): Output file
+
+	Returns:
+		Nothing
+	"""
+	with open(filename,'w') as outF:
+		for count,synonym,postings in conflicts:
+			types = sorted(set( termtype for termtype,_ in postings ))
+			conflict = { 'term':synonym, 'count':count, 'crossList':len(types) > 1, 'types':types, 'postings':[ { 'type':termtype, 'id':termid } for termtype,termid in postings ] }
+			outF.write(json.dumps(conflict) + "\n")
+
+def reportConflicts(args):
+	"""
+	Writes a report of all the conflicts within and across the wordlists (in the current directory) without any interaction
+
+	Args:
+		args (Namespace): Command line arguments
+
+	Returns:
+		Nothing
+	"""
+	termtypes = args.termtypes.split(',') if args.termtypes else DEFAULT_TERMTYPES
+	conflicts = findRankedConflicts(args, termtypes)
+	writeConflictReport(conflicts, args.report)
+
+	print("Wrote %d conflicts to %s" % (len(conflicts), args.report))
+
+# Terms up to this length that are written in capitals (e.g. abbreviations) are treated as stopwords by the rules
+SHORT_TERM_LENGTH = 3
+
+def ruleMainName(term, postings, names, synonyms, capitalized):
+	"""
+	Keeps the entity whose main name is the term (if there is only one)
+	"""
+	matching = [ posting for posting in postings if names[posting].lower() == term ]
+	if len(matching) == 1:
+		return ('keep', matching[0])
+	return None
+
+def ruleGenesOverProteins(term, postings, names, synonyms, capitalized):
+	"""
+	Keeps the gene for a symbol (a term without spaces) that is shared by one gene and some proteins
+	"""
+	types = set( termtype for termtype,_ in postings )
+	genes = [ posting for posting in postings if posting[0] == 'genes' ]
+	if types == set(['genes','proteins']) and len(genes) == 1 and not ' ' in term:
+		return ('keep', genes[0])
+	return None
+
+def ruleShortAllCaps(term, postings, names, synonyms, capitalized):
+	"""
+	Adds short terms that are written in capitals (e.g. abbreviations) to the stopwords
+	"""
+	if len(term) <= SHORT_TERM_LENGTH and term in capitalized:
+		return ('stopword',)
+	return None
+
+# Rules for resolving conflicts automatically in the order they are tried. Each is given the term, its postings, the main names and synonyms of the entities and the set of terms that are written in capitals and returns a decision (or None)
+RESOLUTION_RULES = [ ('main name',ruleMainName), ('genes over proteins',ruleGenesOverProteins), ('short all caps',ruleShortAllCaps) ]
+
+def findCapitalizedTerms(conflicts, capitalCounts, names, synonyms):
+	"""
+	Finds the conflicting terms that are written in capitals. Most of the wordlists are lowercased when they are generated, so this uses the knowledge base (where the term is mostly written in capitals), the main names (e.g. gene symbols) and any synonyms that kept their case (e.g. proteins)
+
+	Args:
+		conflicts (list of (count, term, postings)): Ranked conflicts
+		capitalCounts (Counter): Number of times each term is written in capitals in the knowledge base
+		names (dict): Main name of each entity
+		synonyms (dict): Synonyms of each entity
+
+	Returns:
+		set of lowercased terms
+	"""
+	capitalized = set()
+	for count,term,postings in conflicts:
+		if count > 0 and 2*capitalCounts[term] > count:
+			capitalized.add(term)
+		elif any( s.isupper() and s.lower() == term for posting in postings for s in [names[posting]] + synonyms[posting] ):
+			capitalized.add(term)
+	return capitalized
+
+def loadWordlistDetails(termtypes):
+	"""
+	Loads the main names and synonyms of the entities in the wordlists (in the current directory)
+
+	Args:
+		termtypes (list of str): Term types to load
+
+	Returns:
+		tuple of dictionaries from (type, identifier) to the main name and to the list of synonyms
+	"""
+	names, synonyms = {}, defaultdict(list)
+	for termtype in termtypes:
+		for termid,singleterm,termSynonyms in readWordlist("terms_%s.tsv" % termtype):
+			names[(termtype,termid)] = singleterm
+			synonyms[(termtype,termid)] += termSynonyms
+	return names, synonyms
+
+def getDecisionLines(term, postings, decision, names):
+	"""
+	Gets the lines to add to the curation files for a decision. Only the term types with curation files that are used to generate their wordlists (see curation.CURATED_TYPES) get lines
+
+	Args:
+		term (str): Conflicting term
+		postings (list of (type, identifier)): Entities that share the term
+		decision (tuple): ('keep', posting) to delete the term from the other entities or ('stopword',) to add it to the stopwords of each type
+		names (dict): Main name of each entity
+
+	Returns:
+		dictionary of curation filename to list of lines
+	"""
+	lines = defaultdict(list)
+	if decision[0] == 'keep':
+		for posting in postings:
+			termtype,termid = posting
+			if posting != decision[1] and termtype in CURATED_TYPES:
+				lines['deletions_%s.tsv' % termtype].append("%s\t%s\t%s" % (termid,names[posting],term))
+	elif decision[0] == 'stopword':
+		for termtype in sorted(set( termtype for termtype,_ in postings )):
+			if termtype in CURATED_TYPES:
+				lines['stopwords_%s.txt' % termtype].append(term)
+	return lines
+
+def reviewConflicts(conflicts, names, synonyms):
+	"""
+	Asks for a decision on each conflict in turn
+
+	Args:
+		conflicts (list of (count, term, postings)): Conflicts to review
+		names (dict): Main name of each entity
+		synonyms (dict): Synonyms of each entity
+
+	Returns:
+		list of (term, postings, decision) tuples
+	"""
+	decisions = []
+	for j,(count,term,postings) in enumerate(conflicts):
+		print()
+		print('#'*40 + " (%d/%d)" % (j+1,len(conflicts)))
+		print("Clash: %s (%d)" % (term,count))
+		print()
+		for i,posting in enumerate(postings):
+			print("%d: %s [%s %s]" % (i,names[posting],posting[0],posting[1]))
+			print("   %s" % str(synonyms[posting]))
+			print()
+
+		response = None
+		allowed = set(['x','s','q'] + list(map(str,range(len(postings)))))
+		while not response in allowed:
+			try:
+				response = input('Which one to keep? (x to skip, s to add to stopwords or q to stop reviewing) ')
+			except EOFError:
+				response = 'q'
+
+		if response == 'q':
+			break
+		elif response == 's':
+			decisions.append( (term,postings,('stopword',)) )
+		elif response != 'x':
+			decisions.append( (term,postings,('keep',postings[int(response)])) )
+	return decisions
+
+def resolveConflicts(args):
+	"""
+	Resolves the ranked conflicts with the rules, then asks about the rest (unless review is turned off) and writes all the decisions with one atomic write for each curation file
+
+	Args:
+		args (Namespace): Command line arguments
+
+	Returns:
+		Nothing
+	"""
+	termtypes = args.termtypes.split(',') if args.termtypes else DEFAULT_TERMTYPES
+	rules = [ (name,rule) for name,rule in RESOLUTION_RULES if not args.rules or name in args.rules.split(',') ]
+
+	uncurated = [ termtype for termtype in termtypes if not termtype in CURATED_TYPES ]
+	if uncurated:
+		print("WARNING: No curation files are used for %s so only the decisions for the other types are written" % ", ".join(uncurated))
+
+	capitalCounts = Counter()
+	conflicts = findRankedConflicts(args, termtypes, capitalCounts=capitalCounts)
+	names, synonyms = loadWordlistDetails(termtypes)
+	capitalized = findCapitalizedTerms(conflicts, capitalCounts, names, synonyms)
+
+	decisions = []
+	leftovers = []
+	ruleCounts = Counter()
+	for count,term,postings in conflicts:
+		for name,rule in rules:
+			decision = rule(term, postings, names, synonyms, capitalized)
+			if decision:
+				decisions.append( (term,postings,decision) )
+				ruleCounts[name] += 1
+				break
+		else:
+			leftovers.append( (count,term,postings) )
+
+	print("Resolved %d of %d conflicts with the rules:" % (len(decisions), len(conflicts)))
+	for name,_ in rules:
+		print("  %s: %d" % (name, ruleCounts[name]))
+
+	if not args.noReview and leftovers:
+		decisions += reviewConflicts(leftovers, names, synonyms)
+
+	curationLines = defaultdict(list)
+	unwritten = 0
+	for term,postings,decision in decisions:
+		decisionLines = getDecisionLines(term, postings, decision, names)
+		if not decisionLines:
+			unwritten += 1
+		for filename,lines in decisionLines.items():
+			curationLines[filename] += lines
+
+	if unwritten > 0:
+		print("WARNING: %d decisions only affect term types without curation files and are not written" % unwritten)
+
+	for filename,lines in sorted(curationLines.items()):
+		print("Adding %d lines to %s" % (len(lines), filename))
+		appendLinesAtomically(filename, lines)
 
 if __name__ == '__main__':
 	parser = argparse.ArgumentParser(description='Help identify conflicting terms in a set of wordlists')
-	parser.add_argument('--knowledgebase',required=True,type=str,help='Knowledge base to use for weighting conflicts')
+	parser.add_argument('--knowledgebase',required=True,type=str,nargs='+',help='Knowledge base(s) to use for weighting conflicts (optionally gzipped)')
+	parser.add_argument('--report',required=False,type=str,help='Write all conflicts within and across the wordlists to this JSONL file (ranked by frequency in the knowledge base) instead of resolving them interactively')
+	parser.add_argument('--resolve',action='store_true',help='Resolve all conflicts within and across the wordlists with the rules and then review the rest, writing all the decisions at the end')
+	parser.add_argument('--rules',required=False,type=str,help='Comma-separated names of the rules to use with --resolve (default is all: %s)' % ",".join( name for name,_ in RESOLUTION_RULES ))
+	parser.add_argument('--noReview',action='store_true',help='Only apply the rules with --resolve and leave the other conflicts')
+	parser.add_argument('--synonymIndex',required=False,type=str,help='Synonym index across the wordlists (from buildSynonymIndex.py) to use for --report and --resolve (only used if it was built from the current terms_*.tsv files, otherwise it is rebuilt unless it has other types too)')
+	parser.add_argument('--termtypes',required=False,type=str,help='Comma-separated term types to include with --report and --resolve (default is all except conflicting: %s)' % ",".join(DEFAULT_TERMTYPES))
 	args = parser.parse_args()
 
+	if args.report:
+		reportConflicts(args)
+		sys.exit(0)
+	elif args.resolve:
+		resolveConflicts(args)
+		sys.exit(0)
+
 	termtypes = ['cancers','genes','drugs','variants']
 	#termtypes = ['proteins']
 
 
 
+	termData = {}
 	for termtype in termtypes:
 		lookup = defaultdict(set)
 		singleterms = {}
@@ -31,48 +374,31 @@ if __name__ == '__main__':
 
 		allTermIDs = []
 		filename = "terms_%s.tsv" % termtype
-		with open(filename) as f:
-			for line in f:
-				split = line.strip('\n').split('\t')
-				termid,singleterm,synonyms = split[:3]
-
-				singleterms[termid] = singleterm
-				synonyms = [ s.lower() for s in synonyms.split('|') ]
-				synonyms = [ s for s in synonyms if not s in deletions[termid] ]
+		for termid,singleterm,synonyms in readWordlist(filename):
+			singleterms[termid] = singleterm
+			synonyms = [ s.lower() for s in synonyms ]
+			synonyms = [ s for s in synonyms if not s in deletions[termid] ]
 
-				allTermIDs.append(termid)
+			allTermIDs.append(termid)
 
-				synonymLookup[termid] = synonyms
-				for s in synonyms:
-					lookup[s].add(termid)
+			synonymLookup[termid] = synonyms
+			for s in synonyms:
+				lookup[s].add(termid)
 
 
 
 		conflicting = set([ term for term,termids in lookup.items() if len(termids) > 1 ])
 
-		seen = Counter()
-		with open(args.knowledgebase) as f:
-		#with open('civicmine_unfiltered.tsv') as f:
-			moo = "matchingid      evidencetype    gene_hugo_id    gene_entrez_id  gene_normalized cancer_id       cancer_normalized       drug_id drug_normalized variant_normalized      citation_count"
-			headers = f.readline().strip('\n').split('\t')
-			#for line in f:
-				#rowDict = { h:v for h,v in zip(headers,line.strip('\n').split('\t')) }
-				#seen[rowDict['cancer_text']] += 1
-				#seen[rowDict['gene_text']] += 1
-				#seen[rowDict['drug_text']] += 1
-				#seen[rowDict['variant_text']] += 1
-				#for v in line.strip('\n').split('\t'):
-				#	seen[v] += 1
-			#	vals = line.strip('\n').split('\t')
-			#	seen += Counter(vals)
-
-			print("before")
-			seen = Counter(f.read().lower().replace('\t','\n').split('\n'))
-			print("after")
-			
+		termData[termtype] = (lookup, singleterms, synonymLookup, allTermIDs, conflicting)
+
+	# The knowledge base is counted once for the conflicting terms of all the term types
+	print("Counting conflicting terms in knowledge base...")
+	seen = countKnowledgeBaseTerms(args.knowledgebase, set().union(*[ data[4] for data in termData.values() ]))
+
+	for termtype in termtypes:
+		lookup, singleterms, synonymLookup, allTermIDs, conflicting = termData[termtype]
 
 		toSolve = sorted([ (count,term) for term,count in seen.items() if term in conflicting ],reverse=True)
-		seen = None
 
 		for j,(count,term) in enumerate(toSolve):
 			conflicting_termids = sorted(lookup[term])
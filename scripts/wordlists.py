@@ -0,0 +1,581 @@
+"""
+Shared reading of the generated wordlists (terms_*.tsv). Each line has an identifier, the main term and a pipe-delimited list of synonyms, possibly followed by extra columns (e.g. the Entrez ID for genes).
+
+The TSV files are canonical but a wordlist can also be saved in a compact binary format (see saveBinaryWordlist) that is memory-mapped by BinaryWordlist. It holds a sorted table of unique strings with arrays of string indices for the identifiers, main terms and synonyms, along with a lookup from lowercased synonym to the entities that have it. readWordlist reads either format.
+
+A synonym index across all the wordlists (see saveSynonymIndex) maps each normalized synonym to the (type, identifier) postings that have it and is memory-mapped by SynonymIndex. It is the shared source for finding ambiguous terms within and across wordlists.
+"""
+import bisect
+import codecs
+import itertools
+import mmap
+import os
+import struct
+from array import array
+
+# Term types that wordlists are generated (or predefined) for
+WORDLIST_TYPES = ['genes','cancers','drugs','variants','conflicting','proteins']
+
+# Header of a binary wordlist: magic, then the number of entities, synonyms, strings and lookup postings and the size of the string data
+BINARY_WORDLIST_MAGIC = b'BWLTERMS'
+BINARY_WORDLIST_HEADER = struct.Struct('=8s5Q')
+
+# Header of a synonym index: magic, then the number of synonyms, postings and strings and the sizes of the string, type and source data
+SYNONYM_INDEX_MAGIC = b'BWLSYNX2'
+SYNONYM_INDEX_HEADER = struct.Struct('=8s6Q')
+
+def getListType(filename):
+	"""
+	Gets the term type of a wordlist (or of a curation file) from its filename (e.g. terms_drugs.custom.tsv and deletions_drugs.tsv are drugs)
+
+	Args:
+		filename (str): Wordlist filename
+
+	Returns:
+		str of the term type
+	"""
+	name = os.path.basename(filename).split('.')[0]
+	for prefix in ['terms_','deletions_','additions_','stopwords_']:
+		if name.startswith(prefix):
+			return name[len(prefix):]
+	return name
+
+def readWordlist(filename):
+	"""
+	Reads the terms of a wordlist (either TSV or binary) in file order
+
+	Args:
+		filename (str): Wordlist file
+
+	Returns:
+		generator of tuples of identifier, main term and list of synonyms
+	"""
+	if isBinaryWordlist(filename):
+		for entity in BinaryWordlist(filename):
+			yield entity
+		return
+
+	with codecs.open(filename,'r','utf-8') as f:
+		for line in f:
+			split = line.rstrip('\n\r').split('\t')
+			if len(split) < 3:
+				continue
+			termid,singleterm,synonyms = split[:3]
+			yield termid, singleterm, synonyms.split('|')
+
+def readInhibitorTemplates(filename):
+	"""
+	Reads inhibitor templates (from generateDrugTerms_geneinhibitors.py). Each line has the inhibitor identifier, its main term, the gene identifier and a pipe-delimited list of inhibitor terms that are excluded (which may be empty)
+
+	Args:
+		filename (str): Inhibitor templates file
+
+	Returns:
+		generator of tuples of inhibitor identifier, main term, gene identifier and list of excluded terms
+	"""
+	with codecs.open(filename,'r','utf-8') as f:
+		for line in f:
+			drugid,singleterm,geneid,exclusions = line.rstrip('\n\r').split('\t')
+			yield drugid, singleterm, geneid, [ e for e in exclusions.split('|') if e ]
+
+def parseWordlistArgument(argument):
+	"""
+	Parses a wordlist given on the command line, either as a filename (with the term type taken from the filename) or as type=filename
+
+	Args:
+		argument (str): Command line argument
+
+	Returns:
+		tuple of term type and filename
+	"""
+	if '=' in argument and not os.path.isfile(argument):
+		listType,filename = argument.split('=',1)
+		return listType, filename
+	return getListType(argument), argument
+
+def isBinaryWordlist(filename):
+	"""
+	Checks whether a file is a binary wordlist (rather than TSV)
+
+	Args:
+		filename (str): Wordlist file
+
+	Returns:
+		True if it is binary
+	"""
+	with open(filename,'rb') as f:
+		return f.read(len(BINARY_WORDLIST_MAGIC)) == BINARY_WORDLIST_MAGIC
+
+def saveBinaryWordlist(tsvFilename, filename):
+	"""
+	Converts a TSV wordlist into the binary format read by BinaryWordlist. Extra columns are kept so the TSV can be recreated
+
+	Args:
+		tsvFilename (str): TSV wordlist to convert
+		filename (str): Binary file to write
+
+	Returns:
+		Nothing
+	"""
+	rows = []
+	with codecs.open(tsvFilename,'r','utf-8') as f:
+		for line in f:
+			split = line.rstrip('\n\r').split('\t')
+			if len(split) < 3:
+				continue
+			rows.append( (split[0], split[1], split[2].split('|'), "\t".join(split[3:])) )
+
+	strings = set()
+	for termid,singleterm,synonyms,extra in rows:
+		strings.update([termid,singleterm,extra])
+		strings.update(synonyms)
+		strings.update( s.lower() for s in synonyms )
+	stringIndex, stringOffsets, stringData = buildStringTable(strings)
+
+	ids = array('I', ( stringIndex[termid] for termid,_,_,_ in rows ))
+	mains = array('I', ( stringIndex[singleterm] for _,singleterm,_,_ in rows ))
+	extras = array('I', ( stringIndex[extra] for _,_,_,extra in rows ))
+
+	synonymStarts = array('I', [0])
+	synonymStrings = array('I')
+	postings = set()
+	for entityIndex,(_,_,synonyms,_) in enumerate(rows):
+		synonymStrings.extend( stringIndex[s] for s in synonyms )
+		synonymStarts.append(len(synonymStrings))
+		postings.update( (stringIndex[s.lower()],entityIndex) for s in synonyms )
+	postings = sorted(postings)
+	postingKeys = array('I', ( key for key,_ in postings ))
+	postingEntities = array('I', ( entityIndex for _,entityIndex in postings ))
+
+	header = BINARY_WORDLIST_HEADER.pack(BINARY_WORDLIST_MAGIC, len(rows), len(synonymStrings), len(stringIndex), len(postings), len(stringData))
+	writeSections(filename, header, [ stringOffsets, ids, mains, extras, synonymStarts, synonymStrings, postingKeys, postingEntities, stringData ])
+
+def buildStringTable(strings):
+	"""
+	Creates a table of unique strings sorted by their UTF-8 bytes, so a string's index can be found with a binary search and sorting by index also sorts by string
+
+	Args:
+		strings (iterable of str): Strings to put in the table
+
+	Returns:
+		tuple of the dictionary of string to index, the array of offsets (with the end as the last offset) and the string data
+	"""
+	encoded = sorted(set( s.encode('utf8') for s in strings ))
+	stringIndex = { s.decode('utf8'):i for i,s in enumerate(encoded) }
+
+	offsets = array('Q', [0])
+	for s in encoded:
+		offsets.append(offsets[-1] + len(s))
+	return stringIndex, offsets, b''.join(encoded)
+
+def writeSections(filename, header, sections):
+	"""
+	Writes a binary file as a header followed by arrays and blocks of bytes, each aligned to 8 bytes so the arrays can be cast directly from the mapped file. The file is written under a temporary name and then moved into place
+
+	Args:
+		filename (str): File to write
+		header (bytes): Header to write first
+		sections (list of array or bytes): Sections to write in order
+
+	Returns:
+		Nothing
+	"""
+	with open(filename + '.tmp','wb') as outF:
+		outF.write(header)
+		outF.write(b'\0' * (-len(header) % 8))
+		for section in sections:
+			data = section.tobytes() if isinstance(section,array) else section
+			outF.write(data)
+			outF.write(b'\0' * (-len(data) % 8))
+	os.replace(filename + '.tmp', filename)
+
+class SectionReader:
+	"""
+	Reads the sections written by writeSections from a memory-mapped file in the same order
+	"""
+	def __init__(self, filename, headerStruct, magic):
+		with open(filename,'rb') as f:
+			self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+		self.header = headerStruct.unpack_from(self.data, 0)
+		assert self.header[0] == magic, "%s is not the expected type of file" % filename
+
+		self.view = memoryview(self.data)
+		self.position = headerStruct.size + (-headerStruct.size % 8)
+
+	def nextSection(self, length, typecode=None):
+		"""
+		Gets the next section
+
+		Args:
+			length (int): Number of items (or bytes if there is no typecode)
+			typecode (str): Array typecode (e.g. I) or None for bytes
+
+		Returns:
+			memoryview of the section
+		"""
+		size = length * (array(typecode).itemsize if typecode else 1)
+		section = self.view[self.position:self.position+size]
+		self.position += size + (-size % 8)
+		return section.cast(typecode) if typecode else section
+
+def findSortedString(data, start, offsets, text):
+	"""
+	Finds a string in a sorted string table (see buildStringTable) with a binary search
+
+	Args:
+		data (mmap): Mapped file
+		start (int): Position of the string data in the file
+		offsets (memoryview): Offsets of the strings (with the end as the last offset)
+		text (str): String to find
+
+	Returns:
+		int index (or None if it is not in the table)
+	"""
+	encoded = text.encode('utf8')
+	lo, hi = 0, len(offsets)-1
+	while lo < hi:
+		mid = (lo+hi) // 2
+		candidate = data[start+offsets[mid]:start+offsets[mid+1]]
+		if candidate < encoded:
+			lo = mid + 1
+		elif candidate > encoded:
+			hi = mid
+		else:
+			return mid
+	return None
+
+class BinaryWordlist:
+	"""
+	Read-only access to a binary wordlist created by saveBinaryWordlist. The file is memory-mapped and strings are only decoded when they are requested.
+
+	Entities are accessed by index (in the order of the TSV file) as (identifier, main term, list of synonyms) tuples, and lookup finds the identifiers that have a synonym (case-insensitive).
+	"""
+	def __init__(self, filename):
+		reader = SectionReader(filename, BINARY_WORDLIST_HEADER, BINARY_WORDLIST_MAGIC)
+		_,entityCount,synonymCount,stringCount,postingCount,stringDataLength = reader.header
+		self.data = reader.data
+
+		self.stringOffsets = reader.nextSection(stringCount+1, 'Q')
+		self.ids = reader.nextSection(entityCount, 'I')
+		self.mains = reader.nextSection(entityCount, 'I')
+		self.extras = reader.nextSection(entityCount, 'I')
+		self.synonymStarts = reader.nextSection(entityCount+1, 'I')
+		self.synonymStrings = reader.nextSection(synonymCount, 'I')
+		self.postingKeys = reader.nextSection(postingCount, 'I')
+		self.postingEntities = reader.nextSection(postingCount, 'I')
+		self.stringStart = reader.position
+
+	def __len__(self):
+		return len(self.ids)
+
+	def __getitem__(self, entityIndex):
+		synonyms = [ self.getString(i) for i in self.synonymStrings[self.synonymStarts[entityIndex]:self.synonymStarts[entityIndex+1]] ]
+		return self.getString(self.ids[entityIndex]), self.getString(self.mains[entityIndex]), synonyms
+
+	def __iter__(self):
+		for entityIndex in range(len(self)):
+			yield self[entityIndex]
+
+	def getString(self, stringIndex):
+		start = self.stringStart + self.stringOffsets[stringIndex]
+		end = self.stringStart + self.stringOffsets[stringIndex+1]
+		return self.data[start:end].decode('utf8')
+
+	def getExtra(self, entityIndex):
+		"""
+		Gets the extra columns of an entity (e.g. the Entrez ID for genes)
+
+		Args:
+			entityIndex (int): Index of the entity
+
+		Returns:
+			list of str (empty if there are no extra columns)
+		"""
+		extra = self.getString(self.extras[entityIndex])
+		return extra.split('\t') if extra else []
+
+	def findString(self, text):
+		"""
+		Finds the index of a string in the string table
+
+		Args:
+			text (str): String to find
+
+		Returns:
+			int index (or None if it is not in the table)
+		"""
+		return findSortedString(self.data, self.stringStart, self.stringOffsets, text)
+
+	def lookupEntities(self, synonym):
+		"""
+		Finds the entities that have a synonym (case-insensitive)
+
+		Args:
+			synonym (str): Synonym to look up
+
+		Returns:
+			list of entity indices
+		"""
+		key = self.findString(synonym.lower())
+		if key is None:
+			return []
+		start = bisect.bisect_left(self.postingKeys, key)
+		end = bisect.bisect_right(self.postingKeys, key, start)
+		return list(self.postingEntities[start:end])
+
+	def lookup(self, synonym):
+		"""
+		Finds the identifiers of the entities that have a synonym (case-insensitive)
+
+		Args:
+			synonym (str): Synonym to look up
+
+		Returns:
+			list of identifiers
+		"""
+		return [ self.getString(self.ids[i]) for i in self.lookupEntities(synonym) ]
+
+def normalizeSynonym(synonym):
+	"""
+	Normalizes a synonym for the synonym index (and for comparing with deletions and stopwords)
+
+	Args:
+		synonym (str): Synonym
+
+	Returns:
+		str of the lowercased synonym
+	"""
+	return synonym.strip().lower()
+
+def getWordlistSources(wordlists):
+	"""
+	Describes the files that a synonym index is built from, so a saved index can be checked against the wordlists that are asked for
+
+	Args:
+		wordlists (list of (str,str)): Type and filename of each wordlist
+
+	Returns:
+		sorted list of (type, real path, size, modification time in nanoseconds) tuples
+	"""
+	sources = []
+	for listType,filename in wordlists:
+		stat = os.stat(filename)
+		sources.append( (listType, os.path.realpath(filename), stat.st_size, stat.st_mtime_ns) )
+	return sorted(sources)
+
+def isSynonymIndex(filename):
+	"""
+	Checks whether a file is a synonym index in the current format
+
+	Args:
+		filename (str): File to check
+
+	Returns:
+		True if it is a synonym index
+	"""
+	with open(filename,'rb') as f:
+		return f.read(len(SYNONYM_INDEX_MAGIC)) == SYNONYM_INDEX_MAGIC
+
+def saveSynonymIndex(wordlists, filename):
+	"""
+	Builds an index across a set of wordlists from each normalized synonym to the (type, identifier) postings that have it and saves it in a binary format that is memory-mapped by SynonymIndex. The main name of each posting's entity is also stored, along with the files the index was built from
+
+	Args:
+		wordlists (list of (str,str)): Type and filename of each wordlist (TSV or binary)
+		filename (str): Index file to write
+
+	Returns:
+		Nothing
+	"""
+	types = sorted(set( listType for listType,_ in wordlists ))
+	typeIndex = { listType:i for i,listType in enumerate(types) }
+	sources = getWordlistSources(wordlists)
+
+	postings = set()
+	names = {}
+	for listType,wordlistFilename in wordlists:
+		for termid,singleterm,synonyms in readWordlist(wordlistFilename):
+			names[(typeIndex[listType],termid)] = singleterm
+			for synonym in synonyms:
+				synonym = normalizeSynonym(synonym)
+				if synonym:
+					postings.add( (synonym,typeIndex[listType],termid) )
+
+	stringIndex, stringOffsets, stringData = buildStringTable( itertools.chain( itertools.chain.from_iterable( (synonym,termid) for synonym,_,termid in postings ), names.values() ) )
+	postings = sorted( (stringIndex[synonym],listTypeIndex,stringIndex[termid],stringIndex[names[(listTypeIndex,termid)]]) for synonym,listTypeIndex,termid in postings )
+
+	synonymStrings = array('I')
+	postingStarts = array('I')
+	for i,(synonym,_,_,_) in enumerate(postings):
+		if not synonymStrings or synonymStrings[-1] != synonym:
+			synonymStrings.append(synonym)
+			postingStarts.append(i)
+	postingStarts.append(len(postings))
+	postingTypes = array('I', ( listTypeIndex for _,listTypeIndex,_,_ in postings ))
+	postingIds = array('I', ( termid for _,_,termid,_ in postings ))
+	postingNames = array('I', ( name for _,_,_,name in postings ))
+	typeData = "\n".join(types).encode('utf8')
+	sourceData = "\n".join( "%s\t%s\t%d\t%d" % source for source in sources ).encode('utf8')
+
+	header = SYNONYM_INDEX_HEADER.pack(SYNONYM_INDEX_MAGIC, len(synonymStrings), len(postings), len(stringIndex), len(stringData), len(typeData), len(sourceData))
+	writeSections(filename, header, [ stringOffsets, synonymStrings, postingStarts, postingTypes, postingIds, postingNames, stringData, typeData, sourceData ])
+
+class SynonymIndex:
+	"""
+	Read-only access to a synonym index created by saveSynonymIndex. The file is memory-mapped and strings are only decoded when they are requested. Synonyms are iterated in sorted order with their (type, identifier) postings. The wordlists it was built from are in sources (see getWordlistSources).
+	"""
+	def __init__(self, filename):
+		reader = SectionReader(filename, SYNONYM_INDEX_HEADER, SYNONYM_INDEX_MAGIC)
+		_,synonymCount,postingCount,stringCount,stringDataLength,typeDataLength,sourceDataLength = reader.header
+		self.data = reader.data
+
+		self.stringOffsets = reader.nextSection(stringCount+1, 'Q')
+		self.synonymStrings = reader.nextSection(synonymCount, 'I')
+		self.postingStarts = reader.nextSection(synonymCount+1, 'I')
+		self.postingTypes = reader.nextSection(postingCount, 'I')
+		self.postingIds = reader.nextSection(postingCount, 'I')
+		self.postingNames = reader.nextSection(postingCount, 'I')
+		self.stringStart = reader.position
+		reader.nextSection(stringDataLength)
+		self.types = bytes(reader.nextSection(typeDataLength)).decode('utf8').split('\n')
+		sourceLines = bytes(reader.nextSection(sourceDataLength)).decode('utf8').split('\n')
+		self.sources = sorted( (listType,path,int(size),int(mtime)) for listType,path,size,mtime in ( line.split('\t') for line in sourceLines if line ) )
+
+	def __len__(self):
+		return len(self.synonymStrings)
+
+	def getString(self, stringIndex):
+		start = self.stringStart + self.stringOffsets[stringIndex]
+		end = self.stringStart + self.stringOffsets[stringIndex+1]
+		return self.data[start:end].decode('utf8')
+
+	def getPostings(self, synonymIndex):
+		"""
+		Gets the postings for a synonym by its position in the index
+
+		Args:
+			synonymIndex (int): Position of the synonym
+
+		Returns:
+			list of (type, identifier) tuples
+		"""
+		start,end = self.postingStarts[synonymIndex], self.postingStarts[synonymIndex+1]
+		return [ (self.types[t],self.getString(i)) for t,i in zip(self.postingTypes[start:end],self.postingIds[start:end]) ]
+
+	def getNames(self, synonymIndex):
+		"""
+		Gets the main names of the entities for the postings of a synonym by its position in the index
+
+		Args:
+			synonymIndex (int): Position of the synonym
+
+		Returns:
+			list of main names (in the same order as getPostings)
+		"""
+		start,end = self.postingStarts[synonymIndex], self.postingStarts[synonymIndex+1]
+		return [ self.getString(i) for i in self.postingNames[start:end] ]
+
+	def __iter__(self):
+		for synonymIndex in range(len(self)):
+			yield self.getString(self.synonymStrings[synonymIndex]), self.getPostings(synonymIndex)
+
+	def findSynonym(self, synonym):
+		"""
+		Finds the position of a synonym (which is normalized first) in the index
+
+		Args:
+			synonym (str): Synonym to find
+
+		Returns:
+			int position (or None if it is not in any wordlist)
+		"""
+		stringIndex = findSortedString(self.data, self.stringStart, self.stringOffsets, normalizeSynonym(synonym))
+		if stringIndex is None:
+			return None
+		synonymIndex = bisect.bisect_left(self.synonymStrings, stringIndex)
+		if synonymIndex < len(self) and self.synonymStrings[synonymIndex] == stringIndex:
+			return synonymIndex
+		return None
+
+	def lookup(self, synonym):
+		"""
+		Finds the postings for a synonym (which is normalized first)
+
+		Args:
+			synonym (str): Synonym to look up
+
+		Returns:
+			list of (type, identifier) tuples (empty if it is not in any wordlist)
+		"""
+		synonymIndex = self.findSynonym(synonym)
+		return [] if synonymIndex is None else self.getPostings(synonymIndex)
+
+	def lookupWithNames(self, synonym):
+		"""
+		Finds the postings for a synonym (which is normalized first) along with the main names of their entities
+
+		Args:
+			synonym (str): Synonym to look up
+
+		Returns:
+			list of (type, identifier, main name) tuples (empty if it is not in any wordlist)
+		"""
+		synonymIndex = self.findSynonym(synonym)
+		if synonymIndex is None:
+			return []
+		return [ (termtype,termid,name) for (termtype,termid),name in zip(self.getPostings(synonymIndex),self.getNames(synonymIndex)) ]
+
+	def __contains__(self, synonym):
+		return len(self.lookup(synonym)) > 0
+
+	def iterAmbiguous(self):
+		"""
+		Finds the synonyms that have more than one posting, without decoding the others
+
+		Returns:
+			generator of (synonym, list of (type, identifier) tuples)
+		"""
+		starts = self.postingStarts
+		for synonymIndex in range(len(self)):
+			if starts[synonymIndex+1] - starts[synonymIndex] > 1:
+				yield self.getString(self.synonymStrings[synonymIndex]), self.getPostings(synonymIndex)
+
+def calculateAmbiguityStats(index):
+	"""
+	Counts the ambiguous synonyms in a synonym index, both within each wordlist (a synonym of more than one identifier of that type) and across wordlists (a synonym in more than one type)
+
+	Args:
+		index (SynonymIndex): Synonym index
+
+	Returns:
+		Dictionary of counts overall, for each type and for each pair of types
+	"""
+	stats = { 'synonyms':len(index), 'postings':len(index.postingTypes), 'ambiguous':0, 'crossListAmbiguous':0, 'types':{}, 'crossList':{} }
+	for listType in index.types:
+		stats['types'][listType] = { 'synonyms':0, 'ambiguous':0, 'crossListAmbiguous':0 }
+
+	starts = index.postingStarts
+	for synonymIndex in range(len(index)):
+		start,end = starts[synonymIndex], starts[synonymIndex+1]
+		typeCounts = {}
+		for t in index.postingTypes[start:end]:
+			typeCounts[t] = typeCounts.get(t,0) + 1
+
+		for t,count in typeCounts.items():
+			typeStats = stats['types'][index.types[t]]
+			typeStats['synonyms'] += 1
+			if count > 1:
+				typeStats['ambiguous'] += 1
+			if len(typeCounts) > 1:
+				typeStats['crossListAmbiguous'] += 1
+
+		if end - start > 1:
+			stats['ambiguous'] += 1
+		if len(typeCounts) > 1:
+			stats['crossListAmbiguous'] += 1
+			for a,b in itertools.combinations(sorted(typeCounts),2):
+				pair = "%s|%s" % (index.types[a],index.types[b])
+				stats['crossList'][pair] = stats['crossList'].get(pair,0) + 1
+
+	return stats